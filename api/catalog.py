@@ -0,0 +1,195 @@
+"""
+Static Catalog - Pre-encoded responses for the static reference data
+
+Page types, questionnaires and categories never change while the process is
+running, so every response built from them is validated through its Pydantic
+model once, encoded to JSON bytes once and served as-is afterwards with a
+strong ETag and long-lived cache headers.
+"""
+
+import json
+import hashlib
+from typing import Any, Dict, Optional
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+from api.models import (
+    PageTypeReferenceResponse,
+    PageTypeInfo,
+    Question,
+    CategoriesResponse,
+    CategoryInfo,
+)
+from api.utils import etag_matches
+from data.page_types_reference import PAGE_TYPES
+from data.questionnaire_config import QUESTIONNAIRES
+from data.page_categories import get_all_categories
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+CATALOG_CACHE_CONTROL = "public, max-age=86400"
+
+
+def encode_json(obj: Any) -> bytes:
+    """Encode like FastAPI's JSONResponse (compact separators, UTF-8)."""
+    return json.dumps(
+        jsonable_encoder(obj),
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+class PreEncodedResponse:
+    """
+    Immutable pre-encoded JSON body with its strong ETag.
+    """
+
+    __slots__ = ("body", "etag", "headers")
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        self.headers = {"ETag": self.etag, "Cache-Control": CATALOG_CACHE_CONTROL}
+
+    def respond(self, request: Optional[Request] = None) -> Response:
+        """Return the body, or 304 if the request already has this version."""
+        if request is not None and etag_matches(request.headers.get("if-none-match"), self.etag):
+            return Response(status_code=304, headers=self.headers)
+        return Response(content=self.body, media_type="application/json", headers=self.headers)
+
+
+def _unified(action: str, data_body: bytes) -> bytes:
+    """Wrap pre-encoded data in the UnifiedResponse envelope."""
+    return (
+        b'{"action":' + json.dumps(action).encode("utf-8")
+        + b',"success":true,"data":' + data_body
+        + b',"error":null}'
+    )
+
+
+class StaticCatalog:
+    """
+    All catalog responses, compiled once.
+
+    Questionnaire responses echo the requested key while unknown keys fall
+    back to the generic questions, so those bodies are spliced from a
+    pre-encoded questions fragment instead of being rebuilt per request.
+    """
+
+    def __init__(self):
+        available_types = list(PAGE_TYPES.keys())
+
+        # /page-types and /page-type/{unknown}
+        self.page_types = PreEncodedResponse(encode_json(
+            PageTypeReferenceResponse(page_type=None, available_types=available_types)
+        ))
+
+        # /page-type/{key}
+        self._page_type_data: Dict[str, bytes] = {}
+        self.page_type_by_key: Dict[str, PreEncodedResponse] = {}
+        for key, info in PAGE_TYPES.items():
+            body = encode_json(PageTypeReferenceResponse(
+                page_type=PageTypeInfo(**info),
+                available_types=available_types,
+            ))
+            self._page_type_data[key] = body
+            self.page_type_by_key[key] = PreEncodedResponse(body)
+
+        # /questionnaire/{key}: pre-encoded questions fragments
+        self._questions_fragment: Dict[str, bytes] = {
+            key: encode_json([Question(**q) for q in questionnaire.get("questions", [])])
+            for key, questionnaire in QUESTIONNAIRES.items()
+        }
+        self.questionnaire_by_key: Dict[str, PreEncodedResponse] = {
+            key: PreEncodedResponse(self._questionnaire_body(key, fragment))
+            for key, fragment in self._questions_fragment.items()
+        }
+
+        # /categories
+        categories_body = encode_json(CategoriesResponse(categories={
+            key: CategoryInfo(**info) for key, info in get_all_categories().items()
+        }))
+        self.categories = PreEncodedResponse(categories_body)
+
+        # Unified /api/stream actions
+        self.unified_categories = PreEncodedResponse(_unified("get_categories", categories_body))
+        self.unified_page_types = PreEncodedResponse(_unified("get_page_type", self.page_types.body))
+        self.unified_page_type_by_key: Dict[str, PreEncodedResponse] = {
+            key: PreEncodedResponse(_unified("get_page_type", body))
+            for key, body in self._page_type_data.items()
+        }
+        self.unified_questionnaire_by_key: Dict[str, PreEncodedResponse] = {
+            key: PreEncodedResponse(_unified("get_questionnaire", response.body))
+            for key, response in self.questionnaire_by_key.items()
+        }
+
+        total = sum(len(r.body) for r in self._all_responses())
+        logger.info("Compiled %s static responses (%s bytes)", len(self._all_responses()), total)
+
+    def _all_responses(self):
+        return [
+            self.page_types,
+            self.categories,
+            self.unified_categories,
+            self.unified_page_types,
+            *self.page_type_by_key.values(),
+            *self.questionnaire_by_key.values(),
+            *self.unified_page_type_by_key.values(),
+            *self.unified_questionnaire_by_key.values(),
+        ]
+
+    @staticmethod
+    def _questionnaire_body(page_type_key: str, fragment: bytes) -> bytes:
+        return b'{"page_type":' + json.dumps(page_type_key).encode("utf-8") + b',"questions":' + fragment + b"}"
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+
+    def page_type(self, page_type_key: str) -> PreEncodedResponse:
+        """Response for /page-type/{key} (page_type is null for unknown keys)."""
+        return self.page_type_by_key.get(page_type_key, self.page_types)
+
+    def unified_page_type(self, page_type_key: str) -> PreEncodedResponse:
+        """Response for the unified get_page_type action."""
+        return self.unified_page_type_by_key.get(page_type_key, self.unified_page_types)
+
+    def questionnaire(self, page_type_key: str) -> Optional[PreEncodedResponse]:
+        """
+        Response for /questionnaire/{key}, or None if there is no questionnaire.
+
+        Unknown keys get the generic questions, matching get_questionnaire.
+        """
+        response = self.questionnaire_by_key.get(page_type_key)
+        if response is not None:
+            return response
+        fragment = self._questions_fragment.get("generic")
+        if fragment is None:
+            return None
+        return PreEncodedResponse(self._questionnaire_body(page_type_key, fragment))
+
+    def unified_questionnaire(self, page_type_key: str) -> Optional[PreEncodedResponse]:
+        """Response for the unified get_questionnaire action."""
+        response = self.unified_questionnaire_by_key.get(page_type_key)
+        if response is not None:
+            return response
+        fragment = self._questions_fragment.get("generic")
+        if fragment is None:
+            return None
+        return PreEncodedResponse(_unified("get_questionnaire", self._questionnaire_body(page_type_key, fragment)))
+
+
+# Global static catalog instance
+_static_catalog: Optional[StaticCatalog] = None
+
+
+def get_static_catalog() -> StaticCatalog:
+    """Get or compile the global static catalog"""
+    global _static_catalog
+    if _static_catalog is None:
+        _static_catalog = StaticCatalog()
+    return _static_catalog
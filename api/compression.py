@@ -0,0 +1,143 @@
+"""
+Response compression middleware
+
+Gzip-compresses buffered JSON responses when the client advertises gzip in
+Accept-Encoding. Streaming responses (SSE, archive exports) pass through
+untouched so events are never held back by a compressor buffer.
+
+Every JSON response carries "Vary: Accept-Encoding", compressed or not, so
+shared caches keep the two encodings apart. A compressed body's strong ETag
+gets GZIP_ETAG_SUFFIX (the bytes differ from the identity body); routes
+accept either form in If-None-Match (api.utils.etag_matches), and a 304
+echoes the form the client sent.
+"""
+
+import gzip
+from typing import Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from api.utils import GZIP_ETAG_SUFFIX
+
+
+COMPRESSIBLE_TYPES = ("application/json",)
+
+
+def gzip_etag(etag: str) -> str:
+    """ETag of the gzip encoding of a body with the given ETag (weak tags stay weak)."""
+    weak = etag.startswith("W/")
+    tag = etag[2:] if weak else etag
+    if tag.endswith('"'):
+        tag = tag[:-1] + GZIP_ETAG_SUFFIX + '"'
+    else:
+        tag = tag + GZIP_ETAG_SUFFIX
+    return ("W/" if weak else "") + tag
+
+
+def _requested_gzip_variant(if_none_match: Optional[str], etag: str) -> bool:
+    """True if If-None-Match names the gzip variant of etag."""
+    if not if_none_match:
+        return False
+    variant = gzip_etag(etag).removeprefix("W/")
+    return any(part.strip().removeprefix("W/") == variant for part in if_none_match.split(","))
+
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    """Return True if an Accept-Encoding header allows gzip (q > 0)."""
+    if not accept_encoding:
+        return False
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        if token.strip().lower() not in ("gzip", "*"):
+            continue
+        params = params.strip().replace(" ", "")
+        if params.startswith("q="):
+            try:
+                return float(params[2:]) > 0
+            except ValueError:
+                return False
+        return True
+    return False
+
+
+class JSONCompressionMiddleware:
+    """
+    Negotiated gzip for JSON responses of at least minimum_size bytes.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, compresslevel: int = 6):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.compresslevel = compresslevel
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_headers = Headers(scope=scope)
+        if not accepts_gzip(request_headers.get("accept-encoding")):
+            await self.app(scope, receive, self._vary_only(send))
+            return
+        if_none_match = request_headers.get("if-none-match")
+
+        start_message: Optional[Message] = None
+        passthrough = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start_message, passthrough
+
+            if message["type"] == "http.response.start":
+                headers = Headers(raw=message["headers"])
+                content_type = headers.get("content-type", "")
+                if message["status"] == 304:
+                    passthrough = True
+                    headers = MutableHeaders(scope=message)
+                    headers.add_vary_header("Accept-Encoding")
+                    etag = headers.get("etag")
+                    if etag and _requested_gzip_variant(if_none_match, etag):
+                        headers["ETag"] = gzip_etag(etag)
+                    await send(message)
+                elif headers.get("content-encoding") or not content_type.startswith(COMPRESSIBLE_TYPES):
+                    passthrough = True
+                    await send(message)
+                else:
+                    start_message = message
+                return
+
+            if passthrough or message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            if message.get("more_body", False):
+                # Streaming body: forward unchanged
+                passthrough = True
+                MutableHeaders(raw=start_message["headers"]).add_vary_header("Accept-Encoding")
+                await send(start_message)
+                await send(message)
+                return
+
+            headers = MutableHeaders(raw=start_message["headers"])
+            headers.add_vary_header("Accept-Encoding")
+            if len(body) >= self.minimum_size:
+                body = gzip.compress(body, compresslevel=self.compresslevel)
+                headers["Content-Encoding"] = "gzip"
+                headers["Content-Length"] = str(len(body))
+                if "etag" in headers:
+                    headers["ETag"] = gzip_etag(headers["etag"])
+            await send(start_message)
+            await send({"type": "http.response.body", "body": body, "more_body": False})
+
+        await self.app(scope, receive, send_wrapper)
+
+    @staticmethod
+    def _vary_only(send: Send) -> Send:
+        """send that adds Vary: Accept-Encoding to JSON and 304 responses (identity clients)."""
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                if message["status"] == 304 or headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES):
+                    headers.add_vary_header("Accept-Encoding")
+            await send(message)
+        return send_wrapper
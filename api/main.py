@@ -5,10 +5,15 @@ Main entry point for the REST API
 
 from fastapi import FastAPI, HTTPException, BackgroundTasks
 from fastapi.middleware.cors import CORSMiddleware
+from api.compression import JSONCompressionMiddleware
+from api.profiling import RequestProfilerMiddleware
 from fastapi.responses import StreamingResponse
 from contextlib import asynccontextmanager
 import os
-from dotenv import load_dotenv
+from utils.env import load_env
+
+# Load environment variables before the route modules read their settings
+load_env()
 
 from api.routes import (
     intent,
@@ -19,16 +24,21 @@ from api.routes import (
     events,
     questionnaire,
     categories,
+    prompts,
+    metrics,
+    debug,
     unified
 )
+from utils.logger import get_logger, configure_logging, shutdown_logging
 
-# Load environment variables
-load_dotenv()
+logger = get_logger(__name__)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Startup and shutdown events"""
+    configure_logging()
+    
     # Startup: Start background event processor
     from api.stream_manager import get_stream_manager
     import asyncio
@@ -37,7 +47,21 @@ async def lifespan(app: FastAPI):
     # Start background processor (queue is already initialized in __init__)
     if stream_manager._processor_task is None or (stream_manager._processor_task and stream_manager._processor_task.done()):
         stream_manager._processor_task = asyncio.create_task(stream_manager._process_sync_event_queue())
-        print("[STREAM_MANAGER] Background event processor started")
+        logger.info("Background event processor started")
+    
+    # Filesystem setup: project store and event log directories
+    from storage.project_store import get_project_store
+    from utils.event_logger import get_event_logger
+    get_project_store()
+    get_event_logger().prepare()
+    
+    # Compile the static catalog responses once, before the first request
+    from api.catalog import get_static_catalog
+    get_static_catalog()
+    
+    # Precompile prompt template prefixes per (provider, page_type)
+    from prompts import get_prompt_templates
+    get_prompt_templates()
     
     yield
     
@@ -48,7 +72,25 @@ async def lifespan(app: FastAPI):
             await stream_manager._processor_task
         except asyncio.CancelledError:
             pass
-        print("[STREAM_MANAGER] Background event processor stopped")
+        logger.info("Background event processor stopped")
+    
+    # Shutdown: Cancel speculative generations still running
+    import api.speculation as speculation
+    if speculation._speculation_registry is not None:
+        await speculation._speculation_registry.close()
+    
+    # Shutdown: Delete provider-side prompt caches so they stop accruing storage
+    import models.prompt_cache as prompt_cache
+    if prompt_cache._prompt_cache is not None:
+        await asyncio.to_thread(prompt_cache._prompt_cache.close)
+    
+    # Shutdown: Finish the cassette file when recording provider calls
+    import models.cassette as cassette
+    if cassette._cassette is not None:
+        cassette._cassette.close()
+    
+    # Shutdown: Flush queued log records
+    shutdown_logging()
 
 
 # Initialize FastAPI app
@@ -71,6 +113,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Gzip JSON responses (large project payloads) when the client accepts it
+app.add_middleware(JSONCompressionMiddleware, minimum_size=1024)
+
+# Per-request cProfile for admins ("X-Profile: cprofile"); outermost, so it covers the whole request
+app.add_middleware(RequestProfilerMiddleware)
+
 # Include routers
 # Unified endpoint (single API for all operations)
 app.include_router(unified.router, prefix="/api", tags=["Unified API"])
@@ -84,6 +132,10 @@ app.include_router(project.router, prefix="/api/v1", tags=["Project"])
 app.include_router(events.router, prefix="/api/v1", tags=["Events"])
 app.include_router(questionnaire.router, prefix="/api/v1", tags=["Questionnaire"])
 app.include_router(categories.router, prefix="/api/v1", tags=["Categories"])
+app.include_router(prompts.router, prefix="/api/v1", tags=["Prompts"])
+app.include_router(metrics.router, prefix="/api/v1", tags=["Metrics"])
+app.include_router(metrics.prometheus_router, tags=["Metrics"])
+app.include_router(debug.router, tags=["Debug"])
 
 
 @app.get("/")
@@ -116,19 +116,60 @@ class ProjectGenerationRequest(BaseModel):
     project_id: Optional[str] = Field(None, description="Optional project ID")
     conversation_id: Optional[str] = Field(None, description="Optional conversation ID")
     model_family: Optional[str] = Field(None, description="Model family: Gemini, Anthropic, or OpenAI (defaults to Gemini)")
+    response_mode: Optional[str] = Field(
+        "inline",
+        description="'inline' returns every file in the response; 'manifest' returns a file manifest with per-file URLs instead"
+    )
+    generation_mode: Optional[str] = Field(
+        None,
+        description="'single' generates the project in one call; 'fanout' plans it and generates each page in parallel (defaults to GENERATION_MODE)"
+    )
+    speculative: Optional[bool] = Field(
+        None,
+        description="If questions are needed, return them immediately and generate with default answers in the background (defaults to SPECULATIVE_GENERATION)"
+    )
+    semantic_cache: Optional[bool] = Field(
+        None,
+        description="Set to false to skip the semantic project cache for this request (enabled by SEMANTIC_CACHE_MODE)"
+    )
+
+
+class ProjectFileRef(BaseModel):
+    """Reference to a single stored project file"""
+    path: str = Field(..., description="File path within the project")
+    size: int = Field(..., description="File size in bytes")
+    hash: str = Field(..., description="sha256 of the file content")
+    url: str = Field(..., description="URL to fetch the file content")
+
+
+class ProjectManifest(BaseModel):
+    """Project metadata plus per-file references instead of inlined content"""
+    name: Optional[str] = Field(None, description="Project name")
+    description: Optional[str] = Field(None, description="Project description")
+    meta: Optional[Dict[str, Any]] = Field(None, description="Project meta")
+    dirents: Optional[Dict[str, Any]] = Field(None, description="Project dirents")
+    files: List[ProjectFileRef] = Field(..., description="File references")
 
 
 class ProjectGenerationResponse(BaseModel):
     """Response model for project generation"""
     project_id: str = Field(..., description="Generated project ID")
     conversation_id: Optional[str] = Field(None, description="Conversation ID")
-    project: Optional[Dict[str, Any]] = Field(None, description="Generated project JSON (None if questions were emitted)")
+    project: Optional[Dict[str, Any]] = Field(None, description="Generated project JSON (None if questions were emitted or response_mode is 'manifest')")
+    manifest: Optional[ProjectManifest] = Field(None, description="File manifest (response_mode 'manifest' only)")
+    version: Optional[int] = Field(None, description="Stored project version")
+    etag: Optional[str] = Field(None, description="Content hash of the stored version")
     files_count: Optional[int] = Field(None, description="Number of files in the project")
     page_type: Optional[str] = Field(None, description="Detected page type")
     model_used: Optional[str] = Field(None, description="Model used for generation (deprecated, use model_info)")
     model_info: ModelInfo = Field(..., description="Model information with family and name")
     models_used: Optional[List[ModelInfo]] = Field(None, description="All models used in the pipeline (intent, page_type, generation, etc.)")
     generation_time_seconds: Optional[float] = Field(None, description="Time taken for generation")
+    fanout: Optional[Dict[str, Any]] = Field(None, description="Fan-out timing and consistency report (generation_mode 'fanout' only)")
+    speculation: Optional[str] = Field(None, description="Speculative generation state: 'pending', 'reused' or 'modified'")
+    semantic_cache: Optional[Dict[str, Any]] = Field(None, description="Semantic cache match used for this project: kind ('hit' or 'seed'), source project, version and score")
+    usage: Optional[Dict[str, Any]] = Field(None, description="Model token usage and estimated cost (USD) of this request, in total and by_operation")
+    trace_id: Optional[str] = Field(None, description="Trace of this request (GET /debug/traces/{trace_id})")
     message: Optional[str] = Field(None, description="Optional message (e.g., when questions are emitted)")
     requires_questionnaire: Optional[bool] = Field(False, description="True if questionnaire answers are needed")
 
@@ -144,13 +185,23 @@ class ProjectModificationRequest(BaseModel):
     project_id: Optional[str] = Field(None, description="Project ID to modify (if project_json not provided)")
     conversation_id: Optional[str] = Field(None, description="Optional conversation ID")
     model_family: Optional[str] = Field(None, description="Model family: Gemini, Anthropic, or OpenAI (defaults to Gemini)")
+    response_mode: Optional[str] = Field(
+        "inline",
+        description="'inline' returns every file in the response; 'manifest' returns a file manifest with per-file URLs instead"
+    )
 
 
 class ProjectModificationResponse(BaseModel):
     """Response model for project modification"""
     project_id: str = Field(..., description="Project ID")
-    modified_project: Dict[str, Any] = Field(..., description="Modified project JSON")
+    modified_project: Optional[Dict[str, Any]] = Field(None, description="Modified project JSON (None if response_mode is 'manifest')")
+    manifest: Optional[ProjectManifest] = Field(None, description="File manifest (response_mode 'manifest' only)")
+    version: Optional[int] = Field(None, description="Stored project version")
+    etag: Optional[str] = Field(None, description="Content hash of the stored version")
     complexity: str = Field(..., description="Modification complexity: small, medium, complex")
+    chunked: Optional[Dict[str, Any]] = Field(None, description="Chunked modification report (projects too large for one call only)")
+    usage: Optional[Dict[str, Any]] = Field(None, description="Model token usage and estimated cost (USD) of this request, in total and by_operation")
+    trace_id: Optional[str] = Field(None, description="Trace of this request (GET /debug/traces/{trace_id})")
     model_used: str = Field(..., description="Model used for modification (deprecated, use model_info)")
     model_info: ModelInfo = Field(..., description="Model information with family and name")
     modification_time_seconds: Optional[float] = Field(None, description="Time taken for modification")
@@ -163,7 +214,10 @@ class ProjectModificationResponse(BaseModel):
 class ProjectResponse(BaseModel):
     """Response model for project retrieval"""
     project_id: str = Field(..., description="Project ID")
-    project: Dict[str, Any] = Field(..., description="Project JSON")
+    project: Optional[Dict[str, Any]] = Field(None, description="Project JSON (None if view is 'manifest')")
+    manifest: Optional[ProjectManifest] = Field(None, description="File manifest (view 'manifest' only)")
+    version: Optional[int] = Field(None, description="Project version")
+    etag: Optional[str] = Field(None, description="Content hash of this version (also sent as the ETag header)")
     created_at: Optional[datetime] = Field(None, description="Creation timestamp")
     modified_at: Optional[datetime] = Field(None, description="Last modification timestamp")
 
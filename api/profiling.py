@@ -0,0 +1,71 @@
+"""
+Request profiling middleware
+
+Runs a request under cProfile when it carries "X-Profile: cprofile" and a
+valid X-Admin-Token (see utils.profiler). The profile covers the whole
+response, including streamed bodies, and its id is returned in the
+X-Profile-Id response header. Other requests pay for one header scan.
+"""
+
+import time
+from typing import Optional
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from utils.profiler import admin_token_valid, get_request_profiles, new_profile_id
+
+
+PROFILE_HEADER = b"x-profile"
+TOKEN_HEADER = b"x-admin-token"
+
+
+def _profile_requested(scope: Scope) -> Optional[str]:
+    """Admin token of a request asking for a profile, else None."""
+    requested = False
+    token = None
+    for name, value in scope.get("headers", ()):
+        if name == PROFILE_HEADER:
+            requested = value.strip().lower() in (b"cprofile", b"1", b"true")
+        elif name == TOKEN_HEADER:
+            token = value.decode("latin-1")
+    return token if requested else None
+
+
+class RequestProfilerMiddleware:
+    """
+    Per-request cProfile for admins.
+
+    A request that asks for a profile while another one is being profiled
+    runs unprofiled with "X-Profile-Id: busy".
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = _profile_requested(scope)
+        if token is None or not admin_token_valid(token):
+            await self.app(scope, receive, send)
+            return
+
+        profiles = get_request_profiles()
+        profiler = profiles.start()
+        profile_id = new_profile_id() if profiler is not None else "busy"
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                MutableHeaders(scope=message)["X-Profile-Id"] = profile_id
+            await send(message)
+
+        if profiler is None:
+            await self.app(scope, receive, send_wrapper)
+            return
+        started = time.time()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiles.finish(profile_id, profiler, scope.get("method", ""), scope.get("path", ""), started)
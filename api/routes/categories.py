@@ -2,29 +2,23 @@
 Category Routes
 """
 
-from fastapi import APIRouter, HTTPException
-from api.models import CategoriesResponse, CategoryInfo
-from data.page_categories import get_all_categories
+from fastapi import APIRouter, HTTPException, Request
+from api.models import CategoriesResponse
+from api.catalog import get_static_catalog
 
 router = APIRouter()
 
 
 @router.get("/categories", response_model=CategoriesResponse)
-async def get_categories():
+async def get_categories(request: Request):
     """
     Get all page type categories for user selection.
     
     Returns a map of category keys to their display information.
+    Served from the pre-encoded static catalog (ETag + Cache-Control).
     """
     try:
-        categories_dict = get_all_categories()
-        
-        categories_info = {
-            key: CategoryInfo(**info)
-            for key, info in categories_dict.items()
-        }
-        
-        return CategoriesResponse(categories=categories_info)
+        return get_static_catalog().categories.respond(request)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get categories: {str(e)}")
 
@@ -0,0 +1,135 @@
+"""
+Debug Routes
+"""
+
+import asyncio
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query, Header, Depends
+from fastapi.responses import Response, PlainTextResponse
+from utils.tracing import get_trace_buffer, TRACING
+from utils.profiler import (
+    admin_token_valid,
+    sample_stacks,
+    get_request_profiles,
+    ProfilerBusyError,
+    ADMIN_TOKEN,
+    PROFILER_MAX_SECONDS,
+    DEFAULT_INTERVAL_MS,
+    MIN_INTERVAL_MS,
+)
+
+router = APIRouter()
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """
+    Debug endpoints (traces and profiler) need ADMIN_TOKEN set and sent in
+    X-Admin-Token: traces carry project and conversation IDs.
+    """
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Debug endpoints disabled (set ADMIN_TOKEN to enable)")
+    if not admin_token_valid(x_admin_token):
+        raise HTTPException(status_code=403, detail="Invalid or missing X-Admin-Token")
+
+
+@router.get("/debug/traces", dependencies=[Depends(require_admin)])
+async def list_traces(limit: int = Query(50, ge=1, le=1000, description="Most recent traces to list")):
+    """
+    Recent traces held in the in-process ring buffer.
+    
+    Per trace: root span name, start, duration, span count and how many
+    spans ended in an error, most recent first. Generation and modification
+    responses and every streamed event carry their trace_id.
+    """
+    try:
+        return {"enabled": TRACING, "traces": get_trace_buffer().summaries(limit)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to list traces: {str(e)}")
+
+
+@router.get("/debug/traces/{trace_id}", dependencies=[Depends(require_admin)])
+async def get_trace(trace_id: str, format: str = Query("tree", description="'tree' (nested spans) or 'otlp' (OTLP/JSON export)")):
+    """
+    One trace: its spans as a parent/child tree with durations, status and
+    attributes (model, operation, tokens, parse strategy, ...), or as an
+    OTLP/JSON ExportTraceServiceRequest for any OpenTelemetry backend.
+    """
+    if format not in ("tree", "otlp"):
+        raise HTTPException(status_code=400, detail="format must be 'tree' or 'otlp'")
+    buffer = get_trace_buffer()
+    trace = buffer.get(trace_id) if format == "tree" else buffer.otlp(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail=f"Trace {trace_id} not found (it may have left the buffer)")
+    return trace
+
+
+@router.get("/debug/profile/sample", dependencies=[Depends(require_admin)])
+async def sample_profile(
+    seconds: float = Query(10.0, gt=0, le=PROFILER_MAX_SECONDS, description="How long to sample"),
+    interval_ms: float = Query(DEFAULT_INTERVAL_MS, ge=MIN_INTERVAL_MS, le=1000, description="Time between samples"),
+    format: str = Query("collapsed", description="'collapsed' (flamegraph.pl / speedscope input) or 'json' (top stacks and functions)"),
+    idle: bool = Query(False, description="Include threads blocked waiting for work (event loop select, idle executor workers)"),
+):
+    """
+    Sample the Python stacks of every thread of this worker for `seconds`.
+    
+    The response arrives when sampling ends. Collapsed output is one line
+    per distinct stack ("thread;outer;...;inner count"); json adds the
+    sample count, the most frequent leaf functions and the measured
+    overhead (fraction of wall time the sampler held the GIL). One session
+    runs at a time (409 otherwise).
+    """
+    if format not in ("collapsed", "json"):
+        raise HTTPException(status_code=400, detail="format must be 'collapsed' or 'json'")
+    try:
+        sampler = await asyncio.to_thread(sample_stacks, seconds, interval_ms, idle)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to sample stacks: {str(e)}")
+    if format == "json":
+        return sampler.summary(seconds)
+    return PlainTextResponse(sampler.collapsed())
+
+
+@router.get("/debug/profile/requests", dependencies=[Depends(require_admin)])
+async def list_request_profiles():
+    """
+    Kept cProfile results of requests sent with "X-Profile: cprofile",
+    most recent first: profile_id, method, path and duration.
+    """
+    try:
+        return {"profiles": get_request_profiles().list()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to list profiles: {str(e)}")
+
+
+@router.get("/debug/profile/requests/{profile_id}", dependencies=[Depends(require_admin)])
+async def get_request_profile(
+    profile_id: str,
+    format: str = Query("text", description="'text' (pstats report) or 'pstats' (binary dump for pstats.Stats / snakeviz)"),
+    sort: str = Query("cumulative", description="pstats sort key for the text report"),
+    limit: int = Query(50, ge=1, le=1000, description="Functions in the text report"),
+):
+    """
+    One request profile, as a pstats report or as a pstats dump file.
+    """
+    if format not in ("text", "pstats"):
+        raise HTTPException(status_code=400, detail="format must be 'text' or 'pstats'")
+    profiles = get_request_profiles()
+    if format == "pstats":
+        dump = profiles.pstats_dump(profile_id)
+        if dump is None:
+            raise HTTPException(status_code=404, detail=f"Profile {profile_id} not found")
+        return Response(
+            content=dump,
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": f'attachment; filename="{profile_id}.pstats"'},
+        )
+    try:
+        report = profiles.text(profile_id, sort=sort, limit=limit)
+    except KeyError:
+        raise HTTPException(status_code=400, detail=f"Unknown sort key: {sort}")
+    if report is None:
+        raise HTTPException(status_code=404, detail=f"Profile {profile_id} not found")
+    return PlainTextResponse(report)
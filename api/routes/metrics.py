@@ -0,0 +1,70 @@
+"""
+Metrics Routes
+"""
+
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import Response
+from router.adaptive import get_model_selector
+from utils.metrics import render_metrics, CONTENT_TYPE
+from storage.usage_store import get_usage_store, GROUP_FIELDS
+
+router = APIRouter()
+
+# Mounted without a prefix so scrapers find it at the conventional /metrics
+prometheus_router = APIRouter()
+
+
+@prometheus_router.get("/metrics")
+async def prometheus_metrics():
+    """
+    Prometheus metrics (text exposition format).
+    
+    Per-stage latency histograms (classify, analyze, chat, prompt_build,
+    provider_call, parse, repair, save, event_fanout), provider call latency
+    per model/operation/outcome, retry, fallback and parse-strategy counters,
+    SSE subscriber counts and adaptive model selection decisions.
+    """
+    return Response(content=render_metrics(), media_type=CONTENT_TYPE)
+
+
+@router.get("/model-selection")
+async def model_selection_stats():
+    """
+    Adaptive model selection state.
+    
+    Per model and operation: rolling p50/p95 latency, error rate and
+    parse-failure rate. Per family and operation: how often each candidate
+    was chosen, the last choice and why, and which candidates were excluded.
+    Includes the effective candidate/constraint policy.
+    """
+    try:
+        return get_model_selector().snapshot()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get model selection stats: {str(e)}")
+
+
+@router.get("/usage")
+async def usage_report(
+    project_id: Optional[str] = Query(None, description="Only calls made for this project"),
+    conversation_id: Optional[str] = Query(None, description="Only calls made for this conversation"),
+    model: Optional[str] = Query(None, description="Only calls to this model"),
+    operation: Optional[str] = Query(None, description="Only this pipeline operation (e.g. generation, page_type)"),
+    since: Optional[float] = Query(None, description="Only calls after this Unix timestamp"),
+    group_by: str = Query("operation", description=f"Comma-separated grouping fields: {', '.join(GROUP_FIELDS)}"),
+):
+    """
+    Token usage and estimated cost of model calls.
+    
+    Totals (calls, prompt, completion and cached tokens, cost in USD) of the
+    matching calls, plus one row per group ordered by cost, so the most
+    expensive pipeline steps, models or projects come first.
+    """
+    fields = [field.strip() for field in group_by.split(",") if field.strip()]
+    unknown = [field for field in fields if field not in GROUP_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown group_by field(s): {', '.join(unknown)}. Use: {', '.join(GROUP_FIELDS)}")
+    try:
+        return get_usage_store().query(project_id, conversation_id, model, operation, since, fields)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to query usage: {str(e)}")
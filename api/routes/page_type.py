@@ -2,17 +2,16 @@
 Page Type Classification Routes
 """
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from api.models import (
     PageTypeClassificationRequest,
     PageTypeClassificationResponse,
     PageTypeReferenceResponse,
-    PageTypeInfo,
     ModelInfo
 )
 from api.utils import get_model_info
+from api.catalog import get_static_catalog
 from models.gemini_client import classify_page_type
-from data.page_types_reference import get_page_type_by_key, PAGE_TYPES
 
 router = APIRouter()
 
@@ -58,37 +57,27 @@ async def classify_page_type_endpoint(request: PageTypeClassificationRequest):
 
 
 @router.get("/page-type/{page_type_key}", response_model=PageTypeReferenceResponse)
-async def get_page_type_reference(page_type_key: str):
+async def get_page_type_reference(page_type_key: str, request: Request):
     """
     Get page type reference information including core pages and components.
+    
+    Served from the pre-encoded static catalog (ETag + Cache-Control).
     """
     try:
-        page_type_info = get_page_type_by_key(page_type_key)
-        
-        if page_type_info:
-            return PageTypeReferenceResponse(
-                page_type=PageTypeInfo(**page_type_info),
-                available_types=list(PAGE_TYPES.keys())
-            )
-        else:
-            return PageTypeReferenceResponse(
-                page_type=None,
-                available_types=list(PAGE_TYPES.keys())
-            )
+        return get_static_catalog().page_type(page_type_key).respond(request)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get page type reference: {str(e)}")
 
 
 @router.get("/page-types", response_model=PageTypeReferenceResponse)
-async def list_page_types():
+async def list_page_types(request: Request):
     """
     List all available page types.
+    
+    Served from the pre-encoded static catalog (ETag + Cache-Control).
     """
     try:
-        return PageTypeReferenceResponse(
-            page_type=None,
-            available_types=list(PAGE_TYPES.keys())
-        )
+        return get_static_catalog().page_types.respond(request)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to list page types: {str(e)}")
 
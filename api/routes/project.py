@@ -5,67 +5,311 @@ Project Generation and Modification Routes
 import os
 import json
 import time
-from fastapi import APIRouter, HTTPException, BackgroundTasks
+import asyncio
+import mimetypes
+from typing import Optional
+from urllib.parse import quote
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from api.models import (
     ProjectGenerationRequest,
     ProjectGenerationResponse,
     ProjectModificationRequest,
     ProjectModificationResponse,
     ProjectResponse,
+    ProjectManifest,
+    ProjectFileRef,
     ModelInfo
 )
-from api.utils import get_model_info
-from models.gemini_client import (
-    generate_text as gemini_generate_text,
-    parse_project_json,
-    save_project_files
-)
-# Import other providers' generate_text functions with aliases to avoid name conflicts
-try:
-    from models.claude_client import generate_text as claude_generate_text
-except ImportError:
-    claude_generate_text = None
-try:
-    from models.gpt_client import generate_text as gpt_generate_text
-except ImportError:
-    gpt_generate_text = None
+from api.utils import get_model_info, etag_matches
+from models.gemini_client import parse_project_json
 from models.unified_client import (
+    generate_project_text_unified,
     classify_page_type_unified,
     analyze_query_detail_unified,
     classify_modification_complexity_unified
 )
-from router.router_config import get_router_model, get_main_model, get_modification_model, get_provider
+from router.router_config import get_router_model, get_main_model, get_provider
+from router.model_router import route_request, TokenBudgetError, GENERATION_OUTPUT_TOKENS, MODIFICATION_OUTPUT_GROWTH
+from router.adaptive import get_model_selector, modification_operation
+from utils.metrics import StageTimer, RETRIES, FALLBACKS
+from storage.usage_store import usage_scope, attribute_usage
+from utils.tracing import span, current_span, SPAN_KIND_SERVER
+from utils.tokenizer import count_tokens
 from data.page_types_reference import get_page_type_by_key
-from data.questionnaire_config import has_questionnaire
+from data.questionnaire_config import has_questionnaire, get_default_answers
 from events import EventEmitter
 from utils.event_logger import get_event_logger
+from storage import get_project_store, new_project_id, validate_project_id, materialize_project_async
+from storage.export import iter_archive, EXPORT_FORMATS
+from storage.semantic_cache import get_semantic_cache, SEMANTIC_CACHE_MODE
+from prompts import get_prompt_templates, render_modification_prompt
+from scaffold import SCAFFOLD_ENABLED, merge_scaffold
+from models.fanout import generate_project_fanout, FanoutError
+from models.chunked_modify import modify_project_chunked
+from api.speculation import (
+    SPECULATIVE_GENERATION,
+    SPECULATION_MAX_CHANGES,
+    get_speculation_registry,
+    in_speculation,
+    diff_answers,
+    build_reconcile_instruction,
+)
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
 
 router = APIRouter()
 
-OUTPUT_DIR = "output"
-MODIFIED_DIR = "modified_output"
-os.makedirs(OUTPUT_DIR, exist_ok=True)
-os.makedirs(MODIFIED_DIR, exist_ok=True)
 
+def _resolve_project_id(project_id):
+    """
+    Validate a client-supplied project_id or allocate a new unique one.
+
+    Raises:
+        HTTPException: 400 if the supplied project_id is not a safe identifier
+    """
+    if not project_id:
+        return new_project_id()
+    try:
+        return validate_project_id(project_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def _load_project(project_id: str, version: Optional[int] = None):
+    """
+    Load a stored version of a project (the latest when version is None).
+
+    Raises:
+        HTTPException: 400 for an invalid project_id, 404 if it is unknown
+    """
+    try:
+        record = get_project_store().get(project_id, version)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not record:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Project not found: {project_id}" + (f" (version {version})" if version else "")
+        )
+    return record
+
+
+RESPONSE_MODES = ("inline", "manifest")
 
-def get_latest_project():
-    """Get the latest project from output directories"""
-    if os.path.exists(MODIFIED_DIR):
-        versions = sorted(
-            d for d in os.listdir(MODIFIED_DIR) if d.startswith("project_")
+
+def _validate_response_mode(mode: Optional[str]) -> str:
+    """Normalize response_mode / view, raising 400 for unknown values."""
+    mode = (mode or "inline").lower()
+    if mode not in RESPONSE_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown response mode: {mode}. Supported: {', '.join(RESPONSE_MODES)}"
+        )
+    return mode
+
+
+GENERATION_MODES = ("single", "fanout")
+DEFAULT_GENERATION_MODE = os.getenv("GENERATION_MODE", "single").lower()
+
+
+def _validate_generation_mode(mode: Optional[str]) -> str:
+    """Normalize generation_mode (default from GENERATION_MODE), raising 400 for unknown values."""
+    mode = (mode or DEFAULT_GENERATION_MODE).lower()
+    if mode not in GENERATION_MODES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown generation mode: {mode}. Supported: {', '.join(GENERATION_MODES)}"
         )
-        if versions:
-            path = os.path.join(MODIFIED_DIR, versions[-1], "project.json")
-            if os.path.exists(path):
-                with open(path) as f:
-                    return path, json.load(f)["project"]
+    return mode
+
+
+def _build_manifest(project_id: str, manifest: dict) -> ProjectManifest:
+    """Convert a stored version manifest into the API manifest with per-file URLs."""
+    meta = manifest.get("project_meta", {})
+    version = manifest["version"]
+    return ProjectManifest(
+        name=meta.get("name"),
+        description=meta.get("description"),
+        meta=meta.get("meta"),
+        dirents=meta.get("dirents"),
+        files=[
+            ProjectFileRef(
+                path=path,
+                size=entry.get("size", 0),
+                hash=entry["blob"],
+                url=f"/api/v1/project/{project_id}/files/{quote(path)}?version={version}"
+            )
+            for path, entry in manifest.get("files", {}).items()
+        ]
+    )
+
+
+def _cache_headers(etag: str, immutable: bool) -> dict:
+    """ETag plus Cache-Control: pinned versions never change, latest must revalidate."""
+    return {
+        "ETag": f'"{etag}"',
+        "Cache-Control": "public, max-age=31536000, immutable" if immutable else "no-cache",
+    }
+
 
-    base = os.path.join(OUTPUT_DIR, "project.json")
-    if os.path.exists(base):
-        with open(base) as f:
-            return base, json.load(f)["project"]
+def _response_from_modification(mod_response: ProjectModificationResponse, conversation_id: str, page_type_key: str, models_used: list, start_time: float, **extra) -> ProjectGenerationResponse:
+    """Present a modification of an existing project as the result of a generation request."""
+    if mod_response.manifest is not None:
+        files_count = len(mod_response.manifest.files)
+    else:
+        files_count = len((mod_response.modified_project or {}).get("files", {}))
+    return ProjectGenerationResponse(
+        project_id=mod_response.project_id,
+        conversation_id=conversation_id,
+        project=mod_response.modified_project,
+        manifest=mod_response.manifest,
+        version=mod_response.version,
+        etag=mod_response.etag,
+        files_count=files_count,
+        page_type=page_type_key,
+        model_used=mod_response.model_used,
+        model_info=mod_response.model_info,
+        models_used=list(models_used) + [mod_response.model_info],
+        generation_time_seconds=time.time() - start_time,
+        **extra
+    )
 
-    return None, None
+
+async def _respond_from_semantic_cache(match, kind: str, request: ProjectGenerationRequest, project_id: str, conversation_id: str, page_type_key: str, model_family: str, response_mode: str, models_used: list, start_time: float) -> Optional[ProjectGenerationResponse]:
+    """
+    Serve a generation request from a similar stored project.
+
+    A hit copies the stored project into this project_id as-is; a seed applies
+    the request as a modification of it, so only the modified project is saved
+    under this project_id. Returns None if the stored project is gone or the
+    modification fails (generate normally).
+    """
+    store = get_project_store()
+    cache = get_semantic_cache()
+    source = await asyncio.to_thread(store.get, match.project_id, match.version)
+    if not source:
+        await asyncio.to_thread(cache.remove, match.project_id)
+        return None
+
+    cache_info = {"kind": kind, "source_project_id": match.project_id, "source_version": match.version, "score": match.score}
+    logger.info("%s for '%s' -> %s v%s (score %s)", kind, request.user_query[:60], match.project_id, match.version, match.score)
+
+    if kind == "seed":
+        instruction_lines = [
+            "This project was built for a similar request. Adapt it to the following request, "
+            "changing only what differs and keeping everything else unchanged:",
+            request.user_query,
+        ]
+        for key, value in (request.questionnaire_answers or {}).items():
+            instruction_lines.append(f"- {key}: {', '.join(value) if isinstance(value, list) else value}")
+        try:
+            # The stored project is the base as-is; nothing is saved unless the modification succeeds
+            mod_response = await modify_project(ProjectModificationRequest(
+                instruction="\n".join(instruction_lines),
+                project_json=source["project"],
+                project_id=project_id,
+                conversation_id=conversation_id,
+                model_family=model_family,
+                response_mode=response_mode
+            ))
+        except HTTPException as e:
+            logger.warning("Seeded modification failed (%s); generating from scratch", e.detail)
+            FALLBACKS.labels("semantic_seed_to_generate").inc()
+            return None
+        return _response_from_modification(
+            mod_response, conversation_id, page_type_key, models_used, start_time, semantic_cache=cache_info
+        )
+
+    # Blobs are content-addressed, so copying a stored project writes no file content
+    saved = await asyncio.to_thread(store.save_version, project_id, source["project"], "cache")
+    project = source["project"]
+    await materialize_project_async(project, store.workspace_dir(project_id), prune=True)
+    manifest = None
+    if response_mode == "manifest":
+        manifest = _build_manifest(project_id, await asyncio.to_thread(store.get_manifest, project_id, saved["version"]))
+    main_model = get_main_model(model_family)
+    return ProjectGenerationResponse(
+        project_id=project_id,
+        conversation_id=conversation_id,
+        project=project if manifest is None else None,
+        manifest=manifest,
+        version=saved["version"],
+        etag=saved["etag"],
+        files_count=len(project.get("files", {})),
+        page_type=page_type_key,
+        model_used=main_model,
+        model_info=ModelInfo(**get_model_info(main_model)),
+        models_used=models_used,
+        generation_time_seconds=time.time() - start_time,
+        semantic_cache=cache_info
+    )
+
+
+async def _reconcile_speculation(spec, request: ProjectGenerationRequest, response_mode: str, start_time: float) -> Optional[ProjectGenerationResponse]:
+    """
+    Reconcile questionnaire answers with a speculative default-answer generation.
+
+    Returns the response to send, or None if the project should be generated
+    from scratch (speculation failed or too many answers changed); the
+    speculation is then cancelled if it is still running.
+    """
+    registry = get_speculation_registry()
+    changed = diff_answers(spec.default_answers, request.questionnaire_answers)
+    if len(changed) > SPECULATION_MAX_CHANGES:
+        # Decided without waiting for the draft, which is no use here
+        logger.info("%s answers changed (max %s); regenerating", len(changed), SPECULATION_MAX_CHANGES)
+        registry.cancel(spec)
+        registry.record("regenerated")
+        return None
+
+    try:
+        spec_response = await spec.task
+    except Exception as e:
+        logger.warning("Speculative generation for %s unusable: %s", spec.project_id, e)
+        registry.record("failed")
+        return None
+
+    if not changed:
+        # Answers match the defaults: the speculative project is the answer
+        registry.record("reused")
+        manifest = None
+        if response_mode == "manifest":
+            store = get_project_store()
+            manifest = _build_manifest(spec.project_id, await asyncio.to_thread(store.get_manifest, spec.project_id, spec_response.version))
+        return spec_response.copy(update={
+            "conversation_id": request.conversation_id or spec_response.conversation_id,
+            "project": spec_response.project if manifest is None else None,
+            "manifest": manifest,
+            "generation_time_seconds": time.time() - start_time,
+            "speculation": "reused",
+        })
+
+    # A few answers changed: modify the speculative project instead of regenerating it
+    logger.info("%s answers changed (%s); modifying speculative project", len(changed), ', '.join(changed))
+    try:
+        mod_response = await modify_project(ProjectModificationRequest(
+            instruction=build_reconcile_instruction(spec.page_type_key, changed),
+            project_id=spec.project_id,
+            conversation_id=request.conversation_id,
+            model_family=request.model_family or spec.model_family,
+            response_mode=response_mode
+        ))
+    except HTTPException as e:
+        logger.warning("Targeted modification failed (%s); regenerating", e.detail)
+        registry.record("failed")
+        return None
+
+    registry.record("modified")
+    return _response_from_modification(
+        mod_response,
+        conversation_id=request.conversation_id or spec_response.conversation_id,
+        page_type_key=spec.page_type_key,
+        models_used=spec_response.models_used or [],
+        start_time=start_time,
+        speculation="modified"
+    )
 
 
 @router.post("/project/generate", response_model=ProjectGenerationResponse)
@@ -80,8 +324,32 @@ async def generate_project(request: ProjectGenerationRequest):
     4. Saves project files
     5. Returns the complete project structure
     """
+    with span("generate_project", kind=SPAN_KIND_SERVER) as root, usage_scope(request.project_id, request.conversation_id) as usage:
+        response = await _generate_project(request)
+    # Includes calls made by modifications this request ran internally
+    response.usage = usage.summary()
+    response.trace_id = root.trace_id
+    return response
+
+
+async def _generate_project(request: ProjectGenerationRequest) -> ProjectGenerationResponse:
     try:
         start_time = time.time()
+        response_mode = _validate_response_mode(request.response_mode)
+        generation_mode = _validate_generation_mode(request.generation_mode)
+        speculative = SPECULATIVE_GENERATION if request.speculative is None else request.speculative
+        
+        # Answers for a questionnaire whose defaults are already being generated speculatively
+        # (claimed whenever answers arrive, so a draft never outlives its follow-up)
+        spec = None
+        if request.questionnaire_answers and not in_speculation():
+            spec = get_speculation_registry().claim(request.project_id)
+            if spec is not None and not speculative:
+                get_speculation_registry().cancel(spec)
+            elif spec is not None:
+                reconciled = await _reconcile_speculation(spec, request, response_mode, start_time)
+                if reconciled is not None:
+                    return reconciled
         
         # Get model_family from request (default to Gemini)
         from router.router_config import normalize_model_family
@@ -90,8 +358,10 @@ async def generate_project(request: ProjectGenerationRequest):
         
         # Initialize event system
         event_logger = get_event_logger()
-        project_id = request.project_id or f"proj_{int(time.time())}"
+        project_id = _resolve_project_id(request.project_id)
         conversation_id = request.conversation_id or f"conv_{int(time.time())}"
+        attribute_usage(project_id, conversation_id)
+        current_span().set_attributes({"project_id": project_id, "conversation_id": conversation_id})
         
         emitter = EventEmitter(
             project_id=project_id,
@@ -107,7 +377,7 @@ async def generate_project(request: ProjectGenerationRequest):
         models_used_list = []
         
         # Classify page type if not provided
-        page_type_key = request.page_type_key
+        page_type_key = request.page_type_key or (spec.page_type_key if spec else None)
         page_type_model = None
         if not page_type_key:
             page_type_key, page_type_meta = classify_page_type_unified(request.user_query, model_name=model_key)
@@ -116,6 +386,24 @@ async def generate_project(request: ProjectGenerationRequest):
         
         page_type_config = get_page_type_by_key(page_type_key)
         
+        # Near-duplicate of an earlier request: reuse (or modify) its project instead of generating
+        cache_mode = SEMANTIC_CACHE_MODE if request.semantic_cache is not False else "off"
+        if cache_mode in ("hit", "seed") and spec is None:
+            match = await asyncio.to_thread(
+                get_semantic_cache().lookup,
+                request.user_query, page_type_key, request.questionnaire_answers, request.wizard_inputs
+            )
+            kind = match.kind if match else None
+            if kind == "hit" or (kind == "seed" and cache_mode == "seed"):
+                cached = await _respond_from_semantic_cache(
+                    match, kind, request, project_id, conversation_id, page_type_key,
+                    model_family, response_mode, models_used_list, start_time
+                )
+                if cached is not None:
+                    emitter.emit_chat_message("Reused a project built for a similar request.")
+                    emitter.emit_stream_complete()
+                    return cached
+        
         # Analyze query detail
         query_model = get_router_model(model_family)
         needs_followup, confidence = analyze_query_detail_unified(request.user_query, model_name=model_key)
@@ -129,6 +417,7 @@ async def generate_project(request: ProjectGenerationRequest):
             
             if has_questionnaire(page_type_key):
                 questionnaire = get_questionnaire(page_type_key)
+                default_answers = get_default_answers(page_type_key)
                 emitter.emit_chat_message("I need to gather some additional information to create the perfect page for you.")
                 
                 # Emit questions as events (non-blocking - API continues)
@@ -147,6 +436,8 @@ async def generate_project(request: ProjectGenerationRequest):
                     content = {}
                     if question_type in ["mcq", "multi_select"]:
                         content["options"] = question_data.get("options", [])
+                        if q_id in default_answers:
+                            content["default"] = default_answers[q_id]
                     elif question_type == "open_ended":
                         content["placeholder"] = question_data.get("placeholder", "Enter your answer...")
                     
@@ -158,55 +449,58 @@ async def generate_project(request: ProjectGenerationRequest):
                         content=content
                     )
                 
+                if speculative:
+                    # Generate with the default answers in the background while the user answers;
+                    # the follow-up request with questionnaire_answers reconciles against it
+                    get_speculation_registry().start(
+                        project_id, page_type_key, default_answers, model_family,
+                        lambda: generate_project(ProjectGenerationRequest(
+                            user_query=request.user_query,
+                            page_type_key=page_type_key,
+                            questionnaire_answers=default_answers,
+                            wizard_inputs=request.wizard_inputs,
+                            project_id=project_id,
+                            conversation_id=conversation_id,
+                            model_family=model_family,
+                            response_mode="inline",
+                            generation_mode=generation_mode,
+                            speculative=False
+                        ))
+                    )
+                    emitter.emit_chat_message("Drafting your project with the default answers while you answer. Send questionnaire_answers with this project_id to finish.")
+                    main_model = get_main_model(model_family)
+                    return ProjectGenerationResponse(
+                        project_id=project_id,
+                        conversation_id=conversation_id,
+                        page_type=page_type_key,
+                        model_info=ModelInfo(**get_model_info(main_model)),
+                        models_used=models_used_list,
+                        generation_time_seconds=time.time() - start_time,
+                        message="Questionnaire pending; generating with default answers in the background",
+                        requires_questionnaire=True,
+                        speculation="pending"
+                    )
+                
                 emitter.emit_chat_message("Proceeding with generation using defaults. You can provide questionnaire_answers in a follow-up request for more customization.")
         
-        # Build generation prompt - make it more explicit for Claude/GPT
+        # Build generation prompt from the precompiled (provider, page_type) template
         provider = get_provider(model_family)
-        if provider == "gemini":
-            base_prompt = (
-                "Return exactly one JSON object describing a React+Vite+TypeScript project. "
-                "Schema must be: {\"project\": {\"name\": string, \"description\": string, \"files\": {...}, \"dirents\": {...}, \"meta\": {...}}}. "
-                "Files should be strings (escaped) or objects with a 'content' key. "
-                "Return only the JSON object and nothing else.\n\n"
-            )
-        else:
-            # More explicit prompt for Claude/GPT to ensure JSON-only output
-            base_prompt = (
-                "CRITICAL: You MUST return ONLY valid JSON. No markdown, no code blocks, no explanations, no text before or after.\n\n"
-                "Return exactly one JSON object describing a React+Vite+TypeScript project. "
-                "Schema must be: {\"project\": {\"name\": string, \"description\": string, \"files\": {...}, \"dirents\": {...}, \"meta\": {...}}}. "
-                "Files should be strings (escaped) or objects with a 'content' key.\n\n"
-                "IMPORTANT: Your response must start with { and end with }. Do NOT wrap in ```json or markdown. Return ONLY the raw JSON object.\n\n"
-            )
-        
-        # Add page type specific requirements
-        if page_type_config:
-            base_prompt += f"\n=== PAGE TYPE: {page_type_config['name']} ({page_type_config['category']}) ===\n"
-            base_prompt += f"Target User: {page_type_config['end_user']}\n\n"
-            
-            base_prompt += "REQUIRED CORE PAGES:\n"
-            for i, page in enumerate(page_type_config['core_pages'], 1):
-                base_prompt += f"{i}. {page}\n"
-            
-            base_prompt += "\n\nREQUIRED COMPONENTS TO IMPLEMENT:\n"
-            for i, component in enumerate(page_type_config['components'], 1):
-                base_prompt += f"{i}. **{component['name']}**: {component['description']}\n"
-        
-        # Add questionnaire answers if available
-        if request.questionnaire_answers:
-            base_prompt += "\n=== USER REQUIREMENTS (from questionnaire) ===\n"
-            for key, value in request.questionnaire_answers.items():
-                if isinstance(value, list):
-                    base_prompt += f"- {key}: {', '.join(value)}\n"
-                else:
-                    base_prompt += f"- {key}: {value}\n"
-        
-        # Add wizard inputs
+        template = get_prompt_templates().get(provider, page_type_key)
         wizard_inputs = request.wizard_inputs or {}
-        final_prompt = base_prompt + "USER_FIELDS:\n" + json.dumps(wizard_inputs, ensure_ascii=False)
-        
-        # Use main_model for generation (based on model_family)
-        webpage_model = get_main_model(model_family)
+        with StageTimer("prompt_build"):
+            prompt_parts = template.render(request.questionnaire_answers, wizard_inputs)
+        
+        # Use main_model for generation (based on model_family), sized to the prompt
+        try:
+            decision = route_request(
+                model_family,
+                count_tokens(prompt_parts.prefix, provider) + count_tokens(prompt_parts.suffix, provider),
+                GENERATION_OUTPUT_TOKENS,
+                preferred_model=get_model_selector().select(model_family, "generation")
+            )
+        except TokenBudgetError as e:
+            raise HTTPException(status_code=413, detail=f"Generation request too large: {e}")
+        webpage_model = decision.model
         
         emitter.emit_progress_init(
             steps=[
@@ -222,20 +516,28 @@ async def generate_project(request: ProjectGenerationRequest):
         emitter.emit_progress_update("generate", "in_progress")
         emitter.emit_thinking_start()
         
-        # Generate project - route to appropriate provider
-        # Use higher max_tokens for project generation (projects can be large)
-        if provider == "gemini":
-            output = gemini_generate_text(final_prompt, model=webpage_model)
-        elif provider == "anthropic":
-            if claude_generate_text is None:
-                raise HTTPException(status_code=500, detail="Claude client not available")
-            output = claude_generate_text(final_prompt, model=webpage_model, max_tokens=16384)
-        elif provider == "openai":
-            if gpt_generate_text is None:
-                raise HTTPException(status_code=500, detail="GPT client not available")
-            output = gpt_generate_text(final_prompt, model=webpage_model, max_tokens=16384)
-        else:
-            output = gemini_generate_text(final_prompt, model=webpage_model)
+        project = None
+        output = ""
+        fanout_report = None
+        if generation_mode == "fanout":
+            # Planner/worker mode: one plan call, then concurrent per-unit calls
+            try:
+                with span("fanout", model=webpage_model):
+                    project, fanout_report = await generate_project_fanout(
+                        provider, webpage_model, page_type_key,
+                        request.questionnaire_answers, wizard_inputs, emitter=emitter,
+                        model_family=model_family
+                    )
+            except FanoutError as e:
+                logger.warning("Fan-out failed (%s); falling back to single-call generation", e)
+                FALLBACKS.labels("fanout_to_single").inc()
+                emitter.emit_chat_message("Parallel generation failed; generating the project in a single pass...")
+        
+        if project is None:
+            # Generate project - route to appropriate provider
+            # Use higher max_tokens for project generation (projects can be large)
+            # The static prefix is passed separately so providers can serve it from their prompt cache
+            output = generate_project_text_unified(prompt_parts, provider, webpage_model, max_tokens=decision.max_tokens)
         elapsed_time = time.time() - start_time
         
         emitter.emit_thinking_end(duration_ms=int(elapsed_time * 1000))
@@ -243,57 +545,42 @@ async def generate_project(request: ProjectGenerationRequest):
         emitter.emit_progress_update("parse", "in_progress")
         
         # Parse project JSON
-        project = parse_project_json(output)
+        if project is None:
+            project = parse_project_json(output)
+            get_model_selector().record_parse(webpage_model, "generation", bool(project))
         
         # If parsing failed, try with a stricter prompt (retry once)
         if not project and provider != "gemini":
-            print(f"[PROJECT_GEN] First parse attempt failed. Output length: {len(output)} chars")
-            print(f"[PROJECT_GEN] Output preview (first 500 chars): {output[:500]}")
-            print(f"[PROJECT_GEN] Output preview (last 500 chars): {output[-500:]}")
+            logger.warning("First parse attempt failed. Output length: %s chars", len(output))
+            logger.debug("Output preview (first 500 chars): %s", output[:500])
+            logger.debug("Output preview (last 500 chars): %s", output[-500:])
             
             # Check if JSON appears incomplete (doesn't end with })
             if not output.strip().endswith('}'):
-                print("[PROJECT_GEN] WARNING: Output doesn't end with '}', might be truncated!")
+                logger.warning("Output doesn't end with '}', might be truncated!")
                 emitter.emit_chat_message("Response appears truncated. Retrying with higher token limit...")
             
             emitter.emit_chat_message("Retrying with stricter JSON prompt...")
             
-            # Create a stricter prompt
-            strict_prompt = (
-                "You are a JSON generator. Return ONLY valid JSON, nothing else.\n\n"
-                "CRITICAL RULES:\n"
-                "1. Start your response with {\n"
-                "2. End your response with }\n"
-                "3. Do NOT include markdown code blocks (no ```json or ```)\n"
-                "4. Do NOT include any text before or after the JSON\n"
-                "5. Do NOT include explanations or comments\n"
-                "6. Ensure all strings are properly escaped (use \\n for newlines, \\\" for quotes)\n"
-                "7. Ensure the JSON is complete and valid\n\n"
-            ) + final_prompt
-            
-            # Retry generation with higher token limit
-            if provider == "anthropic":
-                if claude_generate_text is None:
-                    raise HTTPException(status_code=500, detail="Claude client not available")
-                output = claude_generate_text(strict_prompt, model=webpage_model, max_tokens=16384)
-            elif provider == "openai":
-                if gpt_generate_text is None:
-                    raise HTTPException(status_code=500, detail="GPT client not available")
-                output = gpt_generate_text(strict_prompt, model=webpage_model, max_tokens=16384)
-            else:
-                # Fallback to gemini client (shouldn't happen due to condition, but safe)
-                output = gemini_generate_text(strict_prompt, model=webpage_model)
-            
-            project = parse_project_json(output)
+            RETRIES.labels("strict_json").inc()
+            with StageTimer("repair"):
+                # Create a stricter prompt
+                strict_parts = template.render(request.questionnaire_answers, wizard_inputs, strict=True)
+                
+                # Retry generation with the routed token limit
+                output = generate_project_text_unified(strict_parts, provider, webpage_model, max_tokens=decision.max_tokens)
+                
+                project = parse_project_json(output)
+            get_model_selector().record_parse(webpage_model, "generation", bool(project))
         
         if not project:
             # Log the actual output for debugging
             output_preview = output[:1000] if output else "No output received"
             output_end = output[-500:] if output and len(output) > 500 else output
-            print(f"[PROJECT_GEN] Parse failed. Model: {webpage_model}, Provider: {provider}")
-            print(f"[PROJECT_GEN] Output length: {len(output) if output else 0} characters")
-            print(f"[PROJECT_GEN] Output preview (first 1000 chars): {output_preview}")
-            print(f"[PROJECT_GEN] Output preview (last 500 chars): {output_end}")
+            logger.warning("Parse failed. Model: %s, Provider: %s", webpage_model, provider)
+            logger.warning("Output length: %s characters", len(output) if output else 0)
+            logger.debug("Output preview (first 1000 chars): %s", output_preview)
+            logger.debug("Output preview (last 500 chars): %s", output_end)
             
             # Try to get more detailed error from the parser
             try:
@@ -304,10 +591,10 @@ async def generate_project(request: ProjectGenerationRequest):
                     json_candidate = output[first_brace:last_brace+1]
                     json.loads(json_candidate)  # This will raise with specific error
             except json.JSONDecodeError as e:
-                print(f"[PROJECT_GEN] JSON decode error at position {e.pos}: {e.msg}")
+                logger.warning("JSON decode error at position %s: %s", e.pos, e.msg)
                 error_context_start = max(0, e.pos - 100)
                 error_context_end = min(len(output), e.pos + 100)
-                print(f"[PROJECT_GEN] Error context: {output[error_context_start:error_context_end]}")
+                logger.debug("Error context: %s", output[error_context_start:error_context_end])
             
             emitter.emit_progress_update("parse", "failed")
             emitter.emit_error(
@@ -322,15 +609,29 @@ async def generate_project(request: ProjectGenerationRequest):
                 detail=f"Failed to parse project JSON from model output. Model: {webpage_model}. Output length: {len(output) if output else 0} chars. Check server logs for details."
             )
         
+        # Merge the locally generated build scaffold with the model's src/ files
+        # (fan-out output is already merged and consistency-checked)
+        if SCAFFOLD_ENABLED and fanout_report is None:
+            project, _ = merge_scaffold(project, page_type_key)
+        
         emitter.emit_progress_update("parse", "completed")
         emitter.emit_progress_update("save", "in_progress")
         
-        # Save project files
-        project_json_path = f"{OUTPUT_DIR}/project.json"
-        with open(project_json_path, "w") as f:
-            json.dump({"project": project}, f, indent=2)
-        
-        save_project_files(project, f"{OUTPUT_DIR}/project")
+        # Save project under its own project_id
+        store = get_project_store()
+        with StageTimer("save"):
+            saved = await asyncio.to_thread(store.save_version, project_id, project, "generate")
+            await materialize_project_async(project, store.workspace_dir(project_id), prune=True)
+        manifest = None
+        if response_mode == "manifest":
+            manifest = _build_manifest(project_id, await asyncio.to_thread(store.get_manifest, project_id, saved["version"]))
+        
+        if cache_mode in ("hit", "seed"):
+            await asyncio.to_thread(
+                get_semantic_cache().add,
+                project_id, saved["version"], request.user_query, page_type_key,
+                request.questionnaire_answers, request.wizard_inputs
+            )
         
         emitter.emit_progress_update("save", "completed")
         emitter.emit_chat_message("Base project generated successfully!")
@@ -344,13 +645,17 @@ async def generate_project(request: ProjectGenerationRequest):
         return ProjectGenerationResponse(
             project_id=project_id,
             conversation_id=conversation_id,
-            project=project,
+            project=project if manifest is None else None,
+            manifest=manifest,
+            version=saved["version"],
+            etag=saved["etag"],
             files_count=files_count,
             page_type=page_type_key,
             model_used=webpage_model,  # Keep for backward compatibility
             model_info=ModelInfo(**get_model_info(webpage_model)),
             models_used=models_used_list,
-            generation_time_seconds=elapsed_time
+            generation_time_seconds=elapsed_time,
+            fanout=fanout_report
         )
         
     except HTTPException:
@@ -370,20 +675,24 @@ async def modify_project(request: ProjectModificationRequest):
     3. Generates modified project JSON
     4. Returns the modified project
     """
+    with span("modify_project", kind=SPAN_KIND_SERVER) as root, usage_scope(request.project_id, request.conversation_id) as usage:
+        response = await _modify_project(request)
+    response.usage = usage.summary()
+    response.trace_id = root.trace_id
+    return response
+
+
+async def _modify_project(request: ProjectModificationRequest) -> ProjectModificationResponse:
     try:
         start_time = time.time()
+        response_mode = _validate_response_mode(request.response_mode)
         
         # Get base project
         if request.project_json:
             base_project = request.project_json
         elif request.project_id:
-            # Load from saved project
-            base_path, base_project = get_latest_project()
-            if not base_project:
-                raise HTTPException(
-                    status_code=404,
-                    detail=f"Project not found: {request.project_id}"
-                )
+            # Load latest stored version of this project
+            base_project = _load_project(request.project_id)["project"]
         else:
             raise HTTPException(
                 status_code=400,
@@ -397,8 +706,10 @@ async def modify_project(request: ProjectModificationRequest):
         
         # Initialize event system
         event_logger = get_event_logger()
-        project_id = request.project_id or f"proj_{int(time.time())}"
+        project_id = _resolve_project_id(request.project_id)
         conversation_id = request.conversation_id or f"conv_{int(time.time())}"
+        attribute_usage(project_id, conversation_id)
+        current_span().set_attributes({"project_id": project_id, "conversation_id": conversation_id})
         
         emitter = EventEmitter(
             project_id=project_id,
@@ -415,102 +726,84 @@ async def modify_project(request: ProjectModificationRequest):
             model_name=model_key
         )
         
-        # Select model based on complexity + model_family
-        mod_model = get_modification_model(model_family, complexity)
-        
-        # Build modification prompt
-        mod_prompt = f"""You are a JSON project modifier. You MUST return ONLY valid JSON, nothing else.
-
-CRITICAL REQUIREMENTS:
-1. Return ONLY a JSON object in this exact format: {{"project": {{...}}}}
-2. The JSON must match the schema of the base project exactly
-3. Modify ONLY what the user requests, keep everything else unchanged
-4. Do NOT include any markdown, code blocks, explanations, or text outside the JSON
-5. The output must be parseable JSON that starts with {{ and ends with }}
-
-Base project JSON:
-{json.dumps({"project": base_project}, indent=2)}
-
-User modification request:
-{request.instruction}
-
-IMPORTANT: Return ONLY the complete modified project JSON. No markdown, no code blocks, no explanations. Just the raw JSON starting with {{ and ending with }}."""
+        # Select model based on complexity + model_family (fastest healthy candidate when adaptive routing is on)
+        mod_operation = modification_operation(complexity)
+        mod_model = get_model_selector().select(model_family, mod_operation)
         
         # Generate modification - route to appropriate provider
         from router.router_config import get_provider
         provider = get_provider(model_family)
         
-        if provider == "gemini":
-            mod_out = gemini_generate_text(mod_prompt, model=mod_model)
-        elif provider == "anthropic":
-            if claude_generate_text is None:
-                raise HTTPException(status_code=500, detail="Claude client not available")
-            mod_out = claude_generate_text(mod_prompt, model=mod_model, max_tokens=16384)
-        elif provider == "openai":
-            if gpt_generate_text is None:
-                raise HTTPException(status_code=500, detail="GPT client not available")
-            mod_out = gpt_generate_text(mod_prompt, model=mod_model, max_tokens=16384)
+        # Build modification prompt
+        with StageTimer("prompt_build"):
+            mod_parts = render_modification_prompt(base_project, request.instruction, provider=provider)
+        
+        # Token-aware routing: the model must read the whole project and write it back,
+        # so upgrade to a larger model, or split the project into chunks, when it does not fit
+        prompt_tokens = mod_parts.prefix_tokens + mod_parts.suffix_tokens
+        expected_output = int(mod_parts.suffix_tokens * MODIFICATION_OUTPUT_GROWTH)
+        try:
+            decision = route_request(model_family, prompt_tokens, expected_output, preferred_model=mod_model, allow_chunking=True)
+        except TokenBudgetError as e:
+            raise HTTPException(status_code=413, detail=f"Project too large to modify: {e}")
+        mod_model = decision.model
+        chunk_report = None
+        
+        mod_out = ""
+        mod_project = None
+        if decision.action == "chunk":
+            try:
+                with span("chunked_modify", model=mod_model):
+                    mod_project, chunk_report = await modify_project_chunked(
+                        base_project, request.instruction, provider, mod_model, emitter=emitter
+                    )
+            except TokenBudgetError as e:
+                raise HTTPException(status_code=413, detail=f"Project too large to modify: {e}")
         else:
-            mod_out = gemini_generate_text(mod_prompt, model=mod_model)
-        
-        mod_project = parse_project_json(mod_out)
+            mod_out = generate_project_text_unified(mod_parts, provider, mod_model, max_tokens=decision.max_tokens, operation=mod_operation)
+            mod_project = parse_project_json(mod_out)
+            get_model_selector().record_parse(mod_model, mod_operation, bool(mod_project))
         
         # If parsing failed, try with a stricter prompt (retry once)
-        if not mod_project and provider != "gemini":
-            print(f"[PROJECT_MOD] First parse attempt failed. Output preview (first 500 chars): {mod_out[:500]}")
+        if not mod_project and provider != "gemini" and chunk_report is None:
+            logger.warning("First parse attempt failed. Output length: %s chars", len(mod_out))
+            logger.debug("Output preview (first 500 chars): %s", mod_out[:500])
             emitter.emit_chat_message("Retrying with stricter JSON prompt...")
             
-            # Create a stricter prompt
-            strict_mod_prompt = (
-                "You are a JSON generator. Return ONLY valid JSON, nothing else.\n\n"
-                "CRITICAL RULES:\n"
-                "1. Start your response with {\n"
-                "2. End your response with }\n"
-                "3. Do NOT include markdown code blocks (no ```json or ```)\n"
-                "4. Do NOT include any text before or after the JSON\n"
-                "5. Do NOT include explanations or comments\n\n"
-            ) + mod_prompt
-            
-            # Retry generation with higher token limit
-            if provider == "anthropic":
-                if claude_generate_text is None:
-                    raise HTTPException(status_code=500, detail="Claude client not available")
-                mod_out = claude_generate_text(strict_mod_prompt, model=mod_model, max_tokens=16384)
-            elif provider == "openai":
-                if gpt_generate_text is None:
-                    raise HTTPException(status_code=500, detail="GPT client not available")
-                mod_out = gpt_generate_text(strict_mod_prompt, model=mod_model, max_tokens=16384)
-            else:
-                # Fallback to gemini client (shouldn't happen due to condition, but safe)
-                mod_out = gemini_generate_text(strict_mod_prompt, model=mod_model)
-            
-            mod_project = parse_project_json(mod_out)
+            RETRIES.labels("strict_json").inc()
+            with StageTimer("repair"):
+                # Create a stricter prompt
+                strict_mod_parts = render_modification_prompt(base_project, request.instruction, strict=True, provider=provider)
+                
+                # Retry generation with the routed token limit
+                mod_out = generate_project_text_unified(strict_mod_parts, provider, mod_model, max_tokens=decision.max_tokens, operation=mod_operation)
+                
+                mod_project = parse_project_json(mod_out)
+            get_model_selector().record_parse(mod_model, mod_operation, bool(mod_project))
         
         # Fallback to main_model if parsing failed
-        if not mod_project:
+        if not mod_project and chunk_report is None:
             main_model = get_main_model(model_family)
+            main_decision = None
             if mod_model != main_model:
+                try:
+                    main_decision = route_request(model_family, prompt_tokens, expected_output, preferred_model=main_model)
+                except TokenBudgetError as e:
+                    # The routed model already ran; report its parse failure rather than a 500
+                    logger.warning("Skipping %s fallback: %s", main_model, e)
+            if main_decision is not None:
                 emitter.emit_chat_message(f"Retrying with {main_model}...")
-                if provider == "gemini":
-                    mod_out = gemini_generate_text(mod_prompt, model=main_model)
-                elif provider == "anthropic":
-                    if claude_generate_text is None:
-                        raise HTTPException(status_code=500, detail="Claude client not available")
-                    mod_out = claude_generate_text(mod_prompt, model=main_model, max_tokens=16384)
-                elif provider == "openai":
-                    if gpt_generate_text is None:
-                        raise HTTPException(status_code=500, detail="GPT client not available")
-                    mod_out = gpt_generate_text(mod_prompt, model=main_model, max_tokens=16384)
-                else:
-                    mod_out = gemini_generate_text(mod_prompt, model=main_model)
+                FALLBACKS.labels("modification_main_model").inc()
+                mod_out = generate_project_text_unified(mod_parts, provider, main_model, max_tokens=main_decision.max_tokens, operation=mod_operation)
                 mod_project = parse_project_json(mod_out)
+                get_model_selector().record_parse(main_model, mod_operation, bool(mod_project))
                 mod_model = main_model
         
         if not mod_project:
             # Log the actual output for debugging
             output_preview = mod_out[:1000] if mod_out else "No output received"
-            print(f"[PROJECT_MOD] Parse failed. Model: {mod_model}, Provider: {provider}")
-            print(f"[PROJECT_MOD] Output preview (first 1000 chars): {output_preview}")
+            logger.warning("Parse failed. Model: %s, Provider: %s", mod_model, provider)
+            logger.debug("Output preview (first 1000 chars): %s", output_preview)
             
             emitter.emit_error(
                 scope="validation",
@@ -523,24 +816,25 @@ IMPORTANT: Return ONLY the complete modified project JSON. No markdown, no code
                 detail=f"Failed to parse modified project JSON. Model: {mod_model}. Output preview: {output_preview[:200]}..."
             )
         
-        # Save modified project
-        project_id = request.project_id or f"proj_{int(time.time())}"
-        version = f"project_{int(time.time())}"
-        dest = os.path.join(MODIFIED_DIR, version)
-        os.makedirs(dest, exist_ok=True)
-        
-        project_json_path = os.path.join(dest, "project.json")
-        with open(project_json_path, "w") as f:
-            json.dump({"project": mod_project}, f, indent=2)
-        
-        save_project_files(mod_project, os.path.join(dest, "project"))
+        # Save modified project as a new version
+        store = get_project_store()
+        with StageTimer("save"):
+            saved = await asyncio.to_thread(store.save_version, project_id, mod_project, "modify")
+            await materialize_project_async(mod_project, store.workspace_dir(project_id), prune=True)
+        manifest = None
+        if response_mode == "manifest":
+            manifest = _build_manifest(project_id, await asyncio.to_thread(store.get_manifest, project_id, saved["version"]))
         
         elapsed_time = time.time() - start_time
         
         return ProjectModificationResponse(
             project_id=project_id,
-            modified_project=mod_project,
+            modified_project=mod_project if manifest is None else None,
+            manifest=manifest,
+            version=saved["version"],
+            etag=saved["etag"],
             complexity=complexity,
+            chunked=chunk_report,
             model_used=mod_model,  # Keep for backward compatibility
             model_info=ModelInfo(**get_model_info(mod_model)),
             modification_time_seconds=elapsed_time
@@ -552,28 +846,151 @@ IMPORTANT: Return ONLY the complete modified project JSON. No markdown, no code
         raise HTTPException(status_code=500, detail=f"Project modification failed: {str(e)}")
 
 
+@router.get("/project-semantic-cache")
+async def semantic_cache_stats():
+    """Semantic project cache size, thresholds and hit/seed/miss counters."""
+    return get_semantic_cache().stats()
+
+
+@router.get("/project-speculation")
+async def speculation_stats():
+    """Speculative generation counters (started, reused, modified, regenerated, failed)."""
+    return get_speculation_registry().stats()
+
+
 @router.get("/project/{project_id}", response_model=ProjectResponse)
-async def get_project(project_id: str):
+async def get_project(
+    project_id: str,
+    request: Request,
+    response: Response,
+    version: Optional[int] = Query(None, description="Version to fetch (defaults to latest)"),
+    view: Optional[str] = Query("inline", description="'inline' for full project JSON, 'manifest' for per-file URLs")
+):
     """
-    Get a project by ID.
+    Get a stored version of a project by ID (latest by default).
     
-    Currently returns the latest project from output directories.
+    Responses carry a content-hash ETag. Send it back in If-None-Match to get
+    304 Not Modified when the project has not changed. With view=manifest
+    only metadata and per-file URLs are returned.
     """
     try:
-        base_path, base_project = get_latest_project()
-        
-        if not base_project:
+        view = _validate_response_mode(view)
+        store = get_project_store()
+        try:
+            etag = store.get_etag(project_id, version)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if etag is None:
             raise HTTPException(
                 status_code=404,
-                detail=f"Project not found: {project_id}"
+                detail=f"Project not found: {project_id}" + (f" (version {version})" if version else "")
             )
         
+        headers = _cache_headers(etag, immutable=version is not None)
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        response.headers.update(headers)
+        
+        manifest = None
+        if view == "manifest":
+            # Manifest only: no blob reads, and the file read stays off the event loop
+            record = await asyncio.to_thread(store.get_manifest_record, project_id, version)
+            if record is None:
+                raise HTTPException(status_code=404, detail=f"Project not found: {project_id}")
+            manifest = _build_manifest(project_id, record["manifest"])
+        else:
+            record = _load_project(project_id, version)
+        
         return ProjectResponse(
             project_id=project_id,
-            project=base_project
+            project=record["project"] if manifest is None else None,
+            manifest=manifest,
+            version=record["version"],
+            etag=etag,
+            created_at=record["created_at"],
+            modified_at=record["updated_at"]
         )
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to get project: {str(e)}")
 
+
+@router.get("/project/{project_id}/files/{file_path:path}")
+async def get_project_file(
+    project_id: str,
+    file_path: str,
+    request: Request,
+    version: Optional[int] = Query(None, description="Version to read from (defaults to latest)")
+):
+    """
+    Get the raw content of a single project file.
+    
+    The ETag is the file's content hash; files fetched with an explicit
+    version are cacheable forever.
+    """
+    store = get_project_store()
+    try:
+        manifest = store.resolve_manifest(project_id, version)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not manifest:
+        raise HTTPException(status_code=404, detail=f"Project not found: {project_id}")
+    
+    entry = manifest.get("files", {}).get(file_path)
+    if not entry:
+        raise HTTPException(status_code=404, detail=f"File not found in project {project_id}: {file_path}")
+    
+    headers = _cache_headers(entry["blob"], immutable=version is not None)
+    if etag_matches(request.headers.get("if-none-match"), entry["blob"]):
+        return Response(status_code=304, headers=headers)
+    
+    if entry.get("kind") == "json":
+        media_type = "application/json"
+    else:
+        media_type = mimetypes.guess_type(file_path)[0] or "text/plain"
+        if media_type.startswith("text/") or media_type in ("application/javascript", "application/json"):
+            media_type += "; charset=utf-8"
+    
+    content = await asyncio.to_thread(store.blobs.get, entry["blob"])
+    return Response(content=content, media_type=media_type, headers=headers)
+
+
+@router.get("/project/{project_id}/export")
+async def export_project(
+    project_id: str,
+    format: str = Query("zip", description="Archive format: zip or tar.gz"),
+    version: Optional[int] = Query(None, description="Version to export (defaults to latest)")
+):
+    """
+    Download a stored project version as a ZIP or tar.gz archive.
+
+    The archive is streamed from the blob store with chunked transfer
+    encoding; no temporary archive is built, so memory use stays constant
+    regardless of project size.
+    """
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported export format: {format}. Supported: {', '.join(EXPORT_FORMATS)}"
+        )
+    
+    store = get_project_store()
+    try:
+        manifest = store.resolve_manifest(project_id, version)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not manifest:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Project not found: {project_id}" + (f" (version {version})" if version else "")
+        )
+    
+    root = f"{project_id}-v{manifest['version']}"
+    filename = f"{root}.{EXPORT_FORMATS[format]['extension']}"
+    
+    return StreamingResponse(
+        iter_archive(store.blobs, manifest, format, root),
+        media_type=EXPORT_FORMATS[format]["media_type"],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
@@ -0,0 +1,39 @@
+"""
+Prompt Template Routes
+"""
+
+from fastapi import APIRouter, HTTPException
+from prompts import get_prompt_templates
+from models.prompt_cache import get_prompt_cache
+
+router = APIRouter()
+
+
+@router.get("/prompt-templates")
+async def list_prompt_templates():
+    """
+    List the precompiled prompt templates with their static prefix sizes.
+    
+    Token counts cover only the static prefix shared by every request for
+    that (provider, page_type); questionnaire answers and wizard inputs are
+    appended per request.
+    """
+    try:
+        return {"templates": get_prompt_templates().describe()}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to list prompt templates: {str(e)}")
+
+
+@router.get("/prompt-cache")
+async def prompt_cache_stats():
+    """
+    Provider-side prompt cache usage.
+    
+    Per provider/model: requests, input tokens, tokens served from the
+    provider cache, cache hit ratio and the input-token equivalents saved
+    at that provider's cached-token discount.
+    """
+    try:
+        return get_prompt_cache().stats()
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to get prompt cache stats: {str(e)}")
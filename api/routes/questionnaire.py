@@ -2,37 +2,32 @@
 Questionnaire Routes
 """
 
-from fastapi import APIRouter, HTTPException
-from api.models import QuestionnaireResponse, Question
-from data.questionnaire_config import get_questionnaire, has_questionnaire
+from fastapi import APIRouter, HTTPException, Request
+from api.models import QuestionnaireResponse
+from api.catalog import get_static_catalog
+from data.questionnaire_config import has_questionnaire
 
 router = APIRouter()
 
 
 @router.get("/questionnaire/{page_type_key}", response_model=QuestionnaireResponse)
-async def get_questionnaire_for_page_type(page_type_key: str):
+async def get_questionnaire_for_page_type(page_type_key: str, request: Request):
     """
     Get questionnaire for a specific page type.
     
     Returns a list of questions that help gather requirements when user input is vague.
+    Served from the pre-encoded static catalog (ETag + Cache-Control).
     """
     try:
-        questionnaire = get_questionnaire(page_type_key)
+        response = get_static_catalog().questionnaire(page_type_key)
         
-        if not questionnaire:
+        if response is None:
             raise HTTPException(
                 status_code=404,
                 detail=f"No questionnaire found for page type: {page_type_key}"
             )
         
-        questions = [
-            Question(**q) for q in questionnaire.get("questions", [])
-        ]
-        
-        return QuestionnaireResponse(
-            page_type=page_type_key,
-            questions=questions
-        )
+        return response.respond(request)
     except HTTPException:
         raise
     except Exception as e:
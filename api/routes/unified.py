@@ -2,7 +2,7 @@
 Unified API Endpoint - Single endpoint for all operations
 """
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from typing import Optional, Dict, Any, Union, List
 from api.models import (
     IntentClassificationResponse,
@@ -17,15 +17,14 @@ from api.models import (
     ModelInfo
 )
 from api.utils import get_model_info
+from api.catalog import get_static_catalog
 from models.unified_client import (
     classify_intent_unified,
     classify_page_type_unified,
     analyze_query_detail_unified,
     chat_response_unified
 )
-from data.page_types_reference import get_page_type_by_key, PAGE_TYPES
-from data.questionnaire_config import get_questionnaire, has_questionnaire
-from data.page_categories import get_all_categories
+from utils.tracing import span, SPAN_KIND_SERVER
 from pydantic import BaseModel, Field
 
 router = APIRouter()
@@ -46,6 +45,10 @@ class UnifiedRequest(BaseModel):
     model: Optional[str] = Field(None, description="Optional model override (deprecated)")
     model_family: Optional[str] = Field(None, description="Model family: Gemini, Anthropic, or OpenAI (defaults to Gemini)")
     model_name: Optional[str] = Field(None, description="Specific model name (e.g., claude-opus-4-5-20251101). If provided, model_family will be inferred from this.")
+    response_mode: Optional[str] = Field(None, description="For generate_project/modify_project: 'inline' (default) or 'manifest' for per-file URLs instead of inlined files")
+    generation_mode: Optional[str] = Field(None, description="For generate_project: 'single' or 'fanout' (plan, then generate pages in parallel)")
+    speculative: Optional[bool] = Field(None, description="For generate_project: generate with default answers while the questionnaire is pending")
+    semantic_cache: Optional[bool] = Field(None, description="For generate_project: false to skip the semantic project cache")
 
 
 class UnifiedResponse(BaseModel):
@@ -57,7 +60,7 @@ class UnifiedResponse(BaseModel):
 
 
 @router.post("/stream", response_model=UnifiedResponse)
-async def stream_action(request: UnifiedRequest):
+async def stream_action(request: UnifiedRequest, http_request: Request):
     """
     Unified endpoint for all API operations.
     
@@ -98,6 +101,11 @@ async def stream_action(request: UnifiedRequest):
     - If intent classification returns "webpage_build" → generate_project
     - Otherwise → chat
     """
+    with span("api.stream", kind=SPAN_KIND_SERVER, action=request.action, project_id=request.project_id, conversation_id=request.conversation_id):
+        return await _stream_action(request, http_request)
+
+
+async def _stream_action(request: UnifiedRequest, http_request: Request):
     try:
         # Extract model_family from request
         # Priority: model_family > model_name (infer from model_name) > default to Gemini
@@ -264,7 +272,11 @@ async def stream_action(request: UnifiedRequest):
                 wizard_inputs=request.wizard_inputs,
                 project_id=request.project_id,
                 conversation_id=request.conversation_id,
-                model_family=model_family
+                model_family=model_family,
+                response_mode=request.response_mode,
+                generation_mode=request.generation_mode,
+                speculative=request.speculative,
+                semantic_cache=request.semantic_cache
             )
             
             project_response = await generate_project(project_request)
@@ -289,7 +301,8 @@ async def stream_action(request: UnifiedRequest):
                 project_json=request.project_json,
                 project_id=request.project_id,
                 conversation_id=request.conversation_id,
-                model_family=model_family
+                model_family=model_family,
+                response_mode=request.response_mode
             )
             
             mod_response = await modify_project(mod_request)
@@ -304,66 +317,24 @@ async def stream_action(request: UnifiedRequest):
             if not request.page_type_key:
                 raise HTTPException(status_code=400, detail="page_type_key is required for get_questionnaire")
             
-            questionnaire = get_questionnaire(request.page_type_key)
+            response = get_static_catalog().unified_questionnaire(request.page_type_key)
             
-            if not questionnaire:
+            if response is None:
                 raise HTTPException(
                     status_code=404,
                     detail=f"No questionnaire found for page type: {request.page_type_key}"
                 )
             
-            from api.models import Question
-            questions = [Question(**q) for q in questionnaire.get("questions", [])]
-            
-            return UnifiedResponse(
-                action="get_questionnaire",
-                success=True,
-                data={
-                    "page_type": request.page_type_key,
-                    "questions": [q.dict() for q in questions]
-                }
-            )
+            return response.respond(http_request)
         
         elif action == "get_categories":
-            categories_dict = get_all_categories()
-            from api.models import CategoryInfo
-            
-            categories_info = {
-                key: CategoryInfo(**info).dict()
-                for key, info in categories_dict.items()
-            }
-            
-            return UnifiedResponse(
-                action="get_categories",
-                success=True,
-                data={"categories": categories_info}
-            )
+            return get_static_catalog().unified_categories.respond(http_request)
         
         elif action == "get_page_type":
             if not request.page_type_key:
                 raise HTTPException(status_code=400, detail="page_type_key is required for get_page_type")
             
-            page_type_info = get_page_type_by_key(request.page_type_key)
-            
-            if page_type_info:
-                from api.models import PageTypeInfo
-                return UnifiedResponse(
-                    action="get_page_type",
-                    success=True,
-                    data={
-                        "page_type": PageTypeInfo(**page_type_info).dict(),
-                        "available_types": list(PAGE_TYPES.keys())
-                    }
-                )
-            else:
-                return UnifiedResponse(
-                    action="get_page_type",
-                    success=True,
-                    data={
-                        "page_type": None,
-                        "available_types": list(PAGE_TYPES.keys())
-                    }
-                )
+            return get_static_catalog().unified_page_type(request.page_type_key).respond(http_request)
         
         else:
             raise HTTPException(
@@ -0,0 +1,264 @@
+"""
+Speculative Generation - Generate with default answers while the questionnaire is pending
+
+When a query needs follow-up questions, generation starts right away with the
+questionnaire's default answers while the user answers. The follow-up request
+(same project_id, with questionnaire_answers) is then reconciled against the
+speculative result:
+
+- answers equal to the defaults: the speculative project is reused as-is
+- a few answers changed: a targeted modification of the speculative project
+- many answers changed (or the speculation failed): a normal full generation
+
+A speculative generation runs on its own event loop in a worker thread: the
+generation pipeline makes blocking provider calls, which on the server's
+loop would stall every other request for the length of a generation.
+Cancelling it takes effect at the generation's next await.
+"""
+
+import os
+import time
+import asyncio
+import threading
+import contextvars
+from typing import Dict, Any, Optional, Union, List, Tuple, Callable, Awaitable
+
+from data.questionnaire_config import get_questionnaire
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+SPECULATIVE_GENERATION = os.getenv("SPECULATIVE_GENERATION", "0").lower() not in ("0", "false", "no", "off")
+SPECULATION_TTL_SECONDS = float(os.getenv("SPECULATION_TTL_SECONDS", "1800"))
+SPECULATION_MAX_PENDING = int(os.getenv("SPECULATION_MAX_PENDING", "64"))
+# More changed answers than this means a full regeneration instead of a modification
+SPECULATION_MAX_CHANGES = int(os.getenv("SPECULATION_MAX_CHANGES", "3"))
+
+Answer = Union[str, List[str]]
+
+# Set while a speculative generation runs, so it does not claim itself
+_speculating: contextvars.ContextVar[bool] = contextvars.ContextVar("speculating", default=False)
+
+
+def in_speculation() -> bool:
+    """True inside a speculative generation."""
+    return _speculating.get()
+
+
+def _normalize(value: Any):
+    if isinstance(value, (list, tuple, set)):
+        return frozenset(str(v).strip().lower() for v in value if str(v).strip())
+    text = str(value).strip().lower() if value is not None else ""
+    return frozenset([text]) if text else frozenset()
+
+
+def diff_answers(defaults: Dict[str, Answer], answers: Optional[Dict[str, Answer]]) -> Dict[str, Tuple[Optional[Answer], Answer]]:
+    """
+    Answers that differ from the defaults, as {question_id: (default, answer)}.
+
+    Questions the user skipped (missing or empty answers) count as accepting
+    the default; lists compare as sets, strings case-insensitively.
+    """
+    changed = {}
+    for question_id, answer in (answers or {}).items():
+        normalized = _normalize(answer)
+        if not normalized:
+            continue
+        default = defaults.get(question_id)
+        if normalized != _normalize(default):
+            changed[question_id] = (default, answer)
+    return changed
+
+
+def _format_answer(value: Optional[Answer]) -> str:
+    if value is None or value == [] or value == "":
+        return "not specified"
+    return ", ".join(value) if isinstance(value, (list, tuple)) else str(value)
+
+
+def build_reconcile_instruction(page_type_key: str, changed: Dict[str, Tuple[Optional[Answer], Answer]]) -> str:
+    """Modification instruction that moves a default-answer project to the user's answers."""
+    labels = {
+        question["id"]: question.get("question", question["id"])
+        for question in (get_questionnaire(page_type_key) or {}).get("questions", [])
+    }
+    lines = [
+        "This project was generated with default questionnaire answers. The user has now answered "
+        "differently; update the project so it matches the new answers below. Change only what these "
+        "answers affect (content, copy, features, pages, styling) and keep everything else unchanged.",
+        "",
+    ]
+    for question_id, (default, answer) in changed.items():
+        lines.append(f"- {labels.get(question_id, question_id)} Now: {_format_answer(answer)} (was: {_format_answer(default)})")
+    return "\n".join(lines)
+
+
+class ThreadedGeneration:
+    """
+    Runs a coroutine on a private event loop in a worker thread.
+
+    run() is awaited from the server's loop; cancelling it (or calling
+    cancel()) cancels the coroutine on its own loop.
+    """
+
+    def __init__(self, generate: Callable[[], Awaitable[Any]]):
+        self._generate = generate
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._cancelled = False
+
+    async def run(self) -> Any:
+        try:
+            return await asyncio.to_thread(self._run)
+        except asyncio.CancelledError:
+            self.cancel()
+            raise
+
+    def _run(self) -> Any:
+        loop = asyncio.new_event_loop()
+        try:
+            with self._lock:
+                if self._cancelled:
+                    raise asyncio.CancelledError()
+                self._loop = loop
+                _speculating.set(True)
+                self._task = loop.create_task(self._generate())
+            return loop.run_until_complete(self._task)
+        finally:
+            with self._lock:
+                self._loop = None
+            loop.run_until_complete(loop.shutdown_default_executor())
+            loop.close()
+
+    def cancel(self) -> None:
+        with self._lock:
+            self._cancelled = True
+            if self._loop is not None:
+                self._loop.call_soon_threadsafe(self._task.cancel)
+
+
+class Speculation:
+    """One speculative generation for a project."""
+
+    __slots__ = ("project_id", "page_type_key", "default_answers", "model_family", "task", "created_at")
+
+    def __init__(self, project_id: str, page_type_key: str, default_answers: Dict[str, Answer], model_family: str, task: asyncio.Task):
+        self.project_id = project_id
+        self.page_type_key = page_type_key
+        self.default_answers = default_answers
+        self.model_family = model_family
+        self.task = task
+        self.created_at = time.time()
+
+    @property
+    def expired(self) -> bool:
+        return time.time() - self.created_at > SPECULATION_TTL_SECONDS
+
+
+class SpeculationRegistry:
+    """
+    Pending speculative generations keyed by project_id.
+
+    Must be used from the event loop thread (tasks are created with
+    asyncio.create_task; the generation itself runs in a ThreadedGeneration).
+    Finished results are kept until claimed or until
+    SPECULATION_TTL_SECONDS; the stored project version stays either way.
+    """
+
+    def __init__(self):
+        self._pending: Dict[str, Speculation] = {}
+        self._stats = {"started": 0, "reused": 0, "modified": 0, "regenerated": 0, "failed": 0, "expired": 0}
+
+    def _evict(self):
+        for project_id in [pid for pid, spec in self._pending.items() if spec.expired]:
+            self._drop(self._pending.pop(project_id))
+            self._stats["expired"] += 1
+        while len(self._pending) >= SPECULATION_MAX_PENDING:
+            oldest = min(self._pending.values(), key=lambda spec: spec.created_at)
+            self._drop(self._pending.pop(oldest.project_id))
+            self._stats["expired"] += 1
+
+    @staticmethod
+    def _drop(spec: Speculation):
+        if not spec.task.done():
+            spec.task.cancel()
+
+    @staticmethod
+    def _log_failure(task: asyncio.Task):
+        # Retrieve the exception so unclaimed failures are logged once, not at GC
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Speculative generation failed: %s", task.exception())
+
+    def start(
+        self,
+        project_id: str,
+        page_type_key: str,
+        default_answers: Dict[str, Answer],
+        model_family: str,
+        generate: Callable[[], Awaitable[Any]],
+    ) -> Speculation:
+        """Start a speculative generation in the background (replacing any pending one)."""
+        self._evict()
+        previous = self._pending.pop(project_id, None)
+        if previous is not None:
+            self._drop(previous)
+        task = asyncio.create_task(ThreadedGeneration(generate).run())
+        task.add_done_callback(self._log_failure)
+        spec = Speculation(project_id, page_type_key, default_answers, model_family, task)
+        self._pending[project_id] = spec
+        self._stats["started"] += 1
+        logger.info("Started speculative generation for %s (%s, %s default answers)", project_id, page_type_key, len(default_answers))
+        return spec
+
+    def claim(self, project_id: Optional[str]) -> Optional[Speculation]:
+        """Remove and return the pending speculation for a project, if any."""
+        if not project_id:
+            return None
+        spec = self._pending.pop(project_id, None)
+        if spec is not None and spec.expired:
+            self._drop(spec)
+            self._stats["expired"] += 1
+            return None
+        return spec
+
+    def cancel(self, spec: Speculation):
+        """Cancel a claimed speculation the follow-up request will not use."""
+        if not spec.task.done():
+            spec.task.cancel()
+            logger.info("Cancelled unused speculative generation for %s", spec.project_id)
+
+    def record(self, outcome: str):
+        """Count a reconciliation outcome: reused, modified, regenerated or failed."""
+        self._stats[outcome] += 1
+        logger.info("Speculation outcome: %s", outcome)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": SPECULATIVE_GENERATION,
+            "pending": len(self._pending),
+            "running": sum(1 for spec in self._pending.values() if not spec.task.done()),
+            **self._stats,
+        }
+
+    async def close(self):
+        """Cancel speculative generations that are still running."""
+        tasks = [spec.task for spec in self._pending.values() if not spec.task.done()]
+        self._pending.clear()
+        for task in tasks:
+            task.cancel()
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+            logger.info("Cancelled %s running speculative generations", len(tasks))
+
+
+_speculation_registry: Optional[SpeculationRegistry] = None
+
+
+def get_speculation_registry() -> SpeculationRegistry:
+    """Get or create the global speculation registry."""
+    global _speculation_registry
+    if _speculation_registry is None:
+        _speculation_registry = SpeculationRegistry()
+    return _speculation_registry
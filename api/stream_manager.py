@@ -8,6 +8,11 @@ from typing import Dict, Optional, Any, List
 from collections import defaultdict
 import json
 
+from utils.metrics import StageTimer, SSE_SUBSCRIBERS, SSE_CONNECTIONS, EVENTS_BROADCAST
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
 
 class StreamManager:
     """
@@ -32,6 +37,8 @@ class StreamManager:
         queue = asyncio.Queue()
         stream_key = self._get_stream_key(project_id, conversation_id, model_name)
         self._streams[stream_key].append(queue)
+        SSE_SUBSCRIBERS.inc()
+        SSE_CONNECTIONS.inc()
         return queue
     
     def unregister_stream(self, project_id: Optional[str], conversation_id: Optional[str], queue: asyncio.Queue, model_name: Optional[str] = None):
@@ -40,6 +47,7 @@ class StreamManager:
         if stream_key in self._streams:
             try:
                 self._streams[stream_key].remove(queue)
+                SSE_SUBSCRIBERS.dec()
                 if not self._streams[stream_key]:
                     del self._streams[stream_key]
             except ValueError:
@@ -47,6 +55,11 @@ class StreamManager:
     
     async def broadcast_event(self, event: Dict[str, Any]):
         """Broadcast an event to all matching stream connections"""
+        with StageTimer("event_fanout"):
+            await self._broadcast(event)
+        EVENTS_BROADCAST.inc()
+    
+    async def _broadcast(self, event: Dict[str, Any]):
         # Store event for new connections
         self._all_events.append(event)
         # Keep only last 1000 events to avoid memory issues
@@ -78,30 +91,31 @@ class StreamManager:
                 try:
                     await queue.put(event)
                 except Exception as e:
-                    print(f"[STREAM_MANAGER] Error broadcasting to queue: {e}")
+                    logger.warning("Error broadcasting to queue: %s", e)
     
     async def _process_sync_event_queue(self):
         """Background task to process events from synchronous queue"""
-        print("[STREAM_MANAGER] Background event processor running...")
+        logger.info("Background event processor running...")
         while True:
             try:
-                # Get event from queue (with timeout to allow checking for shutdown)
+                # Wait for the next event in a worker thread (a blocking get here would
+                # stall the event loop), then broadcast everything already queued
                 try:
-                    event = self._sync_event_queue.get(timeout=1.0)
-                    # Broadcast the event
-                    await self.broadcast_event(event)
-                    print(f"[STREAM_MANAGER] Broadcasted event: {event.get('event_type', 'unknown')}")
+                    event = await asyncio.to_thread(self._sync_event_queue.get, True, 1.0)
                 except queue.Empty:
-                    # No events, continue waiting
-                    await asyncio.sleep(0.1)
                     continue
+                while event is not None:
+                    await self.broadcast_event(event)
+                    logger.debug("Broadcasted event: %s", event.get('event_type', 'unknown'))
+                    try:
+                        event = self._sync_event_queue.get_nowait()
+                    except queue.Empty:
+                        event = None
             except asyncio.CancelledError:
-                print("[STREAM_MANAGER] Background processor cancelled")
+                logger.info("Background processor cancelled")
                 break
             except Exception as e:
-                print(f"[STREAM_MANAGER] Error processing sync event queue: {e}")
-                import traceback
-                traceback.print_exc()
+                logger.exception("Error processing sync event queue: %s", e)
                 await asyncio.sleep(0.1)
     
     def get_historical_events(
@@ -2,7 +2,13 @@
 Utility functions for API
 """
 
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+
+
+# Appended to the ETag of a gzip-encoded body (see api.compression): the
+# encoded bytes differ from the identity body, so they need their own
+# strong validator
+GZIP_ETAG_SUFFIX = "-gzip"
 
 
 def get_model_info(model_name: str) -> Dict[str, str]:
@@ -28,6 +34,8 @@ def get_model_info(model_name: str) -> Dict[str, str]:
     elif normalized_name.startswith("gpt") or "gpt" in normalized_name or "openai" in normalized_name:
         model_family = "OpenAI"
         normalized_name = normalized_name.replace("openai:", "").strip()
+    elif normalized_name.startswith("fake"):
+        model_family = "Fake"
     else:
         # Default to Gemini for backward compatibility
         model_family = "Gemini"
@@ -55,3 +63,34 @@ def format_model_response(model_name: str, include_family: bool = True) -> Dict[
     else:
         return {"model_name": model_name.replace("gemini:", "").strip()}
 
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Check an If-None-Match header against an etag (weak comparison).
+    
+    A tag carrying GZIP_ETAG_SUFFIX matches too: it names the gzip encoding
+    of the same content.
+    
+    Args:
+        if_none_match: Raw If-None-Match header value (may list several tags)
+        etag: Etag value, with or without surrounding quotes
+    
+    Returns:
+        True if any listed tag (or "*") matches
+    """
+    if not if_none_match:
+        return False
+    etag = etag.strip('"')
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        candidate = candidate.strip('"')
+        if candidate.endswith(GZIP_ETAG_SUFFIX):
+            candidate = candidate[:-len(GZIP_ETAG_SUFFIX)]
+        if candidate == etag:
+            return True
+    return False
@@ -382,3 +382,27 @@ def has_questionnaire(page_type_key: str):
 
 
 
+
+
+# Number of options preselected for multiselect questions when the user accepts defaults
+DEFAULT_MULTISELECT_OPTIONS = 3
+
+
+def get_default_answers(page_type_key: str):
+    """
+    Default answers for a page type's questionnaire: the first option of each
+    radio question and the first few options of each multiselect question.
+    """
+    questionnaire = get_questionnaire(page_type_key)
+    if not questionnaire:
+        return {}
+    defaults = {}
+    for question in questionnaire.get("questions", []):
+        options = question.get("options", [])
+        if not options:
+            continue
+        if question.get("type") == "multiselect":
+            defaults[question["id"]] = options[:DEFAULT_MULTISELECT_OPTIONS]
+        else:
+            defaults[question["id"]] = options[0]
+    return defaults
@@ -6,6 +6,7 @@ Provides utilities for emitting events in a consistent way.
 
 from typing import Optional, Callable, Generator
 from .event_types import EventEnvelope
+from utils.tracing import current_trace_id
 
 
 class EventEmitter:
@@ -36,6 +37,10 @@ class EventEmitter:
     
     def emit(self, event: EventEnvelope) -> EventEnvelope:
         """Emit an event and call the callback if set."""
+        # Tag the event with the trace it was emitted in
+        if getattr(event, 'trace_id', None) is None:
+            event.trace_id = current_trace_id()
+        
         # Add model_name to event if available
         if self.model_name:
             # Add to payload
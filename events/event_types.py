@@ -30,12 +30,14 @@ class EventEnvelope:
         timestamp: Optional[str] = None,
         project_id: Optional[str] = None,
         conversation_id: Optional[str] = None,
+        trace_id: Optional[str] = None,
     ):
         self.event_id = event_id or f"evt_{uuid.uuid4().hex[:8]}"
         self.event_type = event_type
         self.timestamp = timestamp or datetime.now(timezone.utc).isoformat()
         self.project_id = project_id
         self.conversation_id = conversation_id
+        self.trace_id = trace_id
         self.payload = payload
     
     def to_dict(self) -> Dict[str, Any]:
@@ -50,6 +52,8 @@ class EventEnvelope:
             result["project_id"] = self.project_id
         if self.conversation_id:
             result["conversation_id"] = self.conversation_id
+        if self.trace_id:
+            result["trace_id"] = self.trace_id
         return result
     
     def to_json(self) -> str:
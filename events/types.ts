@@ -17,6 +17,7 @@ export interface EventEnvelope {
   timestamp: string; // ISO 8601 format
   project_id?: string;
   conversation_id?: string;
+  trace_id?: string; // Backend trace that emitted the event (for debugging)
   payload: EventPayload;
 }
 
@@ -9,6 +9,8 @@ from typing import List, Dict, Any, Optional, Literal
 from dotenv import load_dotenv
 from json_repair import repair_json
 
+from storage.usage_store import record_usage, usage_operation
+
 # -------------------------
 # Providers SDKs
 # -------------------------
@@ -111,10 +113,18 @@ def _call_gemini_json(messages: List[Dict[str, str]], model: str, max_tokens: in
 
     usage = getattr(response, "usage_metadata", None)
     if usage:
+        # Thinking tokens are billed as output but are not part of candidates_token_count
+        completion_tokens = (usage.candidates_token_count or 0) + (getattr(usage, "thoughts_token_count", None) or 0)
         print(
             f"[gemini usage] prompt={usage.prompt_token_count} "
-            f"completion={usage.candidates_token_count} total={usage.total_token_count}"
+            f"completion={completion_tokens} total={usage.total_token_count}"
+        )
+        record_usage(
+            "gemini", model, usage.prompt_token_count or 0, completion_tokens,
+            getattr(usage, "cached_content_token_count", None) or 0,
         )
+    else:
+        record_usage("gemini", model, est, 0, estimated=True)
 
     return text
 
@@ -136,8 +146,14 @@ def _call_openai_json(messages: List[Dict[str, str]], model: str, max_tokens: in
     usage = getattr(completion, "usage", None)
     if usage:
         print(f"[openai usage] prompt={usage.prompt_tokens} completion={usage.completion_tokens} total={usage.total_tokens}")
+        details = getattr(usage, "prompt_tokens_details", None)
+        record_usage(
+            "openai", model, usage.prompt_tokens or 0, usage.completion_tokens or 0,
+            (getattr(details, "cached_tokens", None) or 0) if details is not None else 0,
+        )
     else:
         print(f"[openai est] prompt≈{est}")
+        record_usage("openai", model, est, 0, estimated=True)
 
     return completion.choices[0].message.content
 
@@ -167,6 +183,10 @@ def _call_anthropic_json(messages: List[Dict[str, str]], model: str, max_tokens:
         temperature=0.2,
     )
 
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        record_usage("anthropic", model, usage.input_tokens or 0, usage.output_tokens or 0)
+
     return response.content[0].text
 
 # ==========================================================
@@ -288,16 +308,17 @@ def call_llm_json(
 
     print(f"[call_llm_json] agent={agent_name} provider={provider} model={model}")
 
-    if provider == "gemini":
-        raw = _call_gemini_json(messages, model, max_tokens)
-    elif provider == "openai":
-        raw = _call_openai_json(messages, model, max_tokens)
-    elif provider == "anthropic":
-        raw = _call_anthropic_json(messages, model, max_tokens)
-    elif provider == "huggingface":
-        raw = _call_huggingface_json(messages, model, max_tokens)
-    else:
-        raise RuntimeError(f"Unknown provider {provider}")
+    with usage_operation(agent_name):
+        if provider == "gemini":
+            raw = _call_gemini_json(messages, model, max_tokens)
+        elif provider == "openai":
+            raw = _call_openai_json(messages, model, max_tokens)
+        elif provider == "anthropic":
+            raw = _call_anthropic_json(messages, model, max_tokens)
+        elif provider == "huggingface":
+            raw = _call_huggingface_json(messages, model, max_tokens)
+        else:
+            raise RuntimeError(f"Unknown provider {provider}")
 
     text = raw.strip()
     if text.startswith("```"):
@@ -0,0 +1,280 @@
+"""
+Cassette - record and replay provider responses
+
+In record mode every provider call (each client's generate_text, which the
+classifiers and project calls all go through) is appended to a gzip-
+compressed JSON-lines cassette: prompt hash, provider, model, output
+schema, prompt, response text (or error), wall time and the usage the
+provider reported. In replay mode the same calls are answered from the
+cassette instead of the provider, after the recorded time divided by
+CASSETTE_SPEED, and their usage is recorded again so cost accounting and
+metrics behave as they did in production.
+
+Calls are keyed by a hash of the output schema and the full prompt (prefix
+included); the model is not part of the key, so a replay still matches when
+routing picks another model. A prompt recorded several times is replayed
+in recorded order, cycling, so a failure followed by a retry replays as
+such.
+
+Uses:
+
+- reproduce a production parse failure or slow call: record in production,
+  replay locally (testing/cassette_parse.py re-runs parse_project_json over
+  every recorded project response)
+- load-test the whole pipeline offline against real-world outputs
+  (testing.benchmark --cassette); with CASSETTE_MISS=schema, prompts that
+  were never recorded get the next recorded response of the same schema
+
+Cassettes contain full prompts and outputs (user input included); treat
+them like the production data they are.
+
+Configuration (environment):
+
+- CASSETTE_MODE: off (default), record or replay
+- CASSETTE_PATH: cassette file (default <PROJECT_STORE_DIR>/cassette.jsonl.gz);
+  record mode appends to it
+- CASSETTE_SPEED: replay speed-up of the recorded timing; 1 (default) is
+  the original timing, 10 ten times faster, 0 no delay
+- CASSETTE_MISS: what replay does with an unrecorded prompt: error
+  (default, CassetteMissError), schema (next recorded response with the
+  same output schema) or live (call the provider)
+"""
+
+import os
+import gzip
+import json
+import time
+import hashlib
+import inspect
+import functools
+import threading
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from storage.project_store import DEFAULT_STORE_DIR
+from storage.usage_store import capture_usage, record_usage
+from utils.tracing import span, SPAN_KIND_CLIENT
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+CASSETTE_MODE = os.getenv("CASSETTE_MODE", "off").lower()
+CASSETTE_PATH = os.getenv("CASSETTE_PATH", os.path.join(DEFAULT_STORE_DIR, "cassette.jsonl.gz"))
+CASSETTE_SPEED = float(os.getenv("CASSETTE_SPEED", "1"))
+CASSETTE_MISS = os.getenv("CASSETTE_MISS", "error").lower()
+
+CASSETTE_MODES = ("off", "record", "replay")
+MISS_POLICIES = ("error", "schema", "live")
+
+
+class CassetteMissError(RuntimeError):
+    """Raised in replay mode for a prompt the cassette has no response for."""
+    pass
+
+
+class RecordedProviderError(RuntimeError):
+    """Replays a provider call that failed when it was recorded."""
+    pass
+
+
+def prompt_key(prompt: str, output_schema: Optional[str] = None) -> str:
+    """Cassette key of a call: hash of its output schema and full prompt."""
+    digest = hashlib.sha256()
+    digest.update((output_schema or "").encode("utf-8"))
+    digest.update(b"\0")
+    digest.update(prompt.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def load_entries(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Entries of a cassette, in recorded order.
+
+    A cassette cut short (process killed while recording) yields the
+    entries written before the cut.
+    """
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        try:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    logger.warning("Skipping malformed cassette line in %s", path)
+        except (EOFError, gzip.BadGzipFile) as e:
+            logger.warning("Cassette %s ends early (%s); using the entries before it", path, e)
+
+
+class Cassette:
+    """
+    A cassette in record or replay mode.
+
+    Record mode keeps the file open and flushes after every entry, so the
+    entries survive a crash; replay mode loads the whole file up front.
+    """
+
+    def __init__(self, mode: str, path: str, speed: float = CASSETTE_SPEED, miss: str = CASSETTE_MISS):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        if miss not in MISS_POLICIES:
+            raise ValueError(f"Unknown cassette miss policy: {miss}")
+        self.mode = mode
+        self.path = path
+        self.speed = speed
+        self.miss = miss
+        self._lock = threading.Lock()
+        self._file = None
+        self._entries: Dict[str, List[Dict[str, Any]]] = {}
+        self._by_schema: Dict[str, List[Dict[str, Any]]] = {}
+        self._positions: Dict[str, int] = {}
+        self.stats = {"recorded": 0, "replayed": 0, "misses": 0}
+        if mode == "replay":
+            self._load()
+
+    def _load(self):
+        count = 0
+        for entry in load_entries(self.path):
+            if "key" not in entry:
+                continue
+            self._entries.setdefault(entry["key"], []).append(entry)
+            if entry.get("error") is None:
+                self._by_schema.setdefault(entry.get("output_schema") or "", []).append(entry)
+            count += 1
+        logger.info("Loaded %d cassette entries (%d prompts) from %s", count, len(self._entries), self.path)
+
+    def _next(self, bucket: str, entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+        with self._lock:
+            position = self._positions.get(bucket, 0)
+            self._positions[bucket] = position + 1
+        return entries[position % len(entries)]
+
+    def _write(self, entry: Dict[str, Any]) -> None:
+        line = json.dumps(entry, ensure_ascii=False) + "\n"
+        with self._lock:
+            try:
+                if self._file is None:
+                    os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                    self._file = gzip.open(self.path, "at", encoding="utf-8")
+                self._file.write(line)
+                self._file.flush()
+                self.stats["recorded"] += 1
+            except OSError as e:
+                logger.warning("Could not append to cassette %s: %s", self.path, e)
+
+    def record(self, provider: str, model: str, prompt: str, prefix: Optional[str], output_schema: Optional[str], call: Callable[[], str]) -> str:
+        """Make the call and append it (response or error) to the cassette."""
+        full_prompt = (prefix or "") + prompt
+        entry = {
+            "key": prompt_key(full_prompt, output_schema),
+            "recorded_at": time.time(),
+            "provider": provider,
+            "model": model,
+            "output_schema": output_schema,
+            "prefix_chars": len(prefix or ""),
+            "prompt": full_prompt,
+            "response": None,
+            "error": None,
+        }
+        start = time.perf_counter()
+        with capture_usage() as usage:
+            try:
+                entry["response"] = call()
+                return entry["response"]
+            except Exception as e:
+                entry["error"] = f"{type(e).__name__}: {e}"
+                raise
+            finally:
+                entry["seconds"] = round(time.perf_counter() - start, 4)
+                entry["usage"] = [
+                    {field: record[field] for field in ("model", "prompt_tokens", "completion_tokens", "cached_tokens", "cache_write_tokens", "estimated")}
+                    for record in usage
+                ]
+                self._write(entry)
+
+    def replay(self, provider: str, model: str, prompt: str, prefix: Optional[str], output_schema: Optional[str], call: Callable[[], str]) -> str:
+        """Answer the call from the cassette, with the recorded timing and usage."""
+        key = prompt_key((prefix or "") + prompt, output_schema)
+        entries = self._entries.get(key)
+        if entries:
+            entry = self._next(key, entries)
+        else:
+            with self._lock:
+                self.stats["misses"] += 1
+            if self.miss == "live":
+                return call()
+            entries = self._by_schema.get(output_schema or "")
+            if self.miss != "schema" or not entries:
+                raise CassetteMissError(f"No recorded response for prompt {key[:12]} (output_schema={output_schema})")
+            entry = self._next("schema:" + (output_schema or ""), entries)
+
+        with span("provider.request", kind=SPAN_KIND_CLIENT, provider=provider, model=model, cassette="replay") as s:
+            s.set_attribute("cassette.recorded_model", entry.get("model"))
+            if self.speed > 0:
+                time.sleep(entry.get("seconds", 0.0) / self.speed)
+            with self._lock:
+                self.stats["replayed"] += 1
+            if entry.get("error") is not None:
+                raise RecordedProviderError(entry["error"])
+            for usage in entry.get("usage") or ():
+                record_usage(
+                    entry.get("provider", provider),
+                    usage["model"],
+                    usage["prompt_tokens"],
+                    usage["completion_tokens"],
+                    usage.get("cached_tokens", 0),
+                    estimated=usage.get("estimated", False),
+                    cache_write_tokens=usage.get("cache_write_tokens", 0),
+                )
+            return entry["response"]
+
+    def close(self) -> None:
+        """Finish the cassette file (record mode)."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+        if self.mode == "record":
+            logger.info("Cassette %s: %d calls recorded", self.path, self.stats["recorded"])
+
+
+_cassette: Optional[Cassette] = None
+_cassette_lock = threading.Lock()
+
+
+def get_cassette() -> Optional[Cassette]:
+    """The global cassette, or None when CASSETTE_MODE is off."""
+    global _cassette
+    if _cassette is None and CASSETTE_MODE != "off":
+        with _cassette_lock:
+            if _cassette is None:
+                _cassette = Cassette(CASSETTE_MODE, CASSETTE_PATH)
+                logger.info("Cassette %s mode: %s", CASSETTE_MODE, CASSETTE_PATH)
+    return _cassette
+
+
+def recorded(provider: str):
+    """
+    Decorator for a client's generate_text(prompt, model, ..., prefix,
+    output_schema): records or replays it when a cassette is active.
+    """
+    def decorate(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            cassette = get_cassette()
+            if cassette is None:
+                return func(*args, **kwargs)
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            arguments = bound.arguments
+            handler = cassette.record if cassette.mode == "record" else cassette.replay
+            return handler(
+                provider,
+                arguments["model"],
+                arguments["prompt"],
+                arguments.get("prefix"),
+                arguments.get("output_schema"),
+                lambda: func(*args, **kwargs),
+            )
+        return wrapper
+    return decorate
@@ -0,0 +1,142 @@
+"""
+Chunked Modification - Modify projects too large for one model call
+
+A modification normally sends the whole project and gets the whole modified
+project back, so a large project can exceed the model's context window or,
+more often, its output limit. Here the files are packed into chunks that fit
+both; each chunk call sees every project path plus the contents of its
+chunk, and returns only the files it changed or added. Chunks run
+concurrently and their results are merged over the base project.
+"""
+
+import json
+import time
+import asyncio
+from typing import Dict, Any, List, Optional, Tuple
+
+from models.fanout import FANOUT_MAX_CONCURRENCY, generate_json
+from prompts import render_modification_chunk_prompt
+from router.model_router import TokenBudgetError, OUTPUT_HEADROOM, CONTEXT_SAFETY_MARGIN
+from router.router_config import get_model_limits, get_output_limit
+from utils.tokenizer import count_tokens
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+# Tokens reserved per chunk prompt for the instruction wrapper and JSON escaping overhead
+CHUNK_OVERHEAD_TOKENS = 2048
+
+
+def plan_chunks(
+    base_project: Dict[str, Any],
+    instruction: str,
+    provider: str,
+    model: str,
+) -> Tuple[List[List[str]], int]:
+    """
+    Pack the project's files into chunks that fit the model.
+
+    Each chunk's file contents must fit the output limit (every shown file may
+    be rewritten) and, with the path listing and instruction, the context.
+
+    Returns:
+        (chunks of file paths, per-chunk content token budget)
+
+    Raises:
+        TokenBudgetError: If a single file does not fit a chunk
+    """
+    limits = get_model_limits(model)
+    files = base_project.get("files", {})
+    listing_tokens = count_tokens("\n".join(files), provider)
+    fixed_tokens = listing_tokens + count_tokens(instruction, provider) + CHUNK_OVERHEAD_TOKENS
+    usable_context = int(limits["context_window"] * (1 - CONTEXT_SAFETY_MARGIN))
+    output_budget = int(get_output_limit(model) / OUTPUT_HEADROOM)
+    # Input holds the chunk once, the output may hold it again
+    budget = min(output_budget, (usable_context - fixed_tokens) // 2)
+    if budget <= 0:
+        raise TokenBudgetError(f"Project file listing alone ({listing_tokens} tokens) exceeds {model}'s context")
+
+    chunks: List[List[str]] = []
+    current: List[str] = []
+    current_tokens = 0
+    for path in sorted(files):
+        tokens = count_tokens(json.dumps({path: files[path]}), provider)
+        if tokens > budget:
+            raise TokenBudgetError(f"File {path} ({tokens} tokens) is larger than {model} can rewrite in one response ({budget})")
+        if current and current_tokens + tokens > budget:
+            chunks.append(current)
+            current, current_tokens = [], 0
+        current.append(path)
+        current_tokens += tokens
+    if current:
+        chunks.append(current)
+    return chunks, budget
+
+
+async def modify_project_chunked(
+    base_project: Dict[str, Any],
+    instruction: str,
+    provider: str,
+    model: str,
+    emitter=None,
+    max_concurrency: int = FANOUT_MAX_CONCURRENCY,
+) -> Tuple[Optional[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Modify a large project chunk by chunk.
+
+    Returns:
+        (modified inner project or None if any chunk failed, report)
+
+    Raises:
+        TokenBudgetError: If the project cannot be chunked for this model
+    """
+    start = time.perf_counter()
+    chunks, budget = plan_chunks(base_project, instruction, provider, model)
+    max_tokens = min(get_output_limit(model), int(budget * OUTPUT_HEADROOM))
+    logger.info("%s files in %s chunks (<= %s tokens each) on %s", len(base_project.get('files', {})), len(chunks), budget, model)
+    if emitter is not None:
+        emitter.emit_chat_message(f"Large project: applying the change in {len(chunks)} parts...")
+
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    existing = set(base_project.get("files", {}))
+
+    async def run_chunk(index: int, paths: List[str]) -> Optional[Dict[str, Any]]:
+        parts = render_modification_chunk_prompt(base_project, paths, instruction, index, len(chunks), provider)
+        async with semaphore:
+            try:
+                result, seconds = await generate_json(parts, provider, model, max_tokens, "project_files", "modification_chunk")
+            except Exception as e:
+                logger.warning("Chunk %s failed: %s", index + 1, e)
+                return None
+        files = (result or {}).get("files")
+        if not isinstance(files, dict):
+            logger.warning("Chunk %s returned no parseable files", index + 1)
+            return None
+        # Accept the chunk's own files and new files; other existing files belong to other chunks
+        allowed = set(paths)
+        accepted = {path: content for path, content in files.items() if path in allowed or path not in existing}
+        logger.info("Chunk %s/%s: %s files changed in %.1fs", index + 1, len(chunks), len(accepted), seconds)
+        return accepted
+
+    results = await asyncio.gather(*(run_chunk(i, paths) for i, paths in enumerate(chunks)))
+    failed = [i + 1 for i, result in enumerate(results) if result is None]
+    report = {
+        "chunks": len(chunks),
+        "chunk_token_budget": budget,
+        "failed_chunks": failed,
+        "changed_files": [],
+        "seconds": 0.0,
+    }
+    if failed:
+        # A partially applied modification would leave the project inconsistent
+        logger.warning("%s of %s chunks failed; discarding the modification", len(failed), len(chunks))
+        return None, report
+
+    files = dict(base_project.get("files", {}))
+    for result in results:
+        files.update(result)
+    report["changed_files"] = sorted(set().union(*results))
+    report["seconds"] = round(time.perf_counter() - start, 3)
+    logger.info("Done in %ss: %s files changed, %s chunks failed", report['seconds'], len(report['changed_files']), len(failed))
+    return {**base_project, "files": files}, report
@@ -5,18 +5,17 @@ Claude Client - Anthropic Claude API integration
 import os
 import json
 import re
-from pathlib import Path
 from typing import Optional, Tuple
-from dotenv import load_dotenv
 
-try:
-    import anthropic
-except ImportError:
-    anthropic = None
+from models.schemas import resolve_output_schema, mark_unsupported, is_schema_rejection
+from models.cassette import recorded
+from utils.tokenizer import estimate_tokens
+from utils.metrics import FALLBACKS
+from utils.env import load_env
+from utils.tracing import span, SPAN_KIND_CLIENT
+from utils.logger import get_logger
 
-# Load .env from project root
-env_path = Path(__file__).parent.parent / ".env"
-load_dotenv(dotenv_path=env_path)
+logger = get_logger(__name__)
 
 _client = None
 
@@ -28,20 +27,122 @@ def _make_client():
         return _client
     
     # Reload env vars to ensure we get the latest values
-    load_dotenv(dotenv_path=env_path, override=True)
+    load_env(override=True)
     anthropic_api_key = os.getenv("ANTHROPIC_API_KEY")
     
     if not anthropic_api_key:
         raise RuntimeError("ANTHROPIC_API_KEY is not set. Please check your .env file.")
     
-    if anthropic is None:
+    # Imported on first use so the API starts without loading the SDK
+    try:
+        import anthropic
+    except ImportError:
         raise RuntimeError("anthropic package not installed. Run: pip install anthropic")
     
     _client = anthropic.Anthropic(api_key=anthropic_api_key)
     return _client
 
 
-def generate_text(prompt: str, model: str = "claude-3-haiku", fallback_models: list = None, max_tokens: int = 8192) -> str:
+def _build_content(prompt: str, prefix: Optional[str], plan):
+    """Message content, with a cache_control breakpoint after the static prefix."""
+    if not prefix:
+        return prompt
+    if plan is None or not plan.breakpoint:
+        return prefix + prompt
+    from models.prompt_cache import ANTHROPIC_CACHE_TTL
+    cache_control = {"type": "ephemeral"}
+    if ANTHROPIC_CACHE_TTL == "1h":
+        cache_control["ttl"] = "1h"
+    return [
+        {"type": "text", "text": prefix, "cache_control": cache_control},
+        {"type": "text", "text": prompt},
+    ]
+
+
+def _record_cache_usage(response, model_name: str, plan, prompt_text: str) -> None:
+    """Report input / cached-token usage of a response to the prompt cache."""
+    from models.prompt_cache import get_prompt_cache
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        get_prompt_cache().record_usage("anthropic", model_name, plan, estimate_tokens(prompt_text))
+        return
+    cache_read = getattr(usage, "cache_read_input_tokens", None) or 0
+    cache_write = getattr(usage, "cache_creation_input_tokens", None) or 0
+    input_tokens = (getattr(usage, "input_tokens", None) or 0) + cache_read + cache_write
+    get_prompt_cache().record_usage("anthropic", model_name, plan, input_tokens, cache_read, cache_write)
+
+
+def _record_usage(response, model_name: str, prompt_text: str, output_text: str) -> None:
+    """Record token usage and cost of a response (estimated if the response has no usage)."""
+    from storage.usage_store import record_usage
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        record_usage("anthropic", model_name, estimate_tokens(prompt_text), estimate_tokens(output_text), estimated=True)
+        return
+    cache_read = getattr(usage, "cache_read_input_tokens", None) or 0
+    cache_write = getattr(usage, "cache_creation_input_tokens", None) or 0
+    record_usage(
+        "anthropic",
+        model_name,
+        (getattr(usage, "input_tokens", None) or 0) + cache_read + cache_write,
+        getattr(usage, "output_tokens", None) or 0,
+        cache_read,
+        cache_write_tokens=cache_write,
+    )
+
+
+def _output_tool(schema) -> dict:
+    """Tool definition whose input is the structured output."""
+    return {
+        "name": f"emit_{schema.name}",
+        "description": f"Return the result: {schema.description}. Call this tool exactly once with the complete result.",
+        "input_schema": schema.schema,
+    }
+
+
+def _response_text(response) -> str:
+    """Text of a response; for forced tool use, the tool input as JSON."""
+    for block in response.content:
+        if getattr(block, "type", None) == "tool_use":
+            return json.dumps(block.input, ensure_ascii=False)
+    return response.content[0].text
+
+
+def _create_message(client, model_name: str, max_tokens: int, content, output_schema: Optional[str]):
+    """messages.create with a forced output tool, falling back to plain text if the model rejects the tool."""
+    schema = resolve_output_schema("anthropic", model_name, output_schema)
+    kwargs = {}
+    if schema is not None:
+        tool = _output_tool(schema)
+        kwargs = {"tools": [tool], "tool_choice": {"type": "tool", "name": tool["name"]}}
+    try:
+        return client.messages.create(
+            model=model_name,
+            max_tokens=max_tokens,
+            messages=[{"role": "user", "content": content}],
+            **kwargs
+        )
+    except Exception as e:
+        if schema is None or not is_schema_rejection("anthropic", e):
+            raise
+        response = client.messages.create(
+            model=model_name,
+            max_tokens=max_tokens,
+            messages=[{"role": "user", "content": content}]
+        )
+        mark_unsupported("anthropic", model_name, e)
+        return response
+
+
+@recorded("anthropic")
+def generate_text(
+    prompt: str,
+    model: str = "claude-3-haiku",
+    fallback_models: list = None,
+    max_tokens: int = 8192,
+    prefix: Optional[str] = None,
+    output_schema: Optional[str] = None,
+) -> str:
     """
     Generate text using Claude API.
     
@@ -50,6 +151,11 @@ def generate_text(prompt: str, model: str = "claude-3-haiku", fallback_models: l
         model: Model identifier
         fallback_models: Optional list of fallback models
         max_tokens: Maximum tokens to generate (default: 8192, use 16384+ for large projects)
+        prefix: Optional static start of the prompt (prompt is the dynamic
+            remainder); sent as a separate block with a cache_control breakpoint
+        output_schema: Optional schema name from models.schemas; the model is
+            forced to answer through a tool with that input schema and the
+            tool input is returned as JSON text
     
     Returns:
         Generated text
@@ -63,21 +169,27 @@ def generate_text(prompt: str, model: str = "claude-3-haiku", fallback_models: l
     last_error = None
     for model_name in models_to_try:
         try:
-            response = client.messages.create(
-                model=model_name,
-                max_tokens=max_tokens,
-                messages=[{"role": "user", "content": prompt}]
-            )
+            with span("provider.request", kind=SPAN_KIND_CLIENT, provider="anthropic", model=model_name):
+                plan = None
+                if prefix:
+                    from models.prompt_cache import get_prompt_cache
+                    plan = get_prompt_cache().plan("anthropic", model_name, prefix)
+                response = _create_message(client, model_name, max_tokens, _build_content(prompt, prefix, plan), output_schema)
+                if prefix:
+                    _record_cache_usage(response, model_name, plan, prefix + prompt)
             
-            # Check if response was truncated
-            if hasattr(response, 'stop_reason') and response.stop_reason == "max_tokens":
-                print(f"[CLAUDE_WARNING] Response truncated due to max_tokens limit. Consider increasing max_tokens.")
+                # Check if response was truncated
+                if hasattr(response, 'stop_reason') and response.stop_reason == "max_tokens":
+                    logger.warning("Response truncated due to max_tokens limit. Consider increasing max_tokens.")
             
-            return response.content[0].text
+                text = _response_text(response)
+                _record_usage(response, model_name, (prefix or "") + prompt, text)
+                return text
         except Exception as e:
             last_error = e
             if model_name != models_to_try[-1]:
-                print(f"[CLAUDE_FALLBACK] Model {model_name} failed, trying next...")
+                logger.warning("Model %s failed, trying next...", model_name)
+                FALLBACKS.labels("model").inc()
                 continue
             raise last_error
     
@@ -102,7 +214,7 @@ def classify_intent(user_text: str, model: str = None) -> Tuple[str, dict]:
     prompt = instructions + "\n\nUser message:\n" + json.dumps(user_text)
     
     try:
-        out = generate_text(prompt, model=model)
+        out = generate_text(prompt, model=model, output_schema="intent")
         start = out.find("{")
         end = out.rfind("}")
         if start != -1 and end != -1 and end > start:
@@ -137,7 +249,7 @@ def classify_page_type(user_text: str, model: str = None) -> Tuple[str, dict]:
     prompt = instructions + "\n\nUser message:\n" + json.dumps(user_text)
     
     try:
-        out = generate_text(prompt, model=model)
+        out = generate_text(prompt, model=model, output_schema="page_type")
         start = out.find("{")
         end = out.rfind("}")
         if start != -1 and end != -1 and end > start:
@@ -172,7 +284,7 @@ def analyze_query_detail(user_text: str, model: str = None) -> Tuple[bool, float
     prompt = instructions + "\n\nUser request:\n" + json.dumps(user_text)
     
     try:
-        out = generate_text(prompt, model=model)
+        out = generate_text(prompt, model=model, output_schema="query_detail")
         start = out.find("{")
         end = out.rfind("}")
         if start != -1 and end != -1 and end > start:
@@ -216,7 +328,7 @@ def classify_modification_complexity(instruction: str, model: str = None) -> Tup
     prompt = instructions + "\n\nModification instruction:\n" + json.dumps(instruction)
     
     try:
-        out = generate_text(prompt, model=model)
+        out = generate_text(prompt, model=model, output_schema="modification_complexity")
         start = out.find("{")
         end = out.rfind("}")
         if start != -1 and end != -1 and end > start:
@@ -0,0 +1,505 @@
+"""
+Fake Client - deterministic offline stand-in for the provider clients
+
+Serves the same calls as the Gemini/Claude/GPT clients without a network:
+schema-shaped output (classifier JSON, whole projects, fan-out plans and
+unit files, modified projects), with simulated latency, output size and
+optional corruption. Use it to measure the service's own overhead
+(testing.benchmark) or to run the API without credentials.
+
+It is reached through the provider layer: the "fake" model family
+(model_family="fake", models fake-router / fake-main), or FAKE_LLM=1 to
+send every family's calls here under their usual model names.
+
+Output is derived from the prompt: a modification prompt gets its base
+project back with some files changed, a fan-out worker gets the files it
+was assigned, and so on. Latency and corruption are drawn from a random
+generator seeded with FAKE_LLM_SEED, the model, the prompt and how many
+times that prompt was seen, so a run is reproducible regardless of
+concurrency.
+
+Configuration (environment, or configure(...) at runtime):
+
+- FAKE_LLM_SEED: seed (default 0)
+- FAKE_LLM_TTFT_MS: time to first token, a distribution: "250" (fixed),
+  "uniform:100:400", "normal:300:50", "lognormal:300:0.5" (median, sigma)
+  or "exponential:300" (mean); default "lognormal:300:0.5"
+- FAKE_LLM_TOKENS_PER_SECOND: output rate after the first token (default
+  200; 0 returns instantly)
+- FAKE_LLM_CHUNK_TOKENS: tokens per streamed chunk (default 16)
+- FAKE_LLM_PROJECT_FILES / FAKE_LLM_FILE_TOKENS: size of a generated
+  project (default 8 files of about 400 tokens)
+- FAKE_LLM_CORRUPTION: probability per corruption mode of JSON output,
+  e.g. "truncation=0.05,fence=0.2,trailing_comma=0.05"
+- FAKE_LLM_ERROR_RATE: probability that a call raises (default 0)
+"""
+
+import os
+import re
+import json
+import math
+import time
+import random
+import hashlib
+import threading
+from collections import Counter
+from typing import Any, Callable, Dict, Generator, List, NamedTuple, Optional, Tuple
+
+from models.cassette import recorded
+from utils.tokenizer import estimate_tokens
+from utils.tracing import span, SPAN_KIND_CLIENT
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+CORRUPTION_MODES = ("truncation", "fence", "trailing_comma")
+
+# Characters per simulated token
+CHARS_PER_TOKEN = 4
+
+
+class FakeProviderError(RuntimeError):
+    """Error injected by FAKE_LLM_ERROR_RATE."""
+    pass
+
+
+class FakeProviderConfig(NamedTuple):
+    """Behaviour of the fake provider."""
+    seed: int = 0
+    ttft_ms: str = "lognormal:300:0.5"
+    tokens_per_second: float = 200.0
+    chunk_tokens: int = 16
+    project_files: int = 8
+    file_tokens: int = 400
+    corruption: Dict[str, float] = {}
+    error_rate: float = 0.0
+
+
+def parse_corruption(spec: str) -> Dict[str, float]:
+    """'truncation=0.05,fence=0.2' -> {mode: probability}."""
+    rates = {}
+    for item in (spec or "").split(","):
+        mode, sep, rate = item.partition("=")
+        mode = mode.strip()
+        if not sep or not mode:
+            continue
+        if mode not in CORRUPTION_MODES:
+            raise ValueError(f"Unknown corruption mode: {mode}. Available: {', '.join(CORRUPTION_MODES)}")
+        rates[mode] = float(rate)
+    return rates
+
+
+def parse_distribution(spec: str) -> Callable[[random.Random], float]:
+    """
+    Sampler for a latency distribution spec (milliseconds).
+
+    Raises:
+        ValueError: For unknown or malformed specs
+    """
+    kind, _, args = str(spec).strip().partition(":")
+    try:
+        if not args:
+            value = float(kind)
+            return lambda rng: value
+        params = [float(arg) for arg in args.split(":")]
+    except ValueError:
+        raise ValueError(f"Malformed latency distribution: {spec}")
+    if kind == "fixed" and len(params) == 1:
+        return lambda rng: params[0]
+    if kind == "uniform" and len(params) == 2:
+        return lambda rng: rng.uniform(params[0], params[1])
+    if kind == "normal" and len(params) == 2:
+        return lambda rng: max(0.0, rng.gauss(params[0], params[1]))
+    if kind == "lognormal" and len(params) == 2:
+        mu = math.log(params[0]) if params[0] > 0 else 0.0
+        return lambda rng: rng.lognormvariate(mu, params[1])
+    if kind == "exponential" and len(params) == 1:
+        return lambda rng: rng.expovariate(1.0 / params[0]) if params[0] > 0 else 0.0
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+def config_from_env() -> FakeProviderConfig:
+    """FakeProviderConfig from the FAKE_LLM_* environment variables."""
+    default = FakeProviderConfig()
+    return FakeProviderConfig(
+        seed=int(os.getenv("FAKE_LLM_SEED", str(default.seed))),
+        ttft_ms=os.getenv("FAKE_LLM_TTFT_MS", default.ttft_ms),
+        tokens_per_second=float(os.getenv("FAKE_LLM_TOKENS_PER_SECOND", str(default.tokens_per_second))),
+        chunk_tokens=int(os.getenv("FAKE_LLM_CHUNK_TOKENS", str(default.chunk_tokens))),
+        project_files=int(os.getenv("FAKE_LLM_PROJECT_FILES", str(default.project_files))),
+        file_tokens=int(os.getenv("FAKE_LLM_FILE_TOKENS", str(default.file_tokens))),
+        corruption=parse_corruption(os.getenv("FAKE_LLM_CORRUPTION", "")),
+        error_rate=float(os.getenv("FAKE_LLM_ERROR_RATE", str(default.error_rate))),
+    )
+
+
+_config: FakeProviderConfig = config_from_env()
+_ttft: Callable[[random.Random], float] = parse_distribution(_config.ttft_ms)
+_config_lock = threading.Lock()
+_occurrences: Counter = Counter()
+_stats: Counter = Counter()
+
+
+def get_config() -> FakeProviderConfig:
+    return _config
+
+
+def configure(**changes) -> FakeProviderConfig:
+    """
+    Change the fake provider's behaviour (fields of FakeProviderConfig) and
+    reset its occurrence counts, so runs with the same seed repeat exactly.
+
+    Returns:
+        The previous configuration (pass its fields back to restore it)
+    """
+    global _config, _ttft
+    with _config_lock:
+        previous = _config
+        if isinstance(changes.get("corruption"), str):
+            changes["corruption"] = parse_corruption(changes["corruption"])
+        config = _config._replace(**changes)
+        _ttft = parse_distribution(config.ttft_ms)
+        _config = config
+        _occurrences.clear()
+        _stats.clear()
+    return previous
+
+
+def stats() -> Dict[str, int]:
+    """Calls, errors, corruptions and output tokens since the last configure()."""
+    with _config_lock:
+        return dict(_stats)
+
+
+# --------------------------------------------------
+# Output synthesis
+# --------------------------------------------------
+
+WORDS = (
+    "launch", "studio", "orbit", "harbor", "signal", "canvas", "summit", "pulse", "atlas", "ember",
+    "meadow", "vector", "copper", "lumen", "cascade", "beacon", "willow", "quartz", "nimbus", "forge",
+)
+
+GREETINGS = {"hi", "hello", "hey", "yo", "hiya", "greetings", "thanks", "thank"}
+BUILD_WORDS = {"build", "create", "make", "website", "webpage", "page", "site", "app", "dashboard", "portal", "store", "landing"}
+
+
+def _words(rng: random.Random, count: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(count))
+
+
+def _component(name: str, tokens: int, rng: random.Random) -> str:
+    """A self-contained TSX component of roughly the given size."""
+    head = (
+        f"export default function {name}() {{\n"
+        f"  return (\n"
+        f"    <section className=\"py-16 px-6\" id=\"{name.lower()}\">\n"
+        f"      <h2 className=\"text-3xl font-bold\">{_words(rng, 3).title()}</h2>\n"
+        f"      <ul className=\"mt-6 grid gap-4 md:grid-cols-3\">\n"
+    )
+    tail = "      </ul>\n    </section>\n  );\n}\n"
+    items = []
+    size = len(head) + len(tail)
+    index = 0
+    while size < tokens * CHARS_PER_TOKEN:
+        item = f"        <li key=\"{index}\" className=\"rounded-lg border p-4\">{_words(rng, 6).capitalize()}.</li>\n"
+        items.append(item)
+        size += len(item)
+        index += 1
+    return head + "".join(items) + tail
+
+
+def _app(component_paths: List[str]) -> str:
+    names = [os.path.splitext(os.path.basename(path))[0] for path in component_paths]
+    imports = "".join(
+        f"import {name} from './{os.path.splitext(path[len('src/'):])[0]}';\n"
+        for name, path in zip(names, component_paths)
+    )
+    body = "".join(f"      <{name} />\n" for name in names)
+    return f"{imports}\nexport default function App() {{\n  return (\n    <main>\n{body}    </main>\n  );\n}}\n"
+
+
+def _component_paths(count: int) -> List[str]:
+    return [f"src/components/Section{index + 1}.tsx" for index in range(max(count - 1, 1))]
+
+
+def _project(rng: random.Random) -> Dict[str, Any]:
+    config = _config
+    paths = _component_paths(config.project_files)
+    files = {"src/App.tsx": _app(paths)}
+    for path in paths:
+        files[path] = _component(os.path.splitext(os.path.basename(path))[0], config.file_tokens, rng)
+    return {"name": f"{_words(rng, 2).title()} Site", "description": f"A {_words(rng, 4)} website", "files": files}
+
+
+def _plan(rng: random.Random) -> Dict[str, Any]:
+    config = _config
+    paths = _component_paths(config.project_files)
+    unit_count = max(1, min(4, len(paths)))
+    units = [
+        {"id": f"unit-{index + 1}", "title": f"Sections {index + 1}", "description": "Page sections", "files": paths[index::unit_count]}
+        for index in range(unit_count)
+    ]
+    return {
+        "name": f"{_words(rng, 2).title()} Site",
+        "description": f"A {_words(rng, 4)} website",
+        "shared_files": {"src/App.tsx": _app(paths), "src/types.ts": "export type Section = { id: string; title: string };\n"},
+        "units": units,
+    }
+
+
+def _modified(content: str, rng: random.Random) -> str:
+    return content + f"\n// Updated: {_words(rng, 3)}\n"
+
+
+def _json_after(text: str, marker: str) -> Optional[Any]:
+    """The JSON value that starts right after marker (first occurrence)."""
+    start = text.find(marker)
+    if start == -1:
+        return None
+    start = text.find("{", start + len(marker))
+    if start == -1:
+        return None
+    try:
+        value, _ = json.JSONDecoder().raw_decode(text, start)
+    except ValueError:
+        return None
+    return value
+
+
+def _listed_paths(text: str, marker: str) -> List[str]:
+    """Paths of the '- path' lines following marker."""
+    start = text.find(marker)
+    if start == -1:
+        return []
+    paths = []
+    for line in text[start + len(marker):].splitlines():
+        if line.startswith("- "):
+            paths.append(line[2:].strip())
+        elif paths or line.strip():
+            break
+    return paths
+
+
+def _user_text(prompt: str) -> str:
+    """The user message of a classifier prompt (a JSON string after the last blank line)."""
+    tail = prompt.rsplit("\n\n", 1)[-1]
+    try:
+        value = json.loads(tail)
+    except ValueError:
+        return tail
+    return value if isinstance(value, str) else tail
+
+
+def _classify_text(output_schema: str, text: str) -> Dict[str, Any]:
+    words = re.findall(r"[a-z]+", text.lower())
+    if output_schema == "intent":
+        if words and len(words) <= 3 and set(words) & GREETINGS:
+            label = "greeting_only"
+        elif set(words) & BUILD_WORDS:
+            label = "webpage_build"
+        else:
+            label = "chat"
+        return {"label": label, "explanation": "Keyword match (fake provider)", "confidence": 0.9}
+    if output_schema == "page_type":
+        from data.page_types_reference import PAGE_TYPES
+        scores = {key: len(set(words) & set(config.get("keywords", []))) for key, config in PAGE_TYPES.items()}
+        best = max(scores, key=scores.get) if scores else "landing_page"
+        page_type = best if scores.get(best) else "landing_page"
+        return {"page_type": page_type, "explanation": "Keyword match (fake provider)", "confidence": 0.9}
+    if output_schema == "query_detail":
+        return {"needs_followup": len(words) < 8, "explanation": "Word count (fake provider)", "confidence": 0.8}
+    complexity = "small" if len(words) < 6 else "complex" if len(words) > 25 else "medium"
+    return {"complexity": complexity, "explanation": "Word count (fake provider)", "confidence": 0.8}
+
+
+def _respond(prompt: str, output_schema: Optional[str], rng: random.Random) -> str:
+    """Uncorrupted output for a prompt and schema."""
+    if output_schema in ("intent", "page_type", "query_detail", "modification_complexity"):
+        return json.dumps(_classify_text(output_schema, _user_text(prompt)))
+    if output_schema == "project_plan":
+        return json.dumps(_plan(rng), indent=2)
+    if output_schema == "project_files":
+        shown = _json_after(prompt, "Files shown to you")
+        if isinstance(shown, dict):
+            # Chunked modification: change the first shown file
+            changed = {path: _modified(content, rng) for path, content in list(shown.items())[:1]}
+            return json.dumps({"files": changed}, indent=2)
+        paths = _listed_paths(prompt, "Files to write:\n")
+        files = {}
+        for path in paths:
+            name = re.sub(r"\W", "", os.path.splitext(os.path.basename(path))[0]) or "Section"
+            files[path] = _component(name, _config.file_tokens, rng)
+        return json.dumps({"files": files}, indent=2)
+    if output_schema == "project":
+        base = _json_after(prompt, '"project":')
+        if isinstance(base, dict) and isinstance(base.get("files"), dict):
+            # Modification: the whole project back, with a quarter of its files changed
+            files = dict(base["files"])
+            for path in sorted(files)[: max(1, len(files) // 4)]:
+                if isinstance(files[path], str):
+                    files[path] = _modified(files[path], rng)
+            return json.dumps({"project": {**base, "files": files}}, indent=2)
+        return json.dumps({"project": _project(rng)}, indent=2)
+    return f"This is a {_words(rng, 2)} reply from the fake provider. It has no real model behind it."
+
+
+def _corrupt(text: str, rng: random.Random) -> Tuple[str, List[str]]:
+    applied = []
+    rates = _config.corruption
+    if rng.random() < rates.get("trailing_comma", 0.0):
+        stripped = text.rstrip()
+        if stripped.endswith("}"):
+            text = stripped[:-1].rstrip() + ",\n}"
+            applied.append("trailing_comma")
+    if rng.random() < rates.get("fence", 0.0):
+        text = f"```json\n{text}\n```"
+        applied.append("fence")
+    if rng.random() < rates.get("truncation", 0.0):
+        text = text[: int(len(text) * rng.uniform(0.5, 0.95))]
+        applied.append("truncation")
+    return text, applied
+
+
+def _call(prompt: str, model: str, output_schema: Optional[str]) -> Tuple[str, random.Random, List[str]]:
+    """Output text, the call's random generator and the corruptions applied."""
+    digest = hashlib.blake2b(f"{model}\0{output_schema}\0{prompt}".encode("utf-8", "surrogatepass"), digest_size=16).hexdigest()
+    with _config_lock:
+        occurrence = _occurrences[digest]
+        _occurrences[digest] += 1
+        seed = _config.seed
+    rng = random.Random(f"{seed}:{digest}:{occurrence}")
+    text = _respond(prompt, output_schema, rng)
+    applied = []
+    if output_schema is not None and _config.corruption:
+        text, applied = _corrupt(text, rng)
+    return text, rng, applied
+
+
+def _record(model: str, prompt: str, text: str, applied: List[str]) -> int:
+    from storage.usage_store import record_usage
+    prompt_tokens = estimate_tokens(prompt)
+    output_tokens = estimate_tokens(text)
+    record_usage("fake", model, prompt_tokens, output_tokens)
+    with _config_lock:
+        _stats["calls"] += 1
+        _stats["output_tokens"] += output_tokens
+        for mode in applied:
+            _stats[mode] += 1
+    return output_tokens
+
+
+def _maybe_fail(rng: random.Random, model: str) -> None:
+    if _config.error_rate and rng.random() < _config.error_rate:
+        with _config_lock:
+            _stats["errors"] += 1
+        raise FakeProviderError(f"Injected error from fake model {model}")
+
+
+@recorded("fake")
+def generate_text(
+    prompt: str,
+    model: str = "fake-main",
+    fallback_models: list = None,
+    max_tokens: int = 8192,
+    prefix: Optional[str] = None,
+    output_schema: Optional[str] = None,
+) -> str:
+    """
+    Generate text with the fake provider.
+
+    Sleeps for the simulated time to first token plus output time, then
+    returns the whole text (same signature as the real clients;
+    fallback_models and max_tokens are accepted and ignored).
+    """
+    full_prompt = (prefix or "") + prompt
+    with span("provider.request", kind=SPAN_KIND_CLIENT, provider="fake", model=model) as s:
+        text, rng, applied = _call(full_prompt, model, output_schema)
+        ttft = _ttft(rng) / 1000.0
+        _maybe_fail(rng, model)
+        output_tokens = _record(model, full_prompt, text, applied)
+        rate = _config.tokens_per_second
+        time.sleep(ttft + (output_tokens / rate if rate > 0 else 0.0))
+        if applied:
+            s.set_attribute("fake.corruption", ",".join(applied))
+        return text
+
+
+def generate_stream(
+    prompt: str,
+    model: str = "fake-main",
+    prefix: Optional[str] = None,
+    output_schema: Optional[str] = None,
+) -> Generator[str, None, None]:
+    """
+    Stream fake output in FAKE_LLM_CHUNK_TOKENS chunks, paced at
+    FAKE_LLM_TOKENS_PER_SECOND after the simulated first-token delay.
+    """
+    full_prompt = (prefix or "") + prompt
+    text, rng, applied = _call(full_prompt, model, output_schema)
+    time.sleep(_ttft(rng) / 1000.0)
+    _maybe_fail(rng, model)
+    _record(model, full_prompt, text, applied)
+    chunk_chars = max(1, _config.chunk_tokens) * CHARS_PER_TOKEN
+    rate = _config.tokens_per_second
+    for start in range(0, len(text), chunk_chars):
+        chunk = text[start:start + chunk_chars]
+        if rate > 0 and start:
+            time.sleep(len(chunk) / CHARS_PER_TOKEN / rate)
+        yield chunk
+
+
+# --------------------------------------------------
+# Classifiers (same contract as the real clients)
+# --------------------------------------------------
+
+def _classifier(output_schema: str, user_text: str, model: Optional[str], field: str, default: Any) -> Tuple[Any, dict]:
+    if model is None:
+        model = "fake-router"
+    prompt = f"Classify ({output_schema}).\n\n{json.dumps(user_text)}"
+    try:
+        out = generate_text(prompt, model=model, output_schema=output_schema)
+        start = out.find("{")
+        end = out.rfind("}")
+        if start != -1 and end != -1 and end > start:
+            parsed = json.loads(out[start:end + 1])
+            result = {
+                "explanation": parsed.get("explanation", ""),
+                "confidence": float(parsed.get("confidence", 0.0)),
+                "raw": out,
+                "model": model,
+            }
+            return parsed.get(field, default), result
+        return default, {"explanation": "Could not parse classifier output", "confidence": 0.0, "raw": out, "model": model}
+    except Exception as e:
+        return default, {"explanation": f"classifier error: {e}", "confidence": 0.0, "raw": "", "model": model}
+
+
+def classify_intent(user_text: str, model: str = None) -> Tuple[str, dict]:
+    """Classify user intent (keyword rules)."""
+    return _classifier("intent", user_text, model, "label", "chat")
+
+
+def classify_page_type(user_text: str, model: str = None) -> Tuple[str, dict]:
+    """Classify page type (page type keywords, else landing_page)."""
+    return _classifier("page_type", user_text, model, "page_type", "generic")
+
+
+def analyze_query_detail(user_text: str, model: str = None) -> Tuple[bool, float]:
+    """Needs follow-up questions below eight words."""
+    needs_followup, result = _classifier("query_detail", user_text, model, "needs_followup", True)
+    if result["explanation"].startswith(("classifier error", "Could not parse")):
+        return True, 0.0
+    return needs_followup, result["confidence"]
+
+
+def chat_response(user_text: str, model: str = None) -> str:
+    """Canned chat reply."""
+    return generate_text(f"Reply in max 4 sentences.\nUser: {user_text}", model=model or "fake-router").strip()
+
+
+def classify_modification_complexity(instruction: str, model: str = None) -> Tuple[str, dict]:
+    """Classify modification complexity by instruction length."""
+    complexity, result = _classifier("modification_complexity", instruction, model, "complexity", "medium")
+    return complexity if complexity in ("small", "medium", "complex") else "medium", result
@@ -0,0 +1,330 @@
+"""
+Fan-out Generation - Planner/worker project generation with bounded concurrency
+
+Instead of one call that writes the whole project, a plan call writes the
+shared files (src/App.tsx routing, src/types.ts, src/index.css) and splits
+the remaining src/ files into units; each unit is then written by its own
+call, at most max_concurrency at a time. Wall-clock time approaches the
+slowest unit rather than the sum, and no single response has to fit the
+whole project (the main truncation cause).
+
+After merging, a consistency check verifies that every planned file exists
+and that every relative import resolves; files that are imported but
+missing get one repair call.
+
+Every call is sized with route_request: the plan for PLAN_OUTPUT_TOKENS,
+a worker for FANOUT_TOKENS_PER_FILE per file it writes, so max_tokens
+follows the model's limits and a unit too large for the model is upgraded
+like any other request.
+"""
+
+import os
+import re
+import time
+import asyncio
+import posixpath
+from typing import Dict, Any, List, Optional, Tuple
+
+from models.json_parser import extract_json_from_text, parse_json_with_fallback
+from models.unified_client import generate_project_text_unified
+from router.adaptive import get_model_selector
+from router.model_router import route_request, RoutingDecision, GENERATION_OUTPUT_TOKENS
+from utils.tokenizer import count_tokens
+from utils.metrics import StageTimer, RETRIES
+from utils.tracing import span
+from prompts import get_prompt_templates
+from scaffold import get_scaffold_template, merge_scaffold
+from scaffold.engine import DEV_DEPENDENCIES
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+FANOUT_MAX_CONCURRENCY = int(os.getenv("FANOUT_MAX_CONCURRENCY", "4"))
+FANOUT_MAX_UNITS = int(os.getenv("FANOUT_MAX_UNITS", "12"))
+# Expected output of the plan call (plan plus shared files)
+PLAN_OUTPUT_TOKENS = 8192
+# Expected output per file a worker writes (capped at a full project)
+FANOUT_TOKENS_PER_FILE = int(os.getenv("FANOUT_TOKENS_PER_FILE", "2048"))
+
+IMPORT_PATTERN = re.compile(
+    r"""(?:import|export)\s+(?:[^'";]*?\s+from\s+)?['"]([^'"]+)['"]|import\(\s*['"]([^'"]+)['"]\s*\)"""
+)
+RESOLVE_SUFFIXES = ("", ".ts", ".tsx", ".js", ".jsx", ".css", ".json", "/index.ts", "/index.tsx", "/index.js")
+SOURCE_SUFFIXES = (".ts", ".tsx", ".js", ".jsx")
+
+
+class FanoutError(RuntimeError):
+    """The plan could not be produced or parsed."""
+
+
+def _parse_json_object(text: str) -> Optional[Dict[str, Any]]:
+    if not text:
+        return None
+    candidate = extract_json_from_text(text) or text
+    parsed = parse_json_with_fallback(candidate)
+    return parsed if isinstance(parsed, dict) else None
+
+
+def _file_text(content: Any) -> str:
+    if isinstance(content, dict):
+        return str(content.get("content", ""))
+    return content if isinstance(content, str) else ""
+
+
+def _package_name(specifier: str) -> str:
+    parts = specifier.split("/")
+    return "/".join(parts[:2]) if specifier.startswith("@") else parts[0]
+
+
+def _resolves(files: Dict[str, Any], importer: str, specifier: str) -> bool:
+    base = posixpath.normpath(posixpath.join(posixpath.dirname(importer), specifier))
+    return any(base + suffix in files for suffix in RESOLVE_SUFFIXES)
+
+
+def check_consistency(project: Dict[str, Any], planned_files: List[str], page_type_key: Optional[str]) -> Dict[str, Any]:
+    """
+    Check a merged project for missing planned files, unresolved relative
+    imports and imports of packages the scaffold does not provide.
+
+    Returns:
+        {"ok": bool, "missing_files": [...], "unresolved_imports": [{file, import}],
+         "missing_import_targets": [...], "unknown_packages": [{file, package}]}
+    """
+    files = project.get("files", {})
+    allowed_packages = set(get_scaffold_template(page_type_key).dependencies) | set(DEV_DEPENDENCIES)
+
+    missing_files = [path for path in planned_files if path not in files]
+    unresolved = []
+    missing_targets = set()
+    unknown_packages = []
+    for path, content in files.items():
+        if not path.endswith(SOURCE_SUFFIXES):
+            continue
+        for match in IMPORT_PATTERN.finditer(_file_text(content)):
+            specifier = match.group(1) or match.group(2)
+            if specifier.startswith("."):
+                if not _resolves(files, path, specifier):
+                    unresolved.append({"file": path, "import": specifier})
+                    target = posixpath.normpath(posixpath.join(posixpath.dirname(path), specifier))
+                    if not posixpath.splitext(target)[1]:
+                        target += ".tsx"
+                    missing_targets.add(target)
+            elif not specifier.startswith("/") and _package_name(specifier) not in allowed_packages:
+                unknown_packages.append({"file": path, "package": _package_name(specifier)})
+
+    return {
+        "ok": not (missing_files or unresolved or unknown_packages),
+        "missing_files": missing_files,
+        "unresolved_imports": unresolved,
+        "missing_import_targets": sorted(missing_targets),
+        "unknown_packages": unknown_packages,
+    }
+
+
+def _route_call(model_family: str, model: str, prompt_parts, provider: str, expected_output_tokens: int) -> RoutingDecision:
+    """Model and max_tokens for one fan-out call (raises TokenBudgetError if nothing fits)."""
+    prompt_tokens = count_tokens(prompt_parts.prefix, provider) + count_tokens(prompt_parts.suffix, provider)
+    return route_request(model_family, prompt_tokens, expected_output_tokens, preferred_model=model)
+
+
+async def generate_json(
+    prompt_parts, provider: str, model: str, max_tokens: int, output_schema: str, operation: str = "fanout"
+) -> Tuple[Optional[Dict[str, Any]], float]:
+    """Run one project-JSON call off the event loop; returns (parsed object or None, seconds)."""
+    start = time.perf_counter()
+    output = await asyncio.to_thread(
+        generate_project_text_unified, prompt_parts, provider, model, max_tokens, output_schema, operation
+    )
+    with StageTimer("parse"):
+        parsed = _parse_json_object(output)
+    get_model_selector().record_parse(model, operation, parsed is not None)
+    return parsed, time.perf_counter() - start
+
+
+def _normalize_units(plan: Dict[str, Any], shared_paths: set) -> List[Dict[str, Any]]:
+    """Keep src/ files, drop duplicates and shared files, and cap the unit count."""
+    seen = set(shared_paths)
+    units = []
+    for index, unit in enumerate(plan.get("units") or []):
+        if not isinstance(unit, dict):
+            continue
+        files = []
+        for path in unit.get("files") or []:
+            if isinstance(path, str) and path.startswith("src/") and path not in seen:
+                seen.add(path)
+                files.append(path)
+        if files:
+            units.append({**unit, "id": str(unit.get("id") or f"unit-{index + 1}"), "files": files})
+
+    if len(units) > FANOUT_MAX_UNITS:
+        # Fold the overflow into the last allowed unit
+        overflow = [path for unit in units[FANOUT_MAX_UNITS - 1:] for path in unit["files"]]
+        units = units[:FANOUT_MAX_UNITS - 1] + [{
+            "id": "remaining",
+            "title": "Remaining files",
+            "description": "; ".join(u.get("description", "") for u in units[FANOUT_MAX_UNITS - 1:] if u.get("description")),
+            "files": overflow,
+        }]
+    return units
+
+
+async def generate_project_fanout(
+    provider: str,
+    model: str,
+    page_type_key: Optional[str],
+    questionnaire_answers: Optional[Dict[str, Any]] = None,
+    wizard_inputs: Optional[Dict[str, Any]] = None,
+    emitter=None,
+    max_concurrency: int = FANOUT_MAX_CONCURRENCY,
+    model_family: Optional[str] = None,
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Generate a project with one plan call and concurrent per-unit calls.
+
+    Args:
+        provider: gemini, anthropic or openai
+        model: Model used for the plan and every worker
+        page_type_key: Page type (selects templates and scaffold)
+        questionnaire_answers: Optional questionnaire answers
+        wizard_inputs: Optional wizard inputs
+        emitter: Optional EventEmitter for progress chat messages
+        max_concurrency: Maximum worker calls in flight
+        model_family: Model family for routing the calls (defaults to provider)
+
+    Returns:
+        (inner project dict with scaffold merged, report)
+
+    Raises:
+        FanoutError: If the plan call failed or its output could not be
+            parsed, every unit failed, or the project is still inconsistent
+            after the repair round
+    """
+    start = time.perf_counter()
+    model_family = model_family or provider
+    template = get_prompt_templates().fanout(provider, page_type_key)
+
+    # 1. Plan; any failure here lets the caller fall back to single-call generation
+    plan_parts = template.render_plan(questionnaire_answers, wizard_inputs)
+    try:
+        decision = _route_call(model_family, model, plan_parts, provider, PLAN_OUTPUT_TOKENS)
+        plan, plan_seconds = await generate_json(plan_parts, provider, decision.model, decision.max_tokens, "project_plan")
+    except Exception as e:
+        raise FanoutError(f"Plan call failed: {e}") from e
+    if not plan or not isinstance(plan.get("units"), list):
+        raise FanoutError("Failed to parse the fan-out plan from model output")
+
+    shared_files = {
+        path: content for path, content in (plan.get("shared_files") or {}).items()
+        if isinstance(path, str) and path.startswith("src/")
+    }
+    units = _normalize_units(plan, set(shared_files))
+    planned_files = list(shared_files) + [path for unit in units for path in unit["files"]]
+    logger.info("Plan: %s shared files, %s units, %s files (%.1fs)", len(shared_files), len(units), len(planned_files), plan_seconds)
+    if emitter is not None:
+        emitter.emit_chat_message(f"Planned {len(units)} parts; generating them in parallel...")
+
+    # 2. Workers, bounded by a semaphore
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    unit_seconds: Dict[str, float] = {}
+    failed_units: List[str] = []
+
+    async def run_unit(unit: Dict[str, Any], paths: List[str]) -> Dict[str, Any]:
+        with span("fanout.unit", unit=unit["id"], files=len(paths)) as unit_span:
+            # Time waiting for a worker slot, i.e. queued behind other units
+            queued = time.perf_counter()
+            async with semaphore:
+                unit_span.set_attribute("queue_seconds", round(time.perf_counter() - queued, 3))
+                try:
+                    worker_parts = template.render_worker(plan, unit, paths, questionnaire_answers, wizard_inputs)
+                    decision = _route_call(
+                        model_family, model, worker_parts, provider,
+                        min(GENERATION_OUTPUT_TOKENS, len(paths) * FANOUT_TOKENS_PER_FILE),
+                    )
+                    unit_span.set_attribute("max_tokens", decision.max_tokens)
+                    result, seconds = await generate_json(
+                        worker_parts, provider, decision.model, decision.max_tokens, "project_files",
+                    )
+                except Exception as e:
+                    logger.warning("Unit %s failed: %s", unit['id'], e)
+                    unit_span.set_error(str(e))
+                    failed_units.append(unit["id"])
+                    return {}
+            unit_seconds[unit["id"]] = round(seconds, 3)
+            files = (result or {}).get("files")
+            if not isinstance(files, dict):
+                logger.warning("Unit %s returned no parseable files", unit['id'])
+                unit_span.set_error("no parseable files")
+                failed_units.append(unit["id"])
+                return {}
+            accepted = {path: content for path, content in files.items() if path in paths}
+            logger.info("Unit %s: %s/%s files in %.1fs", unit['id'], len(accepted), len(paths), seconds)
+            if emitter is not None:
+                emitter.emit_chat_message(f"Generated {unit.get('title') or unit['id']}")
+            return accepted
+
+    workers_start = time.perf_counter()
+    results = await asyncio.gather(*(run_unit(unit, unit["files"]) for unit in units))
+    workers_seconds = time.perf_counter() - workers_start
+    if units and len(failed_units) == len(units):
+        raise FanoutError(f"All {len(units)} units failed")
+
+    # 3. Merge
+    files: Dict[str, Any] = dict(shared_files)
+    for unit_files in results:
+        files.update(unit_files)
+    raw_project = {
+        "name": plan.get("name") or (page_type_key or "webpage-project"),
+        "description": plan.get("description", ""),
+        "files": files,
+    }
+    project, _ = merge_scaffold(raw_project, page_type_key)
+
+    # 4. Consistency check, with one repair round for missing files
+    report = check_consistency(project, planned_files, page_type_key)
+    repaired: List[str] = []
+    to_repair = sorted(set(report["missing_files"]) | set(report["missing_import_targets"]))
+    if to_repair:
+        logger.info("Repairing %s missing files: %s", len(to_repair), ', '.join(to_repair))
+        repair_unit = {
+            "id": "repair",
+            "title": "Missing files",
+            "description": "These files are imported by other files or were planned but not written yet.",
+            "files": to_repair,
+        }
+        RETRIES.labels("fanout_repair").inc()
+        with StageTimer("repair"):
+            repaired_files = await run_unit(repair_unit, to_repair)
+        if repaired_files:
+            files.update(repaired_files)
+            repaired = sorted(repaired_files)
+            project, _ = merge_scaffold(raw_project, page_type_key)
+            report = check_consistency(project, planned_files, page_type_key)
+    if not report["ok"]:
+        # Let the caller fall back to single-call generation rather than ship a broken project
+        raise FanoutError(
+            f"Project inconsistent after repair: {len(report['missing_files'])} missing files, "
+            f"{len(report['unresolved_imports'])} unresolved imports, {len(report['unknown_packages'])} unknown packages"
+        )
+
+    total_seconds = time.perf_counter() - start
+    report.update({
+        "units": len(units),
+        "failed_units": failed_units,
+        "repaired_files": repaired,
+        "plan_seconds": round(plan_seconds, 3),
+        "workers_seconds": round(workers_seconds, 3),
+        "slowest_unit_seconds": max(unit_seconds.values(), default=0.0),
+        "sum_unit_seconds": round(sum(unit_seconds.values()), 3),
+        "total_seconds": round(total_seconds, 3),
+    })
+    logger.info(
+        "Done in %.1fs (plan %.1fs, workers %.1fs, slowest unit %ss, sum %ss); consistency %s",
+        total_seconds,
+        plan_seconds,
+        workers_seconds,
+        report['slowest_unit_seconds'],
+        report['sum_unit_seconds'],
+        'ok' if report['ok'] else 'issues: ' + str(len(report['missing_files']) + len(report['unresolved_imports']) + len(report['unknown_packages'])),
+    )
+    return project, report
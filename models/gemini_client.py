@@ -2,10 +2,21 @@
 import os
 import json
 import re
-from typing import Optional, Tuple, Generator
+from typing import Optional, Tuple, Generator, TYPE_CHECKING
 
-from google import genai
-from google.genai.types import HttpOptions
+from models.schemas import resolve_output_schema, mark_unsupported, is_schema_rejection
+from models.cassette import recorded
+from utils.tokenizer import estimate_tokens
+from utils.metrics import StageTimer, RETRIES, FALLBACKS
+from utils.tracing import span, SPAN_KIND_CLIENT
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# google.genai takes about half a second to import; it is loaded on the
+# first Gemini call, not when the API starts
+if TYPE_CHECKING:
+    from google.genai.types import GenerateContentConfig
 
 # --------------------------------------------------
 # Lazy client creation (CRITICAL for Streamlit)
@@ -27,6 +38,9 @@ def _make_client():
             "Make sure load_dotenv() is called in app.py BEFORE importing gemini_client."
         )
 
+    from google import genai
+    from google.genai.types import HttpOptions
+
     _client = genai.Client(
         vertexai=True,
         project=project,
@@ -40,12 +54,93 @@ def _make_client():
 # Text generation
 # --------------------------------------------------
 
-def generate_text(prompt: str, model: str = "gemini-3-pro-preview", fallback_models: list = None) -> str:
+def _record_cache_usage(resp, model_name: str, plan, prompt_text: str) -> None:
+    """Report input / cached-token usage of a response to the prompt cache."""
+    from models.prompt_cache import get_prompt_cache
+    usage = getattr(resp, "usage_metadata", None)
+    input_tokens = getattr(usage, "prompt_token_count", None) if usage is not None else None
+    cached_tokens = getattr(usage, "cached_content_token_count", None) if usage is not None else None
+    get_prompt_cache().record_usage(
+        "gemini",
+        model_name,
+        plan,
+        input_tokens if input_tokens is not None else estimate_tokens(prompt_text),
+        cached_tokens,
+    )
+
+
+def _record_usage(resp, model_name: str, prompt_text: str, output_text: str) -> None:
+    """Record token usage and cost of a response (estimated if the response has no usage)."""
+    from storage.usage_store import record_usage
+    usage = getattr(resp, "usage_metadata", None)
+    prompt_tokens = getattr(usage, "prompt_token_count", None) if usage is not None else None
+    if prompt_tokens is None:
+        record_usage("gemini", model_name, estimate_tokens(prompt_text), estimate_tokens(output_text), estimated=True)
+        return
+    # Thinking tokens are billed as output but are not part of candidates_token_count
+    record_usage(
+        "gemini",
+        model_name,
+        prompt_tokens,
+        (getattr(usage, "candidates_token_count", None) or 0) + (getattr(usage, "thoughts_token_count", None) or 0),
+        getattr(usage, "cached_content_token_count", None) or 0,
+    )
+
+
+def _generation_config(cached_content: Optional[str], schema) -> Optional["GenerateContentConfig"]:
+    if cached_content is None and schema is None:
+        return None
+    from google.genai.types import GenerateContentConfig
+    kwargs = {}
+    if cached_content:
+        kwargs["cached_content"] = cached_content
+    if schema is not None:
+        kwargs["response_mime_type"] = "application/json"
+        kwargs["response_json_schema"] = schema.schema
+    return GenerateContentConfig(**kwargs)
+
+
+def _generate_content(client, model_name: str, contents: str, cached_content: Optional[str], output_schema: Optional[str]):
+    """generate_content with JSON mode + schema, falling back to plain text if the model rejects the schema."""
+    schema = resolve_output_schema("gemini", model_name, output_schema)
+    try:
+        return client.models.generate_content(
+            model=model_name,
+            contents=contents,
+            config=_generation_config(cached_content, schema),
+        )
+    except Exception as e:
+        if schema is None or not is_schema_rejection("gemini", e):
+            raise
+        resp = client.models.generate_content(
+            model=model_name,
+            contents=contents,
+            config=_generation_config(cached_content, None),
+        )
+        mark_unsupported("gemini", model_name, e)
+        return resp
+
+
+@recorded("gemini")
+def generate_text(
+    prompt: str,
+    model: str = "gemini-3-pro-preview",
+    fallback_models: list = None,
+    prefix: Optional[str] = None,
+    output_schema: Optional[str] = None,
+) -> str:
     """
     Generates text using the specified model.
     Default is gemini-3-pro-preview for webpage building.
     
     If the model fails and fallback_models is provided, tries those in order.
+    
+    If prefix is given it is the static start of the prompt (prompt is the
+    dynamic remainder); it is served from a Gemini cached content when the
+    prompt cache has one for this model.
+    
+    If output_schema names a schema in models.schemas, the response is
+    constrained to JSON matching it.
     """
     client = _make_client()
     
@@ -53,27 +148,48 @@ def generate_text(prompt: str, model: str = "gemini-3-pro-preview", fallback_mod
     if fallback_models:
         models_to_try.extend(fallback_models)
     
+    full_prompt = (prefix or "") + prompt
+    plan = None
+    if prefix:
+        from models.prompt_cache import get_prompt_cache
+        plan = get_prompt_cache().plan("gemini", model, prefix)
+    
     last_error = None
     for model_name in models_to_try:
         try:
-            resp = client.models.generate_content(
-                model=model_name,
-                contents=prompt,
-            )
-            if model_name != model:
-                print(f"[MODEL_FALLBACK] ✅ Used fallback model: {model_name} (original: {model})")
-            return getattr(resp, "text", "") or str(resp)
+            with span("provider.request", kind=SPAN_KIND_CLIENT, provider="gemini", model=model_name):
+                model_plan = plan if model_name == model else None
+                if model_plan is not None and model_plan.handle:
+                    try:
+                        resp = _generate_content(client, model_name, prompt, model_plan.handle, output_schema)
+                    except Exception as e:
+                        # Cached content expired or was deleted server-side: send the full prompt
+                        logger.warning("Cached content %s unusable (%s), sending full prompt", model_plan.handle, e)
+                        RETRIES.labels("prompt_cache_resend").inc()
+                        from models.prompt_cache import get_prompt_cache
+                        get_prompt_cache().invalidate(model_plan)
+                        model_plan = None
+                        resp = _generate_content(client, model_name, full_prompt, None, output_schema)
+                else:
+                    resp = _generate_content(client, model_name, full_prompt, None, output_schema)
+                if prefix:
+                    _record_cache_usage(resp, model_name, model_plan, full_prompt)
+                if model_name != model:
+                    logger.info("Used fallback model: %s (original: %s)", model_name, model)
+                    FALLBACKS.labels("model").inc()
+                text = getattr(resp, "text", "") or str(resp)
+                _record_usage(resp, model_name, full_prompt, text)
+                return text
         except Exception as e:
             last_error = e
             if model_name != models_to_try[-1]:  # Not the last model to try
-                print(f"[MODEL_FALLBACK] ⚠️ Model {model_name} not available (404), trying next fallback...")
+                logger.warning("Model %s not available (404), trying next fallback...", model_name)
                 continue
             else:
                 # Last model failed - provide helpful error message
                 error_msg = str(last_error)
                 if "404" in error_msg or "NOT_FOUND" in error_msg:
-                    print(f"[MODEL_FALLBACK] ❌ All models failed. Last attempted: {model_name}")
-                    print(f"[MODEL_FALLBACK] 💡 Tip: Check Vertex AI model availability in your region/project")
+                    logger.error("All models failed. Last attempted: %s (check Vertex AI model availability in your region/project)", model_name)
                 raise last_error
     
     raise last_error if last_error else RuntimeError("No models available")
@@ -117,14 +233,14 @@ def classify_intent(user_text: str, model: str = None) -> Tuple[str, dict]:
     )
     prompt = instructions + "\n\nUser message:\n" + json.dumps(user_text)
     
-    print(f"[INTENT_CLASSIFICATION] Using model: {model}")
-    print(f"[INTENT_CLASSIFICATION] User query: {user_text[:100]}...")
+    logger.debug("Using model: %s", model)
+    logger.debug("User query: %s...", user_text[:100])
     
     # Fallback models if primary fails (try flash, then pro-preview)
     fallback_models = ["gemini-2.0-flash", "gemini-3-pro-preview"]
     
     try:
-        out = generate_text(prompt, model=model, fallback_models=fallback_models)
+        out = generate_text(prompt, model=model, fallback_models=fallback_models, output_schema="intent")
         # extract first JSON object
         start = out.find("{")
         end = out.rfind("}")
@@ -139,14 +255,14 @@ def classify_intent(user_text: str, model: str = None) -> Tuple[str, dict]:
                 confidence = 0.0
             
             result = {"explanation": explanation, "confidence": confidence, "raw": out, "model": model}
-            print(f"[INTENT_CLASSIFICATION] Result: label={label}, confidence={confidence:.2f}, explanation={explanation}")
+            logger.info("Intent: label=%s, confidence=%.2f, explanation=%s", label, confidence, explanation)
             return label, result
         result = {"explanation": "Could not parse classifier output", "confidence": 0.0, "raw": out, "model": model}
-        print(f"[INTENT_CLASSIFICATION] Result: label=chat (fallback), confidence=0.0")
+        logger.info("Intent: label=chat (fallback), confidence=0.0")
         return "chat", result
     except Exception as e:
         result = {"explanation": f"classifier error: {e}", "confidence": 0.0, "raw": "", "model": model}
-        print(f"[INTENT_CLASSIFICATION] Error: {e}")
+        logger.warning("Intent classification failed: %s", e)
         return "chat", result
 
 # --------------------------------------------------
@@ -194,13 +310,13 @@ def classify_page_type(user_text: str, model: str = None) -> Tuple[str, dict]:
     if model is None:
         model = get_smaller_model()
     
-    print(f"[PAGE_TYPE_CLASSIFICATION] Using model: {model}")
+    logger.debug("Using model: %s", model)
     
     # Fallback models if primary fails (try flash, then pro-preview)
     fallback_models = ["gemini-2.0-flash", "gemini-3-pro-preview"]
     
     try:
-        out = generate_text(prompt, model=model, fallback_models=fallback_models)
+        out = generate_text(prompt, model=model, fallback_models=fallback_models, output_schema="page_type")
         # extract first JSON object
         start = out.find("{")
         end = out.rfind("}")
@@ -214,14 +330,14 @@ def classify_page_type(user_text: str, model: str = None) -> Tuple[str, dict]:
             except Exception:
                 confidence = 0.0
             result = {"explanation": explanation, "confidence": confidence, "raw": out, "model": model}
-            print(f"[PAGE_TYPE_CLASSIFICATION] Result: page_type={page_type}, confidence={confidence:.2f}")
+            logger.info("Page type: page_type=%s, confidence=%.2f", page_type, confidence)
             return page_type, result
         result = {"explanation": "Could not parse classifier output", "confidence": 0.0, "raw": out, "model": model}
-        print(f"[PAGE_TYPE_CLASSIFICATION] Result: page_type=generic (fallback)")
+        logger.info("Page type: page_type=generic (fallback)")
         return "generic", result
     except Exception as e:
         result = {"explanation": f"classifier error: {e}", "confidence": 0.0, "raw": "", "model": model}
-        print(f"[PAGE_TYPE_CLASSIFICATION] Error: {e}")
+        logger.warning("Page type classification failed: %s", e)
         return "generic", result
 
 
@@ -251,13 +367,13 @@ def analyze_query_detail(user_text: str, model: str = None) -> Tuple[bool, float
     if model is None:
         model = get_smaller_model()
     
-    print(f"[QUERY_DETAIL_ANALYSIS] Using model: {model}")
+    logger.debug("Using model: %s", model)
     
     # Fallback models if primary fails (try flash, then pro-preview)
     fallback_models = ["gemini-2.0-flash", "gemini-3-pro-preview"]
     
     try:
-        out = generate_text(prompt, model=model, fallback_models=fallback_models)
+        out = generate_text(prompt, model=model, fallback_models=fallback_models, output_schema="query_detail")
         start = out.find("{")
         end = out.rfind("}")
         if start != -1 and end != -1 and end > start:
@@ -269,12 +385,12 @@ def analyze_query_detail(user_text: str, model: str = None) -> Tuple[bool, float
                 confidence = float(parsed.get("confidence", 0.0))
             except Exception:
                 confidence = 0.0
-            print(f"[QUERY_DETAIL_ANALYSIS] Result: needs_followup={needs_followup}, confidence={confidence:.2f}")
+            logger.info("Query detail: needs_followup=%s, confidence=%.2f", needs_followup, confidence)
             return needs_followup, confidence
-        print(f"[QUERY_DETAIL_ANALYSIS] Result: needs_followup=True (fallback)")
+        logger.info("Query detail: needs_followup=True (fallback)")
         return True, 0.0  # Default to showing questions if unclear
     except Exception as e:
-        print(f"[QUERY_DETAIL_ANALYSIS] Error: {e}")
+        logger.warning("Query detail analysis failed: %s", e)
         return True, 0.0  # Default to showing questions on error
 
 
@@ -290,7 +406,7 @@ def chat_response(user_text: str, model: str = None) -> str:
         model = get_smaller_model()
     
     prompt = f"Reply in max 4 sentences.\nUser: {user_text}"
-    print(f"[CHAT_RESPONSE] Using model: {model}")
+    logger.debug("Using model: %s", model)
     
     # Fallback models if primary fails (try flash, then pro-preview)
     fallback_models = ["gemini-2.0-flash", "gemini-3-pro-preview"]
@@ -298,7 +414,7 @@ def chat_response(user_text: str, model: str = None) -> str:
     out = generate_text(prompt, model=model, fallback_models=fallback_models)
     parts = re.split(r'(?<=[.!?])\s+', out.strip())
     result = " ".join(parts[:4])
-    print(f"[CHAT_RESPONSE] Generated response (length: {len(result)} chars)")
+    logger.debug("Generated response (length: %s chars)", len(result))
     return result
 
 
@@ -333,14 +449,14 @@ def classify_modification_complexity(instruction: str, model: str = None) -> Tup
     if model is None:
         model = get_smaller_model()
     
-    print(f"[MODIFICATION_COMPLEXITY] Using model: {model}")
-    print(f"[MODIFICATION_COMPLEXITY] Instruction: {instruction[:100]}...")
+    logger.debug("Using model: %s", model)
+    logger.debug("Instruction: %s...", instruction[:100])
     
     # Fallback models if primary fails (try flash, then pro-preview)
     fallback_models = ["gemini-2.0-flash", "gemini-3-pro-preview"]
     
     try:
-        out = generate_text(prompt, model=model, fallback_models=fallback_models)
+        out = generate_text(prompt, model=model, fallback_models=fallback_models, output_schema="modification_complexity")
         start = out.find("{")
         end = out.rfind("}")
         if start != -1 and end != -1 and end > start:
@@ -358,14 +474,14 @@ def classify_modification_complexity(instruction: str, model: str = None) -> Tup
                 complexity = "medium"
             
             result = {"explanation": explanation, "confidence": confidence, "raw": out, "model": model}
-            print(f"[MODIFICATION_COMPLEXITY] Result: complexity={complexity}, confidence={confidence:.2f}, explanation={explanation}")
+            logger.info("Modification complexity: complexity=%s, confidence=%.2f, explanation=%s", complexity, confidence, explanation)
             return complexity, result
         result = {"explanation": "Could not parse classifier output", "confidence": 0.0, "raw": out, "model": model}
-        print(f"[MODIFICATION_COMPLEXITY] Result: complexity=medium (fallback)")
+        logger.info("Modification complexity: complexity=medium (fallback)")
         return "medium", result
     except Exception as e:
         result = {"explanation": f"classifier error: {e}", "confidence": 0.0, "raw": "", "model": model}
-        print(f"[MODIFICATION_COMPLEXITY] Error: {e}")
+        logger.warning("Modification complexity failed: %s", e)
         return "medium", result
 
 
@@ -410,13 +526,18 @@ def parse_project_json(text: str) -> Optional[dict]:
     
     Uses improved parsing with error recovery for common JSON issues.
     """
+    with StageTimer("parse"):
+        return _parse_project_json(text)
+
+
+def _parse_project_json(text: str) -> Optional[dict]:
     from .json_parser import parse_json_with_fallback, get_json_error_context, extract_json_from_text
     
     if not text:
-        print("[PARSE_JSON] Empty text input")
+        logger.debug("Empty text input")
         return None
 
-    print(f"[PARSE_JSON] Input length: {len(text)} characters")
+    logger.debug("Input length: %s characters", len(text))
     
     try:
         # Try to extract JSON from text (handles markdown code blocks, etc.)
@@ -427,14 +548,14 @@ def parse_project_json(text: str) -> Optional[dict]:
             end = text.rfind("}")
             
             if start == -1 or end == -1:
-                print(f"[PARSE_JSON] No JSON boundaries found. First 200 chars: {text[:200]}")
+                logger.warning("No JSON boundaries found. First 200 chars: %s", text[:200])
                 return None
             json_str = text[start:end+1]
         else:
-            print(f"[PARSE_JSON] Extracted JSON from code block or structured content")
+            logger.debug("Extracted JSON from code block or structured content")
         
-        print(f"[PARSE_JSON] JSON string length: {len(json_str)} characters")
-        print(f"[PARSE_JSON] Attempting to parse JSON...")
+        logger.debug("JSON string length: %s characters", len(json_str))
+        logger.debug("Attempting to parse JSON...")
         
         # Try parsing with fallback strategies
         raw = parse_json_with_fallback(json_str)
@@ -445,45 +566,43 @@ def parse_project_json(text: str) -> Optional[dict]:
             try:
                 raw = json.loads(json_str)
             except json.JSONDecodeError as e:
-                print(f"[PARSE_JSON] JSON decode error after all recovery attempts: {e}")
+                logger.warning("JSON decode error after all recovery attempts: %s", e)
                 error_context = get_json_error_context(json_str, e.pos, context_size=200)
-                print(f"[PARSE_JSON] Error context:\n{error_context}")
+                logger.debug("Error context:\n%s", error_context)
                 return None
         
-        print(f"[PARSE_JSON] JSON parsed successfully. Type: {type(raw)}")
+        logger.debug("JSON parsed successfully. Type: %s", type(raw))
 
         # Case 1: { "project": {...} }
         if isinstance(raw, dict) and "project" in raw and isinstance(raw["project"], dict):
-            print(f"[PARSE_JSON] Found 'project' key. Files count: {len(raw['project'].get('files', {}))}")
+            logger.debug("Found 'project' key. Files count: %s", len(raw['project'].get('files', {})))
             return raw["project"]
 
         # Case 2: [ { "project": {...} } ]
         if isinstance(raw, list):
-            print(f"[PARSE_JSON] Input is a list with {len(raw)} items")
+            logger.debug("Input is a list with %s items", len(raw))
             for item in raw:
                 if isinstance(item, dict) and "project" in item:
-                    print(f"[PARSE_JSON] Found 'project' in list item. Files count: {len(item['project'].get('files', {}))}")
+                    logger.debug("Found 'project' in list item. Files count: %s", len(item['project'].get('files', {})))
                     return item["project"]
 
         # Case 3: already inner project
         if isinstance(raw, dict) and "files" in raw:
-            print(f"[PARSE_JSON] Already inner project format. Files count: {len(raw.get('files', {}))}")
+            logger.debug("Already inner project format. Files count: %s", len(raw.get('files', {})))
             return raw
 
-        print(f"[PARSE_JSON] JSON structure doesn't match expected format. Keys: {list(raw.keys()) if isinstance(raw, dict) else 'N/A'}")
+        logger.warning("JSON structure doesn't match expected format. Keys: %s", list(raw.keys()) if isinstance(raw, dict) else 'N/A')
 
     except json.JSONDecodeError as e:
-        print(f"[PARSE_JSON] JSON decode error: {e}")
+        logger.warning("JSON decode error: %s", e)
         error_context = get_json_error_context(text, e.pos, context_size=200)
-        print(f"[PARSE_JSON] Error context:\n{error_context}")
+        logger.debug("Error context:\n%s", error_context)
         return None
     except Exception as e:
-        print(f"[PARSE_JSON] Unexpected error: {e}")
-        import traceback
-        print(f"[PARSE_JSON] Traceback: {traceback.format_exc()}")
+        logger.exception("Unexpected error: %s", e)
         return None
 
-    print("[PARSE_JSON] No matching structure found, returning None")
+    logger.debug("No matching structure found, returning None")
     return None
 
 
@@ -491,37 +610,17 @@ def parse_project_json(text: str) -> Optional[dict]:
 # Save project files (STRICT)
 # --------------------------------------------------
 
-def save_project_files(project: dict, output_dir: str) -> None:
-    if not isinstance(project, dict):
-        raise ValueError("project must be a dict")
-
-    files = project.get("files")
-    if not isinstance(files, dict):
-        raise ValueError("project.files must be a dict")
-
-    print(f"[SAVE_FILES] Saving {len(files)} files to {output_dir}")
-    os.makedirs(output_dir, exist_ok=True)
-
-    saved_count = 0
-    for rel_path, content in files.items():
-        try:
-            full_path = os.path.join(output_dir, rel_path)
-            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+def save_project_files(project: dict, output_dir: str) -> dict:
+    """
+    Write project["files"] under output_dir.
 
-            if isinstance(content, (dict, list)):
-                content = json.dumps(content, indent=2)
+    Delegates to the parallel materializer: directories are created once,
+    files are written concurrently and files unchanged since the last save
+    to the same directory are skipped. Returns throughput stats.
+    """
+    from storage.materializer import materialize_project
 
-            with open(full_path, "w", encoding="utf-8") as f:
-                f.write(content)
-            
-            saved_count += 1
-            if saved_count % 10 == 0:
-                print(f"[SAVE_FILES] Saved {saved_count}/{len(files)} files...")
-        except Exception as e:
-            print(f"[SAVE_FILES] Error saving {rel_path}: {e}")
-            raise
-    
-    print(f"[SAVE_FILES] Successfully saved {saved_count} files")
+    return materialize_project(project, output_dir)
 
 def normalize_project(project):
     """
@@ -5,18 +5,17 @@ GPT Client - OpenAI GPT API integration
 import os
 import json
 import re
-from pathlib import Path
 from typing import Optional, Tuple
-from dotenv import load_dotenv
 
-try:
-    from openai import OpenAI
-except ImportError:
-    OpenAI = None
+from models.schemas import resolve_output_schema, mark_unsupported, is_schema_rejection
+from models.cassette import recorded
+from utils.tokenizer import estimate_tokens
+from utils.metrics import FALLBACKS
+from utils.env import load_env
+from utils.tracing import span, SPAN_KIND_CLIENT
+from utils.logger import get_logger
 
-# Load .env from project root
-env_path = Path(__file__).parent.parent / ".env"
-load_dotenv(dotenv_path=env_path)
+logger = get_logger(__name__)
 
 _client = None
 
@@ -28,20 +27,97 @@ def _make_client():
         return _client
     
     # Reload env vars to ensure we get the latest values
-    load_dotenv(dotenv_path=env_path, override=True)
+    load_env(override=True)
     openai_api_key = os.getenv("OPENAI_API_KEY")
     
     if not openai_api_key:
         raise RuntimeError("OPENAI_API_KEY is not set. Please check your .env file.")
     
-    if OpenAI is None:
+    # Imported on first use so the API starts without loading the SDK
+    try:
+        from openai import OpenAI
+    except ImportError:
         raise RuntimeError("openai package not installed. Run: pip install openai")
     
     _client = OpenAI(api_key=openai_api_key)
     return _client
 
 
-def generate_text(prompt: str, model: str = "gpt-4o-mini", fallback_models: list = None, max_tokens: int = 8192) -> str:
+def _record_cache_usage(response, model_name: str, plan, prompt_text: str) -> None:
+    """Report input / cached-token usage of a response to the prompt cache."""
+    from models.prompt_cache import get_prompt_cache
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        get_prompt_cache().record_usage("openai", model_name, plan, estimate_tokens(prompt_text))
+        return
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached_tokens = getattr(details, "cached_tokens", None) if details is not None else None
+    get_prompt_cache().record_usage("openai", model_name, plan, usage.prompt_tokens or 0, cached_tokens)
+
+
+def _record_usage(response, model_name: str, prompt_text: str, output_text: str) -> None:
+    """Record token usage and cost of a response (estimated if the response has no usage)."""
+    from storage.usage_store import record_usage
+    usage = getattr(response, "usage", None)
+    if usage is None:
+        record_usage("openai", model_name, estimate_tokens(prompt_text), estimate_tokens(output_text or ""), estimated=True)
+        return
+    details = getattr(usage, "prompt_tokens_details", None)
+    record_usage(
+        "openai",
+        model_name,
+        getattr(usage, "prompt_tokens", None) or 0,
+        getattr(usage, "completion_tokens", None) or 0,
+        (getattr(details, "cached_tokens", None) or 0) if details is not None else 0,
+    )
+
+
+def _response_format(schema) -> dict:
+    """Strict JSON schema for closed schemas, JSON mode for open ones (project files map)."""
+    if schema.strict:
+        return {
+            "type": "json_schema",
+            "json_schema": {"name": schema.name, "schema": schema.schema, "strict": True},
+        }
+    return {"type": "json_object"}
+
+
+def _create_completion(client, model_name: str, max_tokens: int, content: str, output_schema: Optional[str]):
+    """chat.completions.create with structured output, falling back to plain text if the model rejects the schema."""
+    schema = resolve_output_schema("openai", model_name, output_schema)
+    kwargs = {}
+    if schema is not None:
+        kwargs["response_format"] = _response_format(schema)
+    try:
+        return client.chat.completions.create(
+            model=model_name,
+            messages=[{"role": "user", "content": content}],
+            max_tokens=max_tokens,
+            temperature=0.2,
+            **kwargs
+        )
+    except Exception as e:
+        if schema is None or not is_schema_rejection("openai", e):
+            raise
+        response = client.chat.completions.create(
+            model=model_name,
+            messages=[{"role": "user", "content": content}],
+            max_tokens=max_tokens,
+            temperature=0.2
+        )
+        mark_unsupported("openai", model_name, e)
+        return response
+
+
+@recorded("openai")
+def generate_text(
+    prompt: str,
+    model: str = "gpt-4o-mini",
+    fallback_models: list = None,
+    max_tokens: int = 8192,
+    prefix: Optional[str] = None,
+    output_schema: Optional[str] = None,
+) -> str:
     """
     Generate text using OpenAI API.
     
@@ -50,6 +126,11 @@ def generate_text(prompt: str, model: str = "gpt-4o-mini", fallback_models: list
         model: Model identifier
         fallback_models: Optional list of fallback models
         max_tokens: Maximum tokens to generate (default: 8192, use 16384+ for large projects)
+        prefix: Optional static start of the prompt (prompt is the dynamic
+            remainder); sent first and unchanged so OpenAI's automatic
+            prefix caching applies
+        output_schema: Optional schema name from models.schemas for
+            structured output (response_format)
     
     Returns:
         Generated text
@@ -63,22 +144,27 @@ def generate_text(prompt: str, model: str = "gpt-4o-mini", fallback_models: list
     last_error = None
     for model_name in models_to_try:
         try:
-            response = client.chat.completions.create(
-                model=model_name,
-                messages=[{"role": "user", "content": prompt}],
-                max_tokens=max_tokens,
-                temperature=0.2
-            )
+            with span("provider.request", kind=SPAN_KIND_CLIENT, provider="openai", model=model_name):
+                plan = None
+                if prefix:
+                    from models.prompt_cache import get_prompt_cache
+                    plan = get_prompt_cache().plan("openai", model_name, prefix)
+                response = _create_completion(client, model_name, max_tokens, (prefix or "") + prompt, output_schema)
+                if prefix:
+                    _record_cache_usage(response, model_name, plan, prefix + prompt)
             
-            # Check if response was truncated
-            if hasattr(response.choices[0], 'finish_reason') and response.choices[0].finish_reason == "length":
-                print(f"[GPT_WARNING] Response truncated due to max_tokens limit. Consider increasing max_tokens.")
+                # Check if response was truncated
+                if hasattr(response.choices[0], 'finish_reason') and response.choices[0].finish_reason == "length":
+                    logger.warning("Response truncated due to max_tokens limit. Consider increasing max_tokens.")
             
-            return response.choices[0].message.content
+                text = response.choices[0].message.content
+                _record_usage(response, model_name, (prefix or "") + prompt, text)
+                return text
         except Exception as e:
             last_error = e
             if model_name != models_to_try[-1]:
-                print(f"[GPT_FALLBACK] Model {model_name} failed, trying next...")
+                logger.warning("Model %s failed, trying next...", model_name)
+                FALLBACKS.labels("model").inc()
                 continue
             raise last_error
     
@@ -103,7 +189,7 @@ def classify_intent(user_text: str, model: str = None) -> Tuple[str, dict]:
     prompt = instructions + "\n\nUser message:\n" + json.dumps(user_text)
     
     try:
-        out = generate_text(prompt, model=model)
+        out = generate_text(prompt, model=model, output_schema="intent")
         start = out.find("{")
         end = out.rfind("}")
         if start != -1 and end != -1 and end > start:
@@ -138,7 +224,7 @@ def classify_page_type(user_text: str, model: str = None) -> Tuple[str, dict]:
     prompt = instructions + "\n\nUser message:\n" + json.dumps(user_text)
     
     try:
-        out = generate_text(prompt, model=model)
+        out = generate_text(prompt, model=model, output_schema="page_type")
         start = out.find("{")
         end = out.rfind("}")
         if start != -1 and end != -1 and end > start:
@@ -173,7 +259,7 @@ def analyze_query_detail(user_text: str, model: str = None) -> Tuple[bool, float
     prompt = instructions + "\n\nUser request:\n" + json.dumps(user_text)
     
     try:
-        out = generate_text(prompt, model=model)
+        out = generate_text(prompt, model=model, output_schema="query_detail")
         start = out.find("{")
         end = out.rfind("}")
         if start != -1 and end != -1 and end > start:
@@ -217,7 +303,7 @@ def classify_modification_complexity(instruction: str, model: str = None) -> Tup
     prompt = instructions + "\n\nModification instruction:\n" + json.dumps(instruction)
     
     try:
-        out = generate_text(prompt, model=model)
+        out = generate_text(prompt, model=model, output_schema="modification_complexity")
         start = out.find("{")
         end = out.rfind("}")
         if start != -1 and end != -1 and end > start:
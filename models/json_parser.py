@@ -8,6 +8,15 @@ import json
 import re
 from typing import Optional
 
+from utils.metrics import PARSE_STRATEGIES
+from utils.tracing import current_span
+
+
+def _parsed(value, strategy: str):
+    PARSE_STRATEGIES.labels(strategy).inc()
+    current_span().set_attribute("parse.strategy", strategy)
+    return value
+
 
 def fix_common_json_errors(json_str: str) -> str:
     """
@@ -190,11 +199,12 @@ def parse_json_with_fallback(text: str) -> Optional[dict]:
     """
     Parses JSON with multiple fallback strategies.
     
-    Returns the parsed object or None if all strategies fail.
+    Returns the parsed object or None if all strategies fail. The strategy
+    that succeeded is counted in the parse strategy metric.
     """
     # Strategy 1: Direct parse
     try:
-        return json.loads(text)
+        return _parsed(json.loads(text), "direct")
     except json.JSONDecodeError:
         pass
     
@@ -202,7 +212,7 @@ def parse_json_with_fallback(text: str) -> Optional[dict]:
     extracted = extract_json_from_text(text)
     if extracted and extracted != text:
         try:
-            return json.loads(extracted)
+            return _parsed(json.loads(extracted), "extract")
         except json.JSONDecodeError:
             pass
     
@@ -210,7 +220,7 @@ def parse_json_with_fallback(text: str) -> Optional[dict]:
     fixed = fix_common_json_errors(text)
     if fixed != text:
         try:
-            return json.loads(fixed)
+            return _parsed(json.loads(fixed), "fix_common")
         except json.JSONDecodeError:
             pass
     
@@ -218,7 +228,7 @@ def parse_json_with_fallback(text: str) -> Optional[dict]:
     fixed_array = fix_array_structure_issues(text)
     if fixed_array != text:
         try:
-            return json.loads(fixed_array)
+            return _parsed(json.loads(fixed_array), "fix_array")
         except json.JSONDecodeError:
             pass
     
@@ -227,7 +237,7 @@ def parse_json_with_fallback(text: str) -> Optional[dict]:
         fixed_extracted = fix_common_json_errors(extracted)
         if fixed_extracted != extracted:
             try:
-                return json.loads(fixed_extracted)
+                return _parsed(json.loads(fixed_extracted), "extract_fix_common")
             except json.JSONDecodeError:
                 pass
     
@@ -236,7 +246,7 @@ def parse_json_with_fallback(text: str) -> Optional[dict]:
         fixed_array_extracted = fix_array_structure_issues(extracted)
         if fixed_array_extracted != extracted:
             try:
-                return json.loads(fixed_array_extracted)
+                return _parsed(json.loads(fixed_array_extracted), "extract_fix_array")
             except json.JSONDecodeError:
                 pass
     
@@ -245,10 +255,11 @@ def parse_json_with_fallback(text: str) -> Optional[dict]:
         fixed_both = fix_array_structure_issues(fix_common_json_errors(extracted))
         if fixed_both != extracted:
             try:
-                return json.loads(fixed_both)
+                return _parsed(json.loads(fixed_both), "extract_fix_both")
             except json.JSONDecodeError:
                 pass
     
+    PARSE_STRATEGIES.labels("failed").inc()
     return None
 
 
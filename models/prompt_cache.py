@@ -0,0 +1,397 @@
+"""
+Prompt Cache - Provider-side context caching for static prompt prefixes
+
+Generation prompts start with a static prefix (see prompts.templates) that is
+identical for every request of the same (provider, page_type). Each provider
+can serve that prefix from its own cache instead of re-processing it:
+
+- Gemini: an explicit cached content is created for the prefix and requests
+  reference it by name (cached_content), sending only the dynamic suffix.
+  Caches have a TTL, are refreshed while in use, and are deleted on shutdown.
+- Anthropic: the prefix is sent as its own content block with a
+  cache_control breakpoint; the provider keeps it warm for its TTL.
+- OpenAI: caching is automatic for repeated prefixes, so the prefix is just
+  kept byte-identical and sent first.
+
+Savings are tracked from the usage each provider reports (cached vs. total
+input tokens). PROMPT_CACHE_MODE selects the behaviour:
+
+- "provider" (default): use the provider mechanisms above
+- "local": in-process stand-in that never calls a provider cache API and
+  estimates cached tokens from the prefix size (for tests and the fake
+  provider)
+- "off": send plain prompts
+"""
+
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Callable
+
+from utils.tokenizer import count_tokens
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+PROMPT_CACHE_MODE = os.getenv("PROMPT_CACHE_MODE", "provider").lower()
+
+# Lifetime of a Gemini cached content; refreshed when used within REFRESH_MARGIN of expiry
+GEMINI_CACHE_TTL_SECONDS = int(os.getenv("GEMINI_CACHE_TTL_SECONDS", "3600"))
+CACHE_REFRESH_MARGIN_SECONDS = 120
+# Gemini rejects cached contents below a model-dependent minimum size
+GEMINI_CACHE_MIN_TOKENS = int(os.getenv("GEMINI_CACHE_MIN_TOKENS", "1024"))
+PROMPT_CACHE_MAX_ENTRIES = int(os.getenv("PROMPT_CACHE_MAX_ENTRIES", "64"))
+# After a failed cache creation, don't retry that prefix for this long
+CACHE_FAILURE_BACKOFF_SECONDS = 600
+# How long a request waits for another request's creation of the same cache
+CACHE_CREATE_WAIT_SECONDS = 30
+
+# Anthropic ephemeral breakpoints live for 5 minutes ("1h" is also accepted)
+ANTHROPIC_CACHE_TTL = os.getenv("ANTHROPIC_CACHE_TTL", "5m")
+ANTHROPIC_CACHE_TTL_SECONDS = {"5m": 300, "1h": 3600}.get(ANTHROPIC_CACHE_TTL, 300)
+# OpenAI keeps automatically cached prefixes for roughly 5-10 minutes of inactivity
+OPENAI_CACHE_TTL_SECONDS = 300
+
+# Fraction of the normal input price saved on a cached input token
+CACHED_INPUT_DISCOUNT = {
+    "gemini": 0.75,
+    "anthropic": 0.90,
+    "openai": 0.50,
+}
+
+# Extra fraction of the input price charged for writing a prefix to the cache
+# (Anthropic: 1.25x for 5-minute breakpoints, 2x for 1-hour ones)
+CACHE_WRITE_PREMIUM = {
+    "anthropic": 1.0 if ANTHROPIC_CACHE_TTL == "1h" else 0.25,
+}
+
+
+def prefix_key(provider: str, model: str, prefix: str) -> str:
+    """Stable key for a (provider, model, prefix) cache entry."""
+    digest = hashlib.sha256(prefix.encode("utf-8")).hexdigest()[:24]
+    return f"{provider}:{model}:{digest}"
+
+
+class CacheEntry:
+    """One cached prefix and its lifetime."""
+
+    __slots__ = ("key", "provider", "model", "handle", "prefix_tokens", "created_at", "expires_at", "hits")
+
+    def __init__(self, key: str, provider: str, model: str, handle: Optional[str], prefix_tokens: int, ttl_seconds: int):
+        now = time.time()
+        self.key = key
+        self.provider = provider
+        self.model = model
+        self.handle = handle
+        self.prefix_tokens = prefix_tokens
+        self.created_at = now
+        self.expires_at = now + ttl_seconds
+        self.hits = 0
+
+    def expired(self, now: float) -> bool:
+        return now >= self.expires_at
+
+
+class CachePlan:
+    """
+    How a single request should use the cache.
+
+    handle is the provider cache reference (Gemini cached content name) when
+    the prefix must not be sent inline; warm is True when the prefix was
+    already cached before this request.
+    """
+
+    __slots__ = ("provider", "model", "prefix", "prefix_tokens", "handle", "warm", "breakpoint")
+
+    def __init__(self, provider: str, model: str, prefix: str, prefix_tokens: int,
+                 handle: Optional[str] = None, warm: bool = False, breakpoint: bool = False):
+        self.provider = provider
+        self.model = model
+        self.prefix = prefix
+        self.prefix_tokens = prefix_tokens
+        self.handle = handle
+        self.warm = warm
+        self.breakpoint = breakpoint
+
+
+class GeminiCacheBackend:
+    """Creates, refreshes and deletes Gemini cached contents."""
+
+    def __init__(self, client_factory: Callable[[], Any]):
+        self._client_factory = client_factory
+
+    def create(self, model: str, prefix: str, ttl_seconds: int) -> str:
+        from google.genai import types
+        cached = self._client_factory().caches.create(
+            model=model,
+            config=types.CreateCachedContentConfig(
+                contents=[prefix],
+                ttl=f"{ttl_seconds}s",
+                display_name="webpage-builder-prefix",
+            ),
+        )
+        return cached.name
+
+    def refresh(self, handle: str, ttl_seconds: int) -> None:
+        from google.genai import types
+        self._client_factory().caches.update(
+            name=handle,
+            config=types.UpdateCachedContentConfig(ttl=f"{ttl_seconds}s"),
+        )
+
+    def delete(self, handle: str) -> None:
+        self._client_factory().caches.delete(name=handle)
+
+
+class PromptCacheManager:
+    """
+    Tracks cached prefixes per (provider, model) and the tokens they save.
+
+    Thread-safe: provider calls run on worker threads.
+    """
+
+    def __init__(self, mode: str = PROMPT_CACHE_MODE, gemini_backend: Optional[GeminiCacheBackend] = None):
+        self.mode = mode if mode in ("provider", "local", "off") else "provider"
+        self._gemini_backend = gemini_backend
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._failures: Dict[str, float] = {}
+        # key -> set once the Gemini cache creation in flight for it is done
+        self._creating: Dict[str, threading.Event] = {}
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode != "off"
+
+    # ------------------------------------------------------------------
+    # Planning
+    # ------------------------------------------------------------------
+
+    def plan(self, provider: str, model: str, prefix: Optional[str]) -> Optional[CachePlan]:
+        """
+        Decide how to send a request whose prompt starts with prefix.
+
+        Returns None when the prompt should be sent as a plain string.
+        """
+        if not self.enabled or not prefix:
+            return None
+
+        # In the provider's tokens, the unit of its minimum cache sizes and usage reports
+        prefix_tokens = count_tokens(prefix, provider)
+        key = prefix_key(provider, model, prefix)
+        now = time.time()
+
+        if provider == "gemini":
+            return self._plan_gemini(key, model, prefix, prefix_tokens, now)
+
+        ttl = ANTHROPIC_CACHE_TTL_SECONDS if provider == "anthropic" else OPENAI_CACHE_TTL_SECONDS
+        stale: List[CacheEntry] = []
+        with self._lock:
+            entry = self._live_entry(key, now)
+            warm = entry is not None
+            if entry is None:
+                entry = CacheEntry(key, provider, model, None, prefix_tokens, ttl)
+                stale = self._add_entry(entry)
+            else:
+                entry.hits += 1
+            # Both providers extend the lifetime on every hit
+            entry.expires_at = now + ttl
+        # Evictions may include Gemini entries; delete their caches outside the lock
+        for evicted in stale:
+            self._delete_handle(evicted)
+        return CachePlan(provider, model, prefix, prefix_tokens, warm=warm, breakpoint=provider == "anthropic")
+
+    def _plan_gemini(self, key: str, model: str, prefix: str, prefix_tokens: int, now: float) -> Optional[CachePlan]:
+        if self.mode == "provider" and prefix_tokens < GEMINI_CACHE_MIN_TOKENS:
+            # Too small for an explicit cache; implicit caching still applies to the stable prefix
+            return None
+
+        handle = None
+        needs_refresh = False
+        in_flight = None
+        with self._lock:
+            entry = self._live_entry(key, now)
+            if entry is not None:
+                entry.hits += 1
+                needs_refresh = entry.expires_at - now < CACHE_REFRESH_MARGIN_SECONDS
+                if needs_refresh:
+                    entry.expires_at = now + GEMINI_CACHE_TTL_SECONDS
+                handle = entry.handle
+            elif now < self._failures.get(key, 0):
+                return None
+            elif key in self._creating:
+                in_flight = self._creating[key]
+            else:
+                # This request creates the cache; concurrent misses wait for it
+                self._creating[key] = threading.Event()
+
+        if in_flight is not None:
+            in_flight.wait(CACHE_CREATE_WAIT_SECONDS)
+            with self._lock:
+                entry = self._live_entry(key, time.time())
+                if entry is None:
+                    # Creation failed or is still running: send this prompt inline
+                    return None
+                entry.hits += 1
+                handle = entry.handle
+            return CachePlan("gemini", model, prefix, prefix_tokens, handle=handle, warm=True)
+
+        if entry is not None:
+            if needs_refresh and self.mode == "provider":
+                try:
+                    self._gemini_backend.refresh(handle, GEMINI_CACHE_TTL_SECONDS)
+                except Exception as e:
+                    logger.warning("Failed to refresh Gemini cache %s: %s", handle, e)
+                    self._drop(key)
+                    return None
+            return CachePlan("gemini", model, prefix, prefix_tokens, handle=handle, warm=True)
+
+        try:
+            if self.mode == "provider":
+                try:
+                    handle = self._gemini_backend.create(model, prefix, GEMINI_CACHE_TTL_SECONDS)
+                    logger.info("Created Gemini cache %s for %s (~%s tokens, ttl %ss)", handle, model, prefix_tokens, GEMINI_CACHE_TTL_SECONDS)
+                except Exception as e:
+                    logger.warning("Gemini cache creation failed for %s: %s", model, e)
+                    with self._lock:
+                        self._failures[key] = now + CACHE_FAILURE_BACKOFF_SECONDS
+                    return None
+
+            with self._lock:
+                stale = self._add_entry(CacheEntry(key, "gemini", model, handle, prefix_tokens, GEMINI_CACHE_TTL_SECONDS))
+            for replaced in stale:
+                self._delete_handle(replaced)
+            return CachePlan("gemini", model, prefix, prefix_tokens, handle=handle, warm=False)
+        finally:
+            with self._lock:
+                self._creating.pop(key).set()
+
+    def _live_entry(self, key: str, now: float) -> Optional[CacheEntry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expired(now):
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _add_entry(self, entry: CacheEntry) -> List[CacheEntry]:
+        """
+        Add an entry (caller holds the lock).
+
+        Returns the replaced and evicted entries; the caller deletes their
+        provider-side caches after releasing the lock, since that is a
+        blocking network call.
+        """
+        stale = []
+        replaced = self._entries.get(entry.key)
+        if replaced is not None and replaced.handle != entry.handle:
+            # Don't leak the provider-side cache of the entry being replaced
+            stale.append(replaced)
+        self._entries[entry.key] = entry
+        while len(self._entries) > PROMPT_CACHE_MAX_ENTRIES:
+            _, evicted = self._entries.popitem(last=False)
+            stale.append(evicted)
+        return stale
+
+    def _drop(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def _delete_handle(self, entry: CacheEntry) -> None:
+        if entry.handle and self.mode == "provider" and self._gemini_backend is not None:
+            try:
+                self._gemini_backend.delete(entry.handle)
+            except Exception as e:
+                logger.warning("Failed to delete Gemini cache %s: %s", entry.handle, e)
+
+    def invalidate(self, plan: CachePlan) -> None:
+        """Forget a plan's entry (e.g. the provider reported the cache as gone)."""
+        self._drop(prefix_key(plan.provider, plan.model, plan.prefix))
+
+    # ------------------------------------------------------------------
+    # Accounting
+    # ------------------------------------------------------------------
+
+    def record_usage(
+        self,
+        provider: str,
+        model: str,
+        plan: Optional[CachePlan],
+        input_tokens: int,
+        cached_tokens: Optional[int] = None,
+        cache_write_tokens: int = 0,
+    ) -> None:
+        """
+        Record the input-token usage of one request.
+
+        cached_tokens is what the provider reported; when it reported nothing
+        (or in local mode) a warm prefix is counted as fully cached.
+        """
+        if self.mode == "local" or cached_tokens is None:
+            cached_tokens = plan.prefix_tokens if plan is not None and plan.warm else 0
+
+        with self._lock:
+            stats = self._stats.setdefault(f"{provider}:{model}", {
+                "requests": 0,
+                "cached_requests": 0,
+                "input_tokens": 0,
+                "cached_tokens": 0,
+                "cache_write_tokens": 0,
+            })
+            stats["requests"] += 1
+            stats["cached_requests"] += 1 if cached_tokens else 0
+            stats["input_tokens"] += input_tokens
+            stats["cached_tokens"] += cached_tokens
+            stats["cache_write_tokens"] += cache_write_tokens
+
+        if cached_tokens:
+            logger.debug("%s/%s: %s/%s input tokens served from cache", provider, model, cached_tokens, input_tokens)
+
+    def stats(self) -> Dict[str, Any]:
+        """Per (provider, model) cached-token totals and estimated savings."""
+        with self._lock:
+            models = {}
+            for key, stats in self._stats.items():
+                provider = key.split(":", 1)[0]
+                input_tokens = stats["input_tokens"]
+                models[key] = {
+                    **stats,
+                    "cache_hit_ratio": round(stats["cached_tokens"] / input_tokens, 4) if input_tokens else 0.0,
+                    "saved_input_token_equivalents": int(stats["cached_tokens"] * CACHED_INPUT_DISCOUNT.get(provider, 0.0)),
+                }
+            return {
+                "mode": self.mode,
+                "active_entries": len(self._entries),
+                "models": models,
+            }
+
+    # ------------------------------------------------------------------
+    # Lifetime
+    # ------------------------------------------------------------------
+
+    def close(self) -> None:
+        """Delete every provider-side cache still alive (called on shutdown)."""
+        with self._lock:
+            entries = list(self._entries.values())
+            self._entries.clear()
+        for entry in entries:
+            self._delete_handle(entry)
+
+
+# Global prompt cache instance
+_prompt_cache: Optional[PromptCacheManager] = None
+
+
+def get_prompt_cache() -> PromptCacheManager:
+    """Get or create the global prompt cache manager"""
+    global _prompt_cache
+    if _prompt_cache is None:
+        from models.gemini_client import _make_client
+        _prompt_cache = PromptCacheManager(gemini_backend=GeminiCacheBackend(_make_client))
+    return _prompt_cache
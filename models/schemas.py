@@ -0,0 +1,210 @@
+"""
+Output Schemas - JSON schemas for structured (schema-constrained) model output
+
+Each client maps these onto its provider's native mechanism:
+
+- Gemini: response_mime_type="application/json" + response_json_schema
+- OpenAI: response_format json_schema (strict) for the classifiers, json_object
+  for projects (the files map has free-form keys, which strict mode forbids)
+- Anthropic: a single forced tool whose input_schema is the schema; the tool
+  input is returned as the JSON text
+
+Models or endpoints that reject a schema are remembered and called without
+one afterwards. Set STRUCTURED_OUTPUT=0 to disable structured output.
+"""
+
+import os
+import threading
+from typing import Dict, Any, NamedTuple, Optional, Set, Tuple
+
+from data.page_types_reference import PAGE_TYPES
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+STRUCTURED_OUTPUT_ENABLED = os.getenv("STRUCTURED_OUTPUT", "1").lower() not in ("0", "false", "no", "off")
+
+
+class OutputSchema(NamedTuple):
+    """A named JSON schema for model output."""
+    name: str
+    description: str
+    schema: Dict[str, Any]
+    # True if the schema is closed (fixed keys), so strict modes can enforce it
+    strict: bool
+
+
+def _classifier_schema(field: str, field_schema: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "type": "object",
+        "properties": {
+            field: field_schema,
+            "explanation": {"type": "string"},
+            "confidence": {"type": "number"},
+        },
+        "required": [field, "explanation", "confidence"],
+        "additionalProperties": False,
+    }
+
+
+FILES_MAP_SCHEMA = {
+    "type": "object",
+    "description": "Map of file path to file content",
+    "additionalProperties": {"type": "string"},
+}
+
+PROJECT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "project": {
+            "type": "object",
+            "properties": {
+                "name": {"type": "string"},
+                "description": {"type": "string"},
+                "files": FILES_MAP_SCHEMA,
+                "dirents": {"type": "object"},
+                "meta": {"type": "object"},
+            },
+            "required": ["name", "description", "files"],
+        }
+    },
+    "required": ["project"],
+}
+
+PROJECT_PLAN_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "name": {"type": "string"},
+        "description": {"type": "string"},
+        "shared_files": FILES_MAP_SCHEMA,
+        "units": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "id": {"type": "string"},
+                    "title": {"type": "string"},
+                    "description": {"type": "string"},
+                    "files": {"type": "array", "items": {"type": "string"}},
+                },
+                "required": ["id", "title", "files"],
+            },
+        },
+    },
+    "required": ["name", "description", "shared_files", "units"],
+}
+
+PROJECT_FILES_SCHEMA = {
+    "type": "object",
+    "properties": {"files": FILES_MAP_SCHEMA},
+    "required": ["files"],
+}
+
+OUTPUT_SCHEMAS: Dict[str, OutputSchema] = {
+    "project": OutputSchema(
+        "project",
+        "A complete React+Vite+TypeScript project",
+        PROJECT_SCHEMA,
+        strict=False,
+    ),
+    "project_plan": OutputSchema(
+        "project_plan",
+        "A fan-out generation plan: shared files and units of files to write",
+        PROJECT_PLAN_SCHEMA,
+        strict=False,
+    ),
+    "project_files": OutputSchema(
+        "project_files",
+        "The files of one fan-out unit",
+        PROJECT_FILES_SCHEMA,
+        strict=False,
+    ),
+    "intent": OutputSchema(
+        "intent",
+        "User intent classification",
+        _classifier_schema("label", {
+            "type": "string",
+            "enum": ["webpage_build", "greeting_only", "chat", "illegal", "other"],
+        }),
+        strict=True,
+    ),
+    "page_type": OutputSchema(
+        "page_type",
+        "Page type classification",
+        _classifier_schema("page_type", {
+            "type": "string",
+            "enum": list(PAGE_TYPES.keys()) + ["generic"],
+        }),
+        strict=True,
+    ),
+    "query_detail": OutputSchema(
+        "query_detail",
+        "Whether the request needs follow-up questions",
+        _classifier_schema("needs_followup", {"type": "boolean"}),
+        strict=True,
+    ),
+    "modification_complexity": OutputSchema(
+        "modification_complexity",
+        "Modification complexity classification",
+        _classifier_schema("complexity", {
+            "type": "string",
+            "enum": ["small", "medium", "complex"],
+        }),
+        strict=True,
+    ),
+}
+
+
+_unsupported: Set[Tuple[str, str]] = set()
+_unsupported_lock = threading.Lock()
+
+
+def resolve_output_schema(provider: str, model: str, name: Optional[str]) -> Optional[OutputSchema]:
+    """
+    Schema to request for a call, or None to call without structured output.
+
+    Raises:
+        ValueError: For unknown schema names
+    """
+    if name is None or not STRUCTURED_OUTPUT_ENABLED:
+        return None
+    if name not in OUTPUT_SCHEMAS:
+        raise ValueError(f"Unknown output schema: {name}. Available: {', '.join(OUTPUT_SCHEMAS)}")
+    with _unsupported_lock:
+        if (provider, model) in _unsupported:
+            return None
+    return OUTPUT_SCHEMAS[name]
+
+
+# Words a provider's 400 message contains when it rejected the structured-output
+# part of the request (rather than the prompt, the key or the quota)
+SCHEMA_ERROR_TERMS = {
+    "gemini": ("schema", "response_mime_type", "responsemimetype"),
+    "anthropic": ("schema", "tool"),
+    "openai": ("schema", "response_format"),
+}
+
+
+def is_schema_rejection(provider: str, error: Exception) -> bool:
+    """
+    True if error is the provider rejecting the requested output schema:
+    a 400 / INVALID_ARGUMENT whose message mentions the schema, JSON mode
+    (response_format, response_mime_type) or tools.
+
+    Everything else (rate limits, timeouts, auth, server errors) is not, and
+    must not turn structured output off for the model.
+    """
+    status = getattr(error, "status_code", None) or getattr(error, "code", None)
+    invalid_argument = status == 400 or str(getattr(error, "status", "")).upper() == "INVALID_ARGUMENT"
+    if not invalid_argument:
+        return False
+    message = str(error).lower()
+    return any(term in message for term in SCHEMA_ERROR_TERMS.get(provider, ("schema",)))
+
+
+def mark_unsupported(provider: str, model: str, error: Exception) -> None:
+    """Stop requesting structured output from a model that rejected it."""
+    with _unsupported_lock:
+        _unsupported.add((provider, model))
+    logger.warning("%s/%s rejected structured output (%s); using plain text for this model", provider, model, error)
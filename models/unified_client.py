@@ -4,6 +4,45 @@ Unified Model Client - Routes to appropriate provider based on model_name
 
 from typing import Optional, Tuple
 from router.router_config import get_provider, get_router_model, get_main_model, get_modification_model
+from router.adaptive import get_model_selector, TimedCall
+from storage.usage_store import usage_operation
+from utils.tracing import span
+
+
+def _provider_client(provider: str):
+    """Client module for a provider."""
+    if provider == "gemini":
+        import models.gemini_client as client
+    elif provider == "anthropic":
+        import models.claude_client as client
+    elif provider == "openai":
+        import models.gpt_client as client
+    elif provider == "fake":
+        import models.fake_client as client
+    else:
+        raise ValueError(f"Unknown provider: {provider}")
+    return client
+
+
+def _classifier_failed(metadata: dict) -> Tuple[bool, bool]:
+    """(call ok, parse ok) from a classifier's metadata explanation."""
+    explanation = str((metadata or {}).get("explanation", ""))
+    if explanation.startswith("classifier error"):
+        return False, True
+    return True, not explanation.startswith("Could not parse")
+
+
+def _classify(function_name: str, operation: str, text: str, model_name: str) -> Tuple[str, dict]:
+    """Run a classifier on the adaptively selected router model and record the outcome."""
+    client = _provider_client(get_provider(model_name))
+    model = get_model_selector().select(model_name, operation)
+    with span(f"unified.{operation}", model=model, operation=operation) as s, TimedCall(model, operation) as call, usage_operation(operation):
+        label, metadata = getattr(client, function_name)(text, model=model)
+        call.ok, parse_ok = _classifier_failed(metadata)
+        s.set_attributes({"label": label, "call_ok": call.ok, "parse_ok": parse_ok})
+    if call.ok:
+        get_model_selector().record_parse(model, operation, parse_ok)
+    return label, metadata
 
 
 def generate_text_unified(
@@ -34,17 +73,63 @@ def generate_text_unified(
         model = get_main_model(model_name)
     
     # Route to appropriate client
-    if provider == "gemini":
-        from models.gemini_client import generate_text
-        return generate_text(prompt, model=model)
-    elif provider == "anthropic":
-        from models.claude_client import generate_text
-        return generate_text(prompt, model=model)
-    elif provider == "openai":
-        from models.gpt_client import generate_text
-        return generate_text(prompt, model=model)
-    else:
-        raise ValueError(f"Unknown provider: {provider}")
+    with span("unified.text", model=model, operation_type=operation_type):
+        if provider == "gemini":
+            from models.gemini_client import generate_text
+            return generate_text(prompt, model=model)
+        elif provider == "anthropic":
+            from models.claude_client import generate_text
+            return generate_text(prompt, model=model)
+        elif provider == "openai":
+            from models.gpt_client import generate_text
+            return generate_text(prompt, model=model)
+        elif provider == "fake":
+            from models.fake_client import generate_text
+            return generate_text(prompt, model=model)
+        else:
+            raise ValueError(f"Unknown provider: {provider}")
+
+
+def generate_project_text_unified(
+    prompt_parts,
+    provider: str,
+    model: str,
+    max_tokens: int = 16384,
+    output_schema: str = "project",
+    operation: str = "generation",
+) -> str:
+    """
+    Project generation/modification call for a prompt split into a static
+    prefix and a dynamic suffix (see prompts.PromptParts).
+    
+    The prefix is passed separately so each client can serve it from the
+    provider's prompt cache, and output is constrained to output_schema
+    (a name from models.schemas).
+    
+    Args:
+        prompt_parts: Object with .prefix and .suffix
+        provider: gemini, anthropic, openai or fake (anything else falls back to gemini)
+        model: Model identifier
+        max_tokens: Output token limit (Claude/GPT; Gemini uses the model default)
+        output_schema: Structured output schema name
+        operation: Operation name under which latency and errors are recorded (see router.adaptive)
+    
+    Returns:
+        Generated text
+    """
+    with span(f"unified.{operation}", model=model, provider=provider, output_schema=output_schema), TimedCall(model, operation), usage_operation(operation):
+        if provider == "anthropic":
+            from models.claude_client import generate_text
+            return generate_text(prompt_parts.suffix, model=model, max_tokens=max_tokens, prefix=prompt_parts.prefix, output_schema=output_schema)
+        elif provider == "openai":
+            from models.gpt_client import generate_text
+            return generate_text(prompt_parts.suffix, model=model, max_tokens=max_tokens, prefix=prompt_parts.prefix, output_schema=output_schema)
+        elif provider == "fake":
+            from models.fake_client import generate_text
+            return generate_text(prompt_parts.suffix, model=model, max_tokens=max_tokens, prefix=prompt_parts.prefix, output_schema=output_schema)
+        else:
+            from models.gemini_client import generate_text
+            return generate_text(prompt_parts.suffix, model=model, prefix=prompt_parts.prefix, output_schema=output_schema)
 
 
 def classify_intent_unified(user_text: str, model_name: str = "gemini") -> Tuple[str, dict]:
@@ -58,100 +143,31 @@ def classify_intent_unified(user_text: str, model_name: str = "gemini") -> Tuple
     Returns:
         (label, metadata)
     """
-    provider = get_provider(model_name)
-    
-    if provider == "gemini":
-        from models.gemini_client import classify_intent
-        model = get_router_model(model_name)
-        return classify_intent(user_text, model=model)
-    elif provider == "anthropic":
-        from models.claude_client import classify_intent
-        model = get_router_model(model_name)
-        return classify_intent(user_text, model=model)
-    elif provider == "openai":
-        from models.gpt_client import classify_intent
-        model = get_router_model(model_name)
-        return classify_intent(user_text, model=model)
-    else:
-        raise ValueError(f"Unknown provider: {provider}")
+    return _classify("classify_intent", "intent", user_text, model_name)
 
 
 def classify_page_type_unified(user_text: str, model_name: str = "gemini") -> Tuple[str, dict]:
     """Unified page type classification"""
-    provider = get_provider(model_name)
-    
-    if provider == "gemini":
-        from models.gemini_client import classify_page_type
-        model = get_router_model(model_name)
-        return classify_page_type(user_text, model=model)
-    elif provider == "anthropic":
-        from models.claude_client import classify_page_type
-        model = get_router_model(model_name)
-        return classify_page_type(user_text, model=model)
-    elif provider == "openai":
-        from models.gpt_client import classify_page_type
-        model = get_router_model(model_name)
-        return classify_page_type(user_text, model=model)
-    else:
-        raise ValueError(f"Unknown provider: {provider}")
+    return _classify("classify_page_type", "page_type", user_text, model_name)
 
 
 def analyze_query_detail_unified(user_text: str, model_name: str = "gemini") -> Tuple[bool, float]:
     """Unified query analysis"""
-    provider = get_provider(model_name)
-    
-    if provider == "gemini":
-        from models.gemini_client import analyze_query_detail
-        model = get_router_model(model_name)
-        return analyze_query_detail(user_text, model=model)
-    elif provider == "anthropic":
-        from models.claude_client import analyze_query_detail
-        model = get_router_model(model_name)
-        return analyze_query_detail(user_text, model=model)
-    elif provider == "openai":
-        from models.gpt_client import analyze_query_detail
-        model = get_router_model(model_name)
-        return analyze_query_detail(user_text, model=model)
-    else:
-        raise ValueError(f"Unknown provider: {provider}")
+    client = _provider_client(get_provider(model_name))
+    model = get_model_selector().select(model_name, "query_detail")
+    # Failures are swallowed by the clients (needs_followup=True), so only latency is measured
+    with span("unified.query_detail", model=model), TimedCall(model, "query_detail"), usage_operation("query_detail"):
+        return client.analyze_query_detail(user_text, model=model)
 
 
 def chat_response_unified(user_text: str, model_name: str = "gemini") -> str:
     """Unified chat response"""
-    provider = get_provider(model_name)
-    
-    if provider == "gemini":
-        from models.gemini_client import chat_response
-        model = get_router_model(model_name)
-        return chat_response(user_text, model=model)
-    elif provider == "anthropic":
-        from models.claude_client import chat_response
-        model = get_router_model(model_name)
-        return chat_response(user_text, model=model)
-    elif provider == "openai":
-        from models.gpt_client import chat_response
-        model = get_router_model(model_name)
-        return chat_response(user_text, model=model)
-    else:
-        raise ValueError(f"Unknown provider: {provider}")
+    client = _provider_client(get_provider(model_name))
+    model = get_model_selector().select(model_name, "chat")
+    with span("unified.chat", model=model), TimedCall(model, "chat"), usage_operation("chat"):
+        return client.chat_response(user_text, model=model)
 
 
 def classify_modification_complexity_unified(instruction: str, model_name: str = "gemini") -> Tuple[str, dict]:
     """Unified modification complexity classification"""
-    provider = get_provider(model_name)
-    
-    if provider == "gemini":
-        from models.gemini_client import classify_modification_complexity
-        model = get_router_model(model_name)
-        return classify_modification_complexity(instruction, model=model)
-    elif provider == "anthropic":
-        from models.claude_client import classify_modification_complexity
-        model = get_router_model(model_name)
-        return classify_modification_complexity(instruction, model=model)
-    elif provider == "openai":
-        from models.gpt_client import classify_modification_complexity
-        model = get_router_model(model_name)
-        return classify_modification_complexity(instruction, model=model)
-    else:
-        raise ValueError(f"Unknown provider: {provider}")
-
+    return _classify("classify_modification_complexity", "modification_complexity", instruction, model_name)
@@ -0,0 +1,21 @@
+"""
+Prompt templates for project generation and modification
+"""
+
+from .templates import (
+    PromptParts,
+    ProjectPromptTemplate,
+    PromptTemplateRegistry,
+    get_prompt_templates,
+    render_modification_prompt,
+    render_modification_chunk_prompt,
+)
+
+__all__ = [
+    "PromptParts",
+    "ProjectPromptTemplate",
+    "PromptTemplateRegistry",
+    "get_prompt_templates",
+    "render_modification_prompt",
+    "render_modification_chunk_prompt",
+]
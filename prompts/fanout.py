@@ -0,0 +1,122 @@
+"""
+Fan-out Prompt Templates - Planner and worker prompts for parallel generation
+
+The planner writes the shared files (routing, shared types, styles) and
+splits the remaining src/ files into units; each worker then writes one
+unit. Both prefixes are static per (provider, page_type) like the
+single-call generation template, so they are compiled once and cacheable.
+"""
+
+import json
+from typing import Dict, Any, List, Optional
+
+from scaffold import get_scaffold_template
+from utils.tokenizer import count_tokens
+from .templates import PromptParts, render_page_type_section, render_generation_suffix
+
+
+PLAN_PREAMBLE = (
+    "You are planning a React+Vite+TypeScript project that several developers will write in parallel.\n"
+    "Return exactly one JSON object and nothing else, in this format:\n"
+    "{\"name\": string, \"description\": string, \"shared_files\": {path: content}, "
+    "\"units\": [{\"id\": string, \"title\": string, \"description\": string, \"files\": [path, ...]}]}\n\n"
+    "Rules:\n"
+    "1. shared_files: write these in full now and keep them small: src/App.tsx (default export App with "
+    "react-router routes for every page), src/types.ts (shared TypeScript types and mock data shapes) "
+    "and src/index.css.\n"
+    "2. units: one unit per core page (its page component plus components only that page uses); "
+    "components used by several pages go into one extra 'shared-components' unit.\n"
+    "3. Every unit file path is under src/ and appears in exactly one unit. Every file imported by "
+    "src/App.tsx must belong to a unit. Page and component files use default exports.\n"
+    "4. Do not write the unit files themselves; describe in each unit's description what its files "
+    "export and which props they take.\n"
+)
+
+WORKER_PREAMBLE = (
+    "You are writing one part of a React+Vite+TypeScript project in parallel with other developers.\n"
+    "The project plan below contains the shared files (already written) and every planned file path.\n"
+    "Return exactly one JSON object and nothing else, in this format: {\"files\": {path: content}}\n\n"
+    "Rules:\n"
+    "1. Write ONLY the files assigned to you, each complete and production quality.\n"
+    "2. Import shared types from src/types.ts and other units' files by their planned paths; "
+    "page and component files use default exports.\n"
+    "3. Follow the props and exports described in the plan so your files fit the rest of the project.\n"
+)
+
+
+def _plan_summary(plan: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "name": plan.get("name", ""),
+        "description": plan.get("description", ""),
+        "shared_files": plan.get("shared_files", {}),
+        "units": [
+            {
+                "id": unit.get("id"),
+                "title": unit.get("title"),
+                "description": unit.get("description", ""),
+                "files": unit.get("files", []),
+            }
+            for unit in plan.get("units", [])
+        ],
+    }
+
+
+class FanoutPromptTemplate:
+    """Compiled planner and worker prefixes for one (provider, page_type)."""
+
+    __slots__ = ("provider", "page_type_key", "plan_prefix", "worker_prefix", "plan_prefix_tokens", "worker_prefix_tokens")
+
+    def __init__(self, provider: str, page_type_key: Optional[str], page_type_config: Optional[Dict[str, Any]]):
+        self.provider = provider
+        self.page_type_key = page_type_key
+        context = render_page_type_section(page_type_config) if page_type_config else ""
+        context += get_scaffold_template(page_type_key).prompt_instructions()
+        self.plan_prefix = PLAN_PREAMBLE + context
+        self.worker_prefix = WORKER_PREAMBLE + context
+        self.plan_prefix_tokens = count_tokens(self.plan_prefix, provider)
+        self.worker_prefix_tokens = count_tokens(self.worker_prefix, provider)
+
+    def render_plan(
+        self,
+        questionnaire_answers: Optional[Dict[str, Any]] = None,
+        wizard_inputs: Optional[Dict[str, Any]] = None,
+    ) -> PromptParts:
+        """Prompt for the planning call."""
+        suffix = render_generation_suffix(questionnaire_answers, wizard_inputs)
+        return PromptParts(self.plan_prefix, suffix, self.plan_prefix_tokens, self.provider)
+
+    def render_worker(
+        self,
+        plan: Dict[str, Any],
+        unit: Dict[str, Any],
+        files: List[str],
+        questionnaire_answers: Optional[Dict[str, Any]] = None,
+        wizard_inputs: Optional[Dict[str, Any]] = None,
+    ) -> PromptParts:
+        """Prompt for one worker call writing files of a unit."""
+        suffix = (
+            "\n=== PROJECT PLAN ===\n"
+            + json.dumps(_plan_summary(plan), ensure_ascii=False, indent=2)
+            + "\n\n=== YOUR ASSIGNMENT ===\n"
+            + f"Unit: {unit.get('title') or unit.get('id')}\n"
+            + (f"{unit['description']}\n" if unit.get("description") else "")
+            + "Files to write:\n"
+            + "".join(f"- {path}\n" for path in files)
+            + render_generation_suffix(questionnaire_answers, wizard_inputs)
+        )
+        return PromptParts(self.worker_prefix, suffix, self.worker_prefix_tokens, self.provider)
+
+    def describe(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "provider": self.provider,
+                "page_type": self.page_type_key,
+                "kind": kind,
+                "prefix_chars": len(prefix),
+                "prefix_tokens": tokens,
+            }
+            for kind, prefix, tokens in (
+                ("fanout_plan", self.plan_prefix, self.plan_prefix_tokens),
+                ("fanout_worker", self.worker_prefix, self.worker_prefix_tokens),
+            )
+        ]
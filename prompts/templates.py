@@ -0,0 +1,318 @@
+"""
+Prompt Templates - Precompiled project generation/modification prompts
+
+The page-type section of the generation prompt only depends on the provider
+and the (static) PAGE_TYPES entry, so it is rendered once per
+(provider, page_type) at startup. Every prompt is returned as a static prefix
+plus a dynamic suffix (questionnaire answers, wizard inputs, base project,
+instruction); the prefix is byte-identical across requests, which is what
+provider-side prompt caching keys on.
+"""
+
+import json
+from typing import Dict, Any, List, Optional, NamedTuple
+
+from data.page_types_reference import PAGE_TYPES
+from scaffold import SCAFFOLD_ENABLED, get_scaffold_template
+from utils.tokenizer import count_tokens
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+PROVIDERS = ("gemini", "anthropic", "openai")
+
+GEMINI_PREAMBLE = (
+    "Return exactly one JSON object describing a React+Vite+TypeScript project. "
+    "Schema must be: {\"project\": {\"name\": string, \"description\": string, \"files\": {...}, \"dirents\": {...}, \"meta\": {...}}}. "
+    "Files must map each file path to its content as a string (escaped). "
+    "Return only the JSON object and nothing else.\n\n"
+)
+
+# More explicit preamble for Claude/GPT to ensure JSON-only output
+STRICT_JSON_PREAMBLE = (
+    "CRITICAL: You MUST return ONLY valid JSON. No markdown, no code blocks, no explanations, no text before or after.\n\n"
+    "Return exactly one JSON object describing a React+Vite+TypeScript project. "
+    "Schema must be: {\"project\": {\"name\": string, \"description\": string, \"files\": {...}, \"dirents\": {...}, \"meta\": {...}}}. "
+    "Files must map each file path to its content as a string (escaped).\n\n"
+    "IMPORTANT: Your response must start with { and end with }. Do NOT wrap in ```json or markdown. Return ONLY the raw JSON object.\n\n"
+)
+
+GENERATION_RETRY_PREAMBLE = (
+    "You are a JSON generator. Return ONLY valid JSON, nothing else.\n\n"
+    "CRITICAL RULES:\n"
+    "1. Start your response with {\n"
+    "2. End your response with }\n"
+    "3. Do NOT include markdown code blocks (no ```json or ```)\n"
+    "4. Do NOT include any text before or after the JSON\n"
+    "5. Do NOT include explanations or comments\n"
+    "6. Ensure all strings are properly escaped (use \\n for newlines, \\\" for quotes)\n"
+    "7. Ensure the JSON is complete and valid\n\n"
+)
+
+MODIFICATION_RETRY_PREAMBLE = (
+    "You are a JSON generator. Return ONLY valid JSON, nothing else.\n\n"
+    "CRITICAL RULES:\n"
+    "1. Start your response with {\n"
+    "2. End your response with }\n"
+    "3. Do NOT include markdown code blocks (no ```json or ```)\n"
+    "4. Do NOT include any text before or after the JSON\n"
+    "5. Do NOT include explanations or comments\n\n"
+)
+
+MODIFICATION_PREFIX = """You are a JSON project modifier. You MUST return ONLY valid JSON, nothing else.
+
+CRITICAL REQUIREMENTS:
+1. Return ONLY a JSON object in this exact format: {"project": {...}}
+2. The JSON must match the schema of the base project exactly
+3. Modify ONLY what the user requests, keep everything else unchanged
+4. Do NOT include any markdown, code blocks, explanations, or text outside the JSON
+5. The output must be parseable JSON that starts with { and ends with }
+
+Base project JSON:
+"""
+
+MODIFICATION_TRAILER = (
+    "IMPORTANT: Return ONLY the complete modified project JSON. No markdown, no code blocks, "
+    "no explanations. Just the raw JSON starting with { and ending with }."
+)
+
+
+class PromptParts(NamedTuple):
+    """
+    A rendered prompt split into its cacheable prefix and per-request suffix.
+
+    Token counts are in the provider's tokens (see utils.tokenizer.count_tokens).
+    """
+    prefix: str
+    suffix: str
+    prefix_tokens: int
+    provider: Optional[str] = None
+
+    @property
+    def text(self) -> str:
+        return self.prefix + self.suffix
+
+    @property
+    def suffix_tokens(self) -> int:
+        return count_tokens(self.suffix, self.provider)
+
+
+def render_page_type_section(page_type_config: Dict[str, Any]) -> str:
+    """Render the static page-type requirements block."""
+    lines = [
+        f"\n=== PAGE TYPE: {page_type_config['name']} ({page_type_config['category']}) ===\n",
+        f"Target User: {page_type_config['end_user']}\n\n",
+        "REQUIRED CORE PAGES:\n",
+    ]
+    lines.extend(f"{i}. {page}\n" for i, page in enumerate(page_type_config['core_pages'], 1))
+    lines.append("\n\nREQUIRED COMPONENTS TO IMPLEMENT:\n")
+    lines.extend(
+        f"{i}. **{component['name']}**: {component['description']}\n"
+        for i, component in enumerate(page_type_config['components'], 1)
+    )
+    return "".join(lines)
+
+
+def render_generation_suffix(
+    questionnaire_answers: Optional[Dict[str, Any]] = None,
+    wizard_inputs: Optional[Dict[str, Any]] = None,
+) -> str:
+    """Render the per-request part of a generation prompt."""
+    lines = []
+    if questionnaire_answers:
+        lines.append("\n=== USER REQUIREMENTS (from questionnaire) ===\n")
+        for key, value in questionnaire_answers.items():
+            if isinstance(value, list):
+                lines.append(f"- {key}: {', '.join(value)}\n")
+            else:
+                lines.append(f"- {key}: {value}\n")
+    lines.append("USER_FIELDS:\n")
+    lines.append(json.dumps(wizard_inputs or {}, ensure_ascii=False))
+    return "".join(lines)
+
+
+class ProjectPromptTemplate:
+    """
+    Compiled generation prompt for one (provider, page_type).
+
+    Both the normal and the retry ("strict") prefixes are rendered once;
+    render() only formats the dynamic suffix. With the local scaffold
+    enabled the prefix also tells the model to return only src/ files.
+    """
+
+    __slots__ = ("provider", "page_type_key", "prefix", "strict_prefix", "prefix_tokens", "strict_prefix_tokens")
+
+    def __init__(self, provider: str, page_type_key: Optional[str], page_type_config: Optional[Dict[str, Any]]):
+        self.provider = provider
+        self.page_type_key = page_type_key
+        preamble = GEMINI_PREAMBLE if provider == "gemini" else STRICT_JSON_PREAMBLE
+        self.prefix = preamble + (render_page_type_section(page_type_config) if page_type_config else "")
+        if SCAFFOLD_ENABLED:
+            self.prefix += get_scaffold_template(page_type_key).prompt_instructions()
+        self.strict_prefix = GENERATION_RETRY_PREAMBLE + self.prefix
+        # In the provider's tokens, like the suffix counts they are added to
+        self.prefix_tokens = count_tokens(self.prefix, provider)
+        self.strict_prefix_tokens = count_tokens(self.strict_prefix, provider)
+
+    def render(
+        self,
+        questionnaire_answers: Optional[Dict[str, Any]] = None,
+        wizard_inputs: Optional[Dict[str, Any]] = None,
+        strict: bool = False,
+    ) -> PromptParts:
+        """Render the prompt for one request."""
+        suffix = render_generation_suffix(questionnaire_answers, wizard_inputs)
+        if strict:
+            return PromptParts(self.strict_prefix, suffix, self.strict_prefix_tokens, self.provider)
+        return PromptParts(self.prefix, suffix, self.prefix_tokens, self.provider)
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "provider": self.provider,
+            "page_type": self.page_type_key,
+            "kind": "generation",
+            "prefix_chars": len(self.prefix),
+            "prefix_tokens": self.prefix_tokens,
+            "strict_prefix_tokens": self.strict_prefix_tokens,
+        }
+
+
+def _prefix_token_counts(prefix: str) -> Dict[Optional[str], int]:
+    """Token count of a provider-independent prefix, per provider (None: unscaled)."""
+    return {provider: count_tokens(prefix, provider) for provider in (None,) + PROVIDERS}
+
+
+def _prefix_tokens(counts: Dict[Optional[str], int], prefix: str, provider: Optional[str]) -> int:
+    return counts[provider] if provider in counts else count_tokens(prefix, provider)
+
+
+_MODIFICATION_PREFIX_TOKENS = _prefix_token_counts(MODIFICATION_PREFIX)
+_STRICT_MODIFICATION_PREFIX_TOKENS = _prefix_token_counts(MODIFICATION_RETRY_PREAMBLE + MODIFICATION_PREFIX)
+
+
+def render_modification_prompt(
+    base_project: Dict[str, Any],
+    instruction: str,
+    strict: bool = False,
+    provider: Optional[str] = None,
+) -> PromptParts:
+    """
+    Render the modification prompt.
+
+    The instructions come first so they form the cacheable prefix; the base
+    project and the user instruction are the per-request suffix. Token counts
+    are in the provider's tokens.
+    """
+    suffix = (
+        json.dumps({"project": base_project}, indent=2)
+        + "\n\nUser modification request:\n"
+        + instruction
+        + "\n\n"
+        + MODIFICATION_TRAILER
+    )
+    if strict:
+        prefix, counts = MODIFICATION_RETRY_PREAMBLE + MODIFICATION_PREFIX, _STRICT_MODIFICATION_PREFIX_TOKENS
+    else:
+        prefix, counts = MODIFICATION_PREFIX, _MODIFICATION_PREFIX_TOKENS
+    return PromptParts(prefix, suffix, _prefix_tokens(counts, prefix, provider), provider)
+
+
+MODIFICATION_CHUNK_PREFIX = """You are modifying part of a large React+Vite+TypeScript project that is too big to edit in one response.
+You are shown every file path of the project, but only the contents of some of its files.
+Return ONLY a JSON object in this exact format: {"files": {path: content}}
+
+Rules:
+1. Apply the user's modification request to the files shown to you.
+2. Return the COMPLETE new content of every shown file you change; omit shown files that need no change.
+3. You may add new files if the request needs them; do not return other existing files.
+4. Keep imports consistent with the listed project paths.
+5. Do NOT include any markdown, code blocks, explanations, or text outside the JSON.
+
+"""
+
+_MODIFICATION_CHUNK_PREFIX_TOKENS = _prefix_token_counts(MODIFICATION_CHUNK_PREFIX)
+
+
+def render_modification_chunk_prompt(
+    base_project: Dict[str, Any],
+    chunk_paths: List[str],
+    instruction: str,
+    chunk_index: int,
+    chunk_count: int,
+    provider: Optional[str] = None,
+) -> PromptParts:
+    """Render the prompt for one chunk of a chunked modification (output: project_files)."""
+    files = base_project.get("files", {})
+    suffix = (
+        f"Project: {base_project.get('name', '')}\n"
+        + "All project files:\n"
+        + "".join(f"- {path}\n" for path in files)
+        + f"\nFiles shown to you (part {chunk_index + 1} of {chunk_count}):\n"
+        + json.dumps({path: files[path] for path in chunk_paths}, indent=2)
+        + "\n\nUser modification request:\n"
+        + instruction
+    )
+    prefix_tokens = _prefix_tokens(_MODIFICATION_CHUNK_PREFIX_TOKENS, MODIFICATION_CHUNK_PREFIX, provider)
+    return PromptParts(MODIFICATION_CHUNK_PREFIX, suffix, prefix_tokens, provider)
+
+
+class PromptTemplateRegistry:
+    """
+    All generation templates, compiled once per (provider, page_type).
+
+    Unknown page types (and requests without one) use the provider's
+    template without a page-type section; unknown providers use the
+    Claude/GPT wording, matching the previous inline prompt builder.
+    """
+
+    def __init__(self):
+        from .fanout import FanoutPromptTemplate
+
+        self._templates: Dict[tuple, ProjectPromptTemplate] = {}
+        self._fanout: Dict[tuple, FanoutPromptTemplate] = {}
+        for provider in PROVIDERS:
+            for key, config in [(None, None)] + list(PAGE_TYPES.items()):
+                self._templates[(provider, key)] = ProjectPromptTemplate(provider, key, config)
+                self._fanout[(provider, key)] = FanoutPromptTemplate(provider, key, config)
+        logger.info("Compiled %s generation and %s fan-out templates", len(self._templates), len(self._fanout))
+
+    @staticmethod
+    def _key(provider: str, page_type_key: Optional[str]) -> tuple:
+        return (provider if provider in PROVIDERS else "anthropic", page_type_key if page_type_key in PAGE_TYPES else None)
+
+    def get(self, provider: str, page_type_key: Optional[str]) -> ProjectPromptTemplate:
+        return self._templates[self._key(provider, page_type_key)]
+
+    def fanout(self, provider: str, page_type_key: Optional[str]):
+        """Planner/worker template for fan-out generation."""
+        return self._fanout[self._key(provider, page_type_key)]
+
+    def describe(self) -> List[Dict[str, Any]]:
+        """Per-template sizes and token counts."""
+        described = [template.describe() for template in self._templates.values()]
+        for template in self._fanout.values():
+            described.extend(template.describe())
+        return described + [
+            {
+                "provider": provider,
+                "page_type": None,
+                "kind": "modification",
+                "prefix_chars": len(MODIFICATION_PREFIX),
+                "prefix_tokens": _MODIFICATION_PREFIX_TOKENS[provider],
+                "strict_prefix_tokens": _STRICT_MODIFICATION_PREFIX_TOKENS[provider],
+            }
+            for provider in PROVIDERS
+        ]
+
+
+# Global registry instance
+_registry: Optional[PromptTemplateRegistry] = None
+
+
+def get_prompt_templates() -> PromptTemplateRegistry:
+    """Get or compile the global prompt template registry"""
+    global _registry
+    if _registry is None:
+        _registry = PromptTemplateRegistry()
+    return _registry
@@ -0,0 +1,362 @@
+"""
+Adaptive Model Selection - Pick the fastest healthy model per operation
+
+Every provider call made through models.unified_client records its latency
+and outcome here, per (model, operation). Each operation belongs to a group
+with an ordered list of candidate models; selection picks, among candidates
+that meet the group's constraints, the one with the lowest rolling p50
+latency:
+
+- at least ADAPTIVE_MIN_SAMPLES recent calls (under-sampled candidates are
+  tried every ADAPTIVE_EXPLORE_EVERY decisions so their stats stay current)
+- error rate <= max_error_rate, parse-failure rate <= max_parse_failure_rate
+- p95 latency <= max_p95_seconds (if set)
+- output price <= max_output_cost_per_mtok (if set, from MODEL_PRICING)
+
+Samples older than ADAPTIVE_SAMPLE_MAX_AGE_SECONDS are forgotten, and every
+ADAPTIVE_EXPLORE_EVERY decisions an excluded candidate gets a probe call, so
+a model excluded during an outage is measured again and comes back once it
+recovers.
+
+With no healthy measured candidate the first candidate is used, which is the
+static ROUTER_CONFIG choice unless the operator reorders it. Candidates are
+the quality constraint: only models the operator lists are ever chosen.
+
+Operator policy (MODEL_POLICY env: a JSON string or a path to a JSON file)
+overrides candidates and constraints per family and group, e.g.
+
+    {"gemini": {"router": {"candidates": ["gemini-2.0-flash-lite", "gemini-2.0-flash"],
+                           "max_error_rate": 0.05, "max_p95_seconds": 4}}}
+
+Disabled (ADAPTIVE_ROUTING=0, the default) selection always returns the
+first candidate, but calls are still measured so the stats are visible.
+"""
+
+import os
+import json
+import time
+import threading
+from collections import deque
+from typing import Dict, Any, List, Optional, Tuple
+
+from router.router_config import ROUTER_CONFIG, normalize_model_family, get_model_pricing
+from utils.metrics import REGISTRY, PROVIDER_CALL_SECONDS, observe_stage
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+ADAPTIVE_ROUTING = os.getenv("ADAPTIVE_ROUTING", "0").lower() not in ("0", "false", "no", "off")
+ADAPTIVE_WINDOW = int(os.getenv("ADAPTIVE_WINDOW", "200"))
+ADAPTIVE_MIN_SAMPLES = int(os.getenv("ADAPTIVE_MIN_SAMPLES", "10"))
+ADAPTIVE_EXPLORE_EVERY = int(os.getenv("ADAPTIVE_EXPLORE_EVERY", "50"))
+ADAPTIVE_SAMPLE_MAX_AGE_SECONDS = float(os.getenv("ADAPTIVE_SAMPLE_MAX_AGE_SECONDS", "900"))
+MODEL_POLICY = os.getenv("MODEL_POLICY", "")
+
+# Operation -> candidate group
+OPERATION_GROUPS = {
+    "intent": "router",
+    "page_type": "router",
+    "query_detail": "router",
+    "chat": "router",
+    "modification_complexity": "router",
+    "generation": "generation",
+    "modification_small": "modification_light",
+    "modification_medium": "modification_light",
+    "modification_complex": "modification_complex",
+}
+
+# Operation -> pipeline stage in the metrics (everything else is provider_call)
+OPERATION_STAGES = {
+    "intent": "classify",
+    "page_type": "classify",
+    "modification_complexity": "classify",
+    "query_detail": "analyze",
+    "chat": "chat",
+}
+
+MODEL_SELECTIONS = REGISTRY.counter(
+    "webbuilder_model_selection_total", "Adaptive model selection decisions.", ("family", "operation", "model")
+)
+
+DEFAULT_CONSTRAINTS = {
+    "max_error_rate": 0.1,
+    "max_parse_failure_rate": 0.1,
+    "max_p95_seconds": None,
+    "max_output_cost_per_mtok": None,
+}
+
+
+def modification_operation(complexity: Optional[str]) -> str:
+    """Operation name for a modification of the given complexity (small, medium, complex)."""
+    complexity = (complexity or "medium").lower()
+    return f"modification_{complexity if complexity in ('small', 'complex') else 'medium'}"
+
+
+def _default_policy() -> Dict[str, Dict[str, Dict[str, Any]]]:
+    policy = {}
+    for family, config in ROUTER_CONFIG.items():
+        router_model, main_model = config["router_model"], config["main_model"]
+        policy[family] = {
+            "router": {"candidates": [router_model]},
+            "generation": {"candidates": [main_model]},
+            # Light modifications may run on either model, whichever is faster while healthy
+            "modification_light": {"candidates": [router_model, main_model]},
+            "modification_complex": {"candidates": [main_model]},
+        }
+    return policy
+
+
+def load_policy(source: str = MODEL_POLICY) -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """Default policy merged with the operator's MODEL_POLICY (JSON string or file path)."""
+    policy = _default_policy()
+    if not source:
+        return policy
+    try:
+        if source.lstrip().startswith("{"):
+            override = json.loads(source)
+        else:
+            with open(source, "r", encoding="utf-8") as f:
+                override = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning("Could not load MODEL_POLICY (%s); using the static policy", e)
+        return policy
+    for family, groups in override.items():
+        family_policy = policy.setdefault(normalize_model_family(family), {})
+        for group, settings in (groups or {}).items():
+            family_policy.setdefault(group, {}).update(settings)
+    return policy
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    index = min(len(sorted_values) - 1, int(fraction * len(sorted_values)))
+    return sorted_values[index]
+
+
+class ModelStats:
+    """Rolling call and parse outcomes for one (model, operation)."""
+
+    __slots__ = ("calls", "parses", "max_age", "total_calls", "total_errors", "total_parse_failures")
+
+    def __init__(self, window: int, max_age: float = ADAPTIVE_SAMPLE_MAX_AGE_SECONDS):
+        self.calls: deque = deque(maxlen=window)  # (recorded_at, latency_seconds, ok)
+        self.parses: deque = deque(maxlen=window)  # (recorded_at, parse ok)
+        self.max_age = max_age
+        self.total_calls = 0
+        self.total_errors = 0
+        self.total_parse_failures = 0
+
+    def expire(self, now: float) -> None:
+        """Drop samples older than max_age (oldest first; both deques are in time order)."""
+        cutoff = now - self.max_age
+        while self.calls and self.calls[0][0] < cutoff:
+            self.calls.popleft()
+        while self.parses and self.parses[0][0] < cutoff:
+            self.parses.popleft()
+
+    def summary(self) -> Dict[str, Any]:
+        self.expire(time.time())
+        latencies = sorted(latency for _, latency, ok in self.calls if ok)
+        errors = sum(1 for _, _, ok in self.calls if not ok)
+        parse_failures = sum(1 for _, ok in self.parses if not ok)
+        return {
+            "samples": len(self.calls),
+            "p50_seconds": round(_percentile(latencies, 0.5), 3) if latencies else None,
+            "p95_seconds": round(_percentile(latencies, 0.95), 3) if latencies else None,
+            "error_rate": round(errors / len(self.calls), 4) if self.calls else 0.0,
+            "parse_failure_rate": round(parse_failures / len(self.parses), 4) if self.parses else 0.0,
+            "total_calls": self.total_calls,
+            "total_errors": self.total_errors,
+            "total_parse_failures": self.total_parse_failures,
+        }
+
+
+class AdaptiveModelSelector:
+    """Thread-safe latency/health tracker and per-operation model selector."""
+
+    def __init__(
+        self,
+        policy: Optional[Dict[str, Dict[str, Dict[str, Any]]]] = None,
+        enabled: bool = ADAPTIVE_ROUTING,
+        window: int = ADAPTIVE_WINDOW,
+        min_samples: int = ADAPTIVE_MIN_SAMPLES,
+        explore_every: int = ADAPTIVE_EXPLORE_EVERY,
+    ):
+        self.policy = policy if policy is not None else load_policy()
+        self.enabled = enabled
+        self.window = window
+        self.min_samples = min_samples
+        self.explore_every = explore_every
+        self._stats: Dict[Tuple[str, str], ModelStats] = {}
+        self._decisions: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def _stats_for(self, model: str, operation: str) -> ModelStats:
+        key = (model, operation)
+        stats = self._stats.get(key)
+        if stats is None:
+            stats = self._stats[key] = ModelStats(self.window)
+        return stats
+
+    # ---- measurement ----
+
+    def record(self, model: str, operation: str, latency_seconds: float, ok: bool = True) -> None:
+        """Record one provider call (ok=False for exceptions and error responses)."""
+        with self._lock:
+            stats = self._stats_for(model, operation)
+            stats.calls.append((time.time(), latency_seconds, ok))
+            stats.total_calls += 1
+            if not ok:
+                stats.total_errors += 1
+
+    def record_parse(self, model: str, operation: str, ok: bool) -> None:
+        """Record whether a call's output could be parsed."""
+        with self._lock:
+            stats = self._stats_for(model, operation)
+            stats.parses.append((time.time(), ok))
+            if not ok:
+                stats.total_parse_failures += 1
+
+    # ---- selection ----
+
+    def _group(self, model_family: str, operation: str) -> Tuple[List[str], Dict[str, Any]]:
+        family = normalize_model_family(model_family)
+        settings = self.policy.get(family, {}).get(OPERATION_GROUPS.get(operation, "router"), {})
+        candidates = list(settings.get("candidates") or [])
+        if not candidates:
+            config = ROUTER_CONFIG.get(family, ROUTER_CONFIG["gemini"])
+            candidates = [config["main_model"] if operation == "generation" else config["router_model"]]
+        return candidates, {**DEFAULT_CONSTRAINTS, **settings}
+
+    def _health(self, summary: Dict[str, Any], model: str, constraints: Dict[str, Any]) -> Optional[str]:
+        """Reason the candidate is excluded, or None if it is healthy."""
+        if summary["samples"] < self.min_samples:
+            return "insufficient samples"
+        # Before the latency checks: a model whose recent calls all failed has no p50
+        if summary["error_rate"] > constraints["max_error_rate"]:
+            return f"error rate {summary['error_rate']}"
+        if summary["p50_seconds"] is None:
+            return "no successful calls"
+        if summary["parse_failure_rate"] > constraints["max_parse_failure_rate"]:
+            return f"parse failure rate {summary['parse_failure_rate']}"
+        max_p95 = constraints["max_p95_seconds"]
+        if max_p95 is not None and summary["p95_seconds"] > max_p95:
+            return f"p95 {summary['p95_seconds']}s"
+        max_cost = constraints["max_output_cost_per_mtok"]
+        if max_cost is not None and get_model_pricing(model)["output"] > max_cost:
+            return "over output cost limit"
+        return None
+
+    def select(self, model_family: str, operation: str) -> str:
+        """Model to use for an operation of this family."""
+        candidates, constraints = self._group(model_family, operation)
+        if not self.enabled or len(candidates) == 1:
+            return candidates[0]
+
+        with self._lock:
+            decision = self._decisions.setdefault(
+                (normalize_model_family(model_family), operation),
+                {"count": 0, "chosen": {}, "last_model": None, "last_reason": None},
+            )
+            decision["count"] += 1
+            summaries = {model: self._stats_for(model, operation).summary() for model in candidates}
+
+            healthy = {}
+            excluded = {}
+            for model in candidates:
+                reason = self._health(summaries[model], model, constraints)
+                if reason is None:
+                    healthy[model] = summaries[model]["p50_seconds"]
+                else:
+                    excluded[model] = reason
+
+            undersampled = [model for model in excluded if summaries[model]["samples"] < self.min_samples]
+            unhealthy = [model for model in excluded if model not in undersampled]
+            explore_turn = decision["count"] % self.explore_every == 0
+            if undersampled and (not healthy or explore_turn):
+                # Explore: keep stats for every candidate fresh enough to compare
+                model = min(undersampled, key=lambda m: summaries[m]["samples"])
+                reason = f"exploring ({summaries[model]['samples']} samples)"
+            elif unhealthy and healthy and explore_turn:
+                # Probe: an excluded model only gets new samples if it is called now and then
+                probes = decision.setdefault("probes", {})
+                model = min(unhealthy, key=lambda m: probes.get(m, 0))
+                probes[model] = probes.get(model, 0) + 1
+                reason = f"probing ({excluded[model]})"
+            elif healthy:
+                model = min(healthy, key=healthy.get)
+                reason = f"fastest healthy (p50 {healthy[model]}s)"
+            else:
+                model = candidates[0]
+                reason = "no healthy candidate; static default"
+
+            decision["chosen"][model] = decision["chosen"].get(model, 0) + 1
+            MODEL_SELECTIONS.labels(normalize_model_family(model_family), operation, model).inc()
+            decision["last_model"] = model
+            decision["last_reason"] = reason
+            decision["excluded"] = {m: r for m, r in excluded.items() if m != model}
+        return model
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Per-model stats and per-operation decisions (for the metrics endpoint)."""
+        with self._lock:
+            models: Dict[str, Dict[str, Any]] = {}
+            for (model, operation), stats in sorted(self._stats.items()):
+                models.setdefault(model, {})[operation] = stats.summary()
+            decisions = {
+                f"{family}:{operation}": dict(decision)
+                for (family, operation), decision in sorted(self._decisions.items())
+            }
+        return {
+            "enabled": self.enabled,
+            "window": self.window,
+            "min_samples": self.min_samples,
+            "explore_every": self.explore_every,
+            "models": models,
+            "decisions": decisions,
+            "policy": self.policy,
+        }
+
+
+_model_selector: Optional[AdaptiveModelSelector] = None
+_model_selector_lock = threading.Lock()
+
+
+def get_model_selector() -> AdaptiveModelSelector:
+    """Get or create the global adaptive model selector."""
+    global _model_selector
+    if _model_selector is None:
+        with _model_selector_lock:
+            if _model_selector is None:
+                _model_selector = AdaptiveModelSelector()
+    return _model_selector
+
+
+class TimedCall:
+    """
+    Context manager that records a provider call's latency and outcome
+    (for selection and in the metrics).
+
+        with TimedCall(model, "intent") as call:
+            label, meta = classify_intent(text, model=model)
+            call.ok = not meta["explanation"].startswith("classifier error")
+    """
+
+    __slots__ = ("model", "operation", "ok", "_start")
+
+    def __init__(self, model: str, operation: str):
+        self.model = model
+        self.operation = operation
+        self.ok = True
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self._start
+        ok = self.ok and exc_type is None
+        get_model_selector().record(self.model, self.operation, seconds, ok=ok)
+        PROVIDER_CALL_SECONDS.labels(self.model, self.operation, "ok" if ok else "error").observe(seconds)
+        observe_stage(OPERATION_STAGES.get(self.operation, "provider_call"), seconds)
+        return False
@@ -1,23 +1,142 @@
 # router/model_router.py
 """
 Model Router - Routes to appropriate models based on model_name
+
+Routing is token-aware: given the prompt size and the expected output size,
+a model is kept only if the prompt plus output fit its context window (with a
+safety margin) and the output fits its output limit. Otherwise the request is
+upgraded to the family's main model, chunked (if the caller can split it) or
+refused with TokenBudgetError. max_tokens is derived from the expected output
+instead of a fixed constant.
 """
 
+import os
+from typing import NamedTuple, Optional
+
 from .router_config import (
     get_router_model,
     get_main_model,
     get_modification_model,
     get_provider,
-    is_valid_model_name
+    get_model_limits,
+    get_output_limit,
+    is_valid_model_family
 )
+from utils.tokenizer import count_tokens
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+# Fraction of the context window kept free for tokenizer estimation error
+CONTEXT_SAFETY_MARGIN = float(os.getenv("CONTEXT_SAFETY_MARGIN", "0.05"))
+# max_tokens = expected output x headroom (bounded by the model's limits)
+OUTPUT_HEADROOM = float(os.getenv("OUTPUT_TOKEN_HEADROOM", "1.25"))
+MIN_MAX_TOKENS = 1024
+# Expected output of a full project generation
+GENERATION_OUTPUT_TOKENS = int(os.getenv("GENERATION_OUTPUT_TOKENS", "16384"))
+# A modification returns the whole project, usually slightly grown
+MODIFICATION_OUTPUT_GROWTH = 1.1
+
+
+class TokenBudgetError(ValueError):
+    """A request does not fit any candidate model and cannot be chunked."""
+
+
+class RoutingDecision(NamedTuple):
+    """Model and output budget chosen for a request."""
+    model: str
+    provider: str
+    prompt_tokens: int
+    expected_output_tokens: int
+    max_tokens: int
+    context_window: int
+    # ok: preferred model fits; upgrade: a larger model was chosen; chunk: split the request
+    action: str
+    reason: str
+
+
+def _fit(model: str, prompt_tokens: int, expected_output_tokens: int) -> Optional[int]:
+    """max_tokens for a model if the request fits it, else None."""
+    limits = get_model_limits(model)
+    max_output = get_output_limit(model)
+    usable_context = int(limits["context_window"] * (1 - CONTEXT_SAFETY_MARGIN))
+    if expected_output_tokens > max_output:
+        return None
+    if prompt_tokens + expected_output_tokens > usable_context:
+        return None
+    wanted = max(MIN_MAX_TOKENS, int(expected_output_tokens * OUTPUT_HEADROOM))
+    return min(wanted, max_output, usable_context - prompt_tokens)
+
+
+def route_request(
+    model_family: str,
+    prompt_tokens: int,
+    expected_output_tokens: int,
+    preferred_model: Optional[str] = None,
+    allow_chunking: bool = False,
+) -> RoutingDecision:
+    """
+    Pick the model and max_tokens for a request of a known size.
+    
+    Args:
+        model_family: Model family (Gemini, Anthropic, OpenAI or internal key)
+        prompt_tokens: Prompt size in tokens
+        expected_output_tokens: Output the request needs (e.g. the full project for a modification)
+        preferred_model: Model to use if it fits (defaults to the main model)
+        allow_chunking: Return action "chunk" instead of raising when nothing fits
+    
+    Returns:
+        RoutingDecision
+    
+    Raises:
+        TokenBudgetError: If no candidate fits and chunking is not allowed
+    """
+    provider = get_provider(model_family)
+    main_model = get_main_model(model_family)
+    candidates = [preferred_model or main_model]
+    if main_model not in candidates:
+        candidates.append(main_model)
+
+    for model in candidates:
+        max_tokens = _fit(model, prompt_tokens, expected_output_tokens)
+        if max_tokens is not None:
+            action = "ok" if model == candidates[0] else "upgrade"
+            reason = "fits" if action == "ok" else f"{candidates[0]} too small for {prompt_tokens}+{expected_output_tokens} tokens"
+            if action == "upgrade":
+                logger.info("Upgrading %s -> %s: %s", candidates[0], model, reason)
+            return RoutingDecision(
+                model, provider, prompt_tokens, expected_output_tokens, max_tokens,
+                get_model_limits(model)["context_window"], action, reason
+            )
+
+    limits = get_model_limits(main_model)
+    reason = (
+        f"{prompt_tokens} prompt + {expected_output_tokens} output tokens exceed every candidate "
+        f"({main_model}: context {limits['context_window']}, output {get_output_limit(main_model)})"
+    )
+    if not allow_chunking:
+        raise TokenBudgetError(reason)
+    logger.info("Chunking: %s", reason)
+    return RoutingDecision(
+        main_model, provider, prompt_tokens, expected_output_tokens, get_output_limit(main_model),
+        limits["context_window"], "chunk", reason
+    )
 
 
 def select_model(prompt: str, tokens_est: int, model_name: str = "gemini") -> str:
     """
-    Select model based on prompt and model_name.
-    For backward compatibility, defaults to main model.
+    Select model based on prompt size and model_name.
+    
+    tokens_est is the prompt size if already known (0 to count it here);
+    the request is expected to produce a full project.
+    
+    Raises:
+        TokenBudgetError: If the prompt does not fit any model of the family
     """
-    return get_main_model(model_name)
+    provider = get_provider(model_name)
+    prompt_tokens = tokens_est or count_tokens(prompt, provider)
+    return route_request(model_name, prompt_tokens, GENERATION_OUTPUT_TOKENS).model
 
 
 def get_router_model_for_operations(model_name: str = "gemini") -> str:
@@ -32,4 +151,4 @@ def get_main_model_for_generation(model_name: str = "gemini") -> str:
 
 def get_model_for_modification(model_name: str, complexity: str) -> str:
     """Get model for modification based on complexity"""
-    return get_modification_model(model_name, complexity)
\ No newline at end of file
+    return get_modification_model(model_name, complexity)
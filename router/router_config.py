@@ -2,13 +2,20 @@
 Router Configuration - Maps model_family to router and main models
 """
 
+import os
+from typing import Optional
+
+# Send every family's model calls to the offline fake provider (models.fake_client)
+FAKE_LLM = os.getenv("FAKE_LLM", "0").lower() in ("1", "true", "yes", "on")
+
 # Map model_family (from API) to internal model keys
 MODEL_FAMILY_MAP = {
     "gemini": "gemini",
     "anthropic": "claude",
     "claude": "claude",
     "openai": "gpt",
-    "gpt": "gpt"
+    "gpt": "gpt",
+    "fake": "fake"
 }
 
 ROUTER_CONFIG = {
@@ -26,9 +33,56 @@ ROUTER_CONFIG = {
         "router_model": "gpt-4o-mini",  # For intent, page_type, query, chat, modification complexity
         "main_model": "gpt-5.2",  # For project generation, complex modifications
         "provider": "openai"
+    },
+    "fake": {
+        "router_model": "fake-router",  # Offline, deterministic (benchmarks, local runs)
+        "main_model": "fake-main",
+        "provider": "fake"
     }
 }
 
+# Context window and output limit per model (tokens), used for token-aware routing
+MODEL_LIMITS = {
+    "gemini-3-pro-preview": {"context_window": 1048576, "max_output": 65536},
+    "gemini-2.0-flash": {"context_window": 1048576, "max_output": 8192},
+    "gemini-2.0-flash-lite": {"context_window": 1048576, "max_output": 8192},
+    "claude-opus-4-5-20251101": {"context_window": 200000, "max_output": 64000},
+    "claude-haiku-4-5-20251001": {"context_window": 200000, "max_output": 64000},
+    "claude-3-haiku": {"context_window": 200000, "max_output": 4096},
+    "gpt-5.2": {"context_window": 400000, "max_output": 128000},
+    "gpt-4o-mini": {"context_window": 128000, "max_output": 16384},
+    "fake-main": {"context_window": 200000, "max_output": 64000},
+    "fake-router": {"context_window": 128000, "max_output": 16384},
+}
+
+# Conservative limits for models missing from MODEL_LIMITS
+DEFAULT_MODEL_LIMITS = {"context_window": 128000, "max_output": 8192}
+
+# Largest max_tokens a provider accepts on a non-streaming call (all calls
+# here are non-streaming): the Anthropic SDK refuses requests whose
+# max_tokens implies more than 10 minutes (128000 tokens/hour, ~21.3k)
+NON_STREAMING_MAX_OUTPUT = {"anthropic": 21000}
+
+# Model name prefix -> provider, for models outside ROUTER_CONFIG too
+MODEL_PROVIDER_PREFIXES = (("gemini", "gemini"), ("claude", "anthropic"), ("gpt", "openai"), ("fake", "fake"))
+
+# List price per model, USD per million tokens (input, output); used for cost-aware routing
+MODEL_PRICING = {
+    "gemini-3-pro-preview": {"input": 2.0, "output": 12.0},
+    "gemini-2.0-flash": {"input": 0.1, "output": 0.4},
+    "gemini-2.0-flash-lite": {"input": 0.075, "output": 0.3},
+    "claude-opus-4-5-20251101": {"input": 5.0, "output": 25.0},
+    "claude-haiku-4-5-20251001": {"input": 1.0, "output": 5.0},
+    "claude-3-haiku": {"input": 0.25, "output": 1.25},
+    "gpt-5.2": {"input": 1.75, "output": 14.0},
+    "gpt-4o-mini": {"input": 0.15, "output": 0.6},
+    "fake-main": {"input": 0.0, "output": 0.0},
+    "fake-router": {"input": 0.0, "output": 0.0},
+}
+
+# Unknown models are priced like the most expensive known model so cost limits stay safe
+DEFAULT_MODEL_PRICING = {"input": 5.0, "output": 25.0}
+
 
 def normalize_model_family(model_family: str) -> str:
     """
@@ -105,8 +159,10 @@ def get_provider(model_family: str = "gemini") -> str:
         model_family: Model family name (Gemini, Anthropic, OpenAI) or internal key (gemini, claude, gpt). Case-insensitive.
     
     Returns:
-        Provider name (gemini, anthropic, openai)
+        Provider name (gemini, anthropic, openai, fake); always fake with FAKE_LLM=1
     """
+    if FAKE_LLM:
+        return "fake"
     internal_key = normalize_model_family(model_family)
     config = ROUTER_CONFIG.get(internal_key, ROUTER_CONFIG["gemini"])
     return config["provider"]
@@ -127,3 +183,46 @@ def is_valid_model_family(model_family: str) -> bool:
     internal_key = normalize_model_family(model_family)
     return internal_key in ROUTER_CONFIG
 
+
+def get_model_limits(model: str) -> dict:
+    """
+    Get the context window and output token limit of a model.
+    
+    Args:
+        model: Model identifier
+    
+    Returns:
+        Dict with context_window and max_output (conservative defaults for unknown models)
+    """
+    return MODEL_LIMITS.get(model, DEFAULT_MODEL_LIMITS)
+
+
+def get_model_provider(model: str) -> Optional[str]:
+    """Provider serving a model (from its name), or None if unknown."""
+    for prefix, provider in MODEL_PROVIDER_PREFIXES:
+        if model.startswith(prefix):
+            return provider
+    return None
+
+
+def get_output_limit(model: str) -> int:
+    """
+    Largest max_tokens to request from a model: its output limit, capped
+    at its provider's NON_STREAMING_MAX_OUTPUT.
+    """
+    limit = get_model_limits(model)["max_output"]
+    cap = NON_STREAMING_MAX_OUTPUT.get(get_model_provider(model))
+    return min(limit, cap) if cap else limit
+
+
+def get_model_pricing(model: str) -> dict:
+    """
+    Get the list price of a model.
+    
+    Args:
+        model: Model identifier
+    
+    Returns:
+        Dict with input and output USD per million tokens (conservative defaults for unknown models)
+    """
+    return MODEL_PRICING.get(model, DEFAULT_MODEL_PRICING)
@@ -0,0 +1,19 @@
+"""
+Local scaffolding for generated projects
+"""
+
+from .engine import (
+    SCAFFOLD_ENABLED,
+    SCAFFOLD_FILES,
+    ScaffoldTemplate,
+    get_scaffold_template,
+    merge_scaffold,
+)
+
+__all__ = [
+    "SCAFFOLD_ENABLED",
+    "SCAFFOLD_FILES",
+    "ScaffoldTemplate",
+    "get_scaffold_template",
+    "merge_scaffold",
+]
@@ -0,0 +1,260 @@
+"""
+Scaffold Engine - Deterministic build boilerplate for generated projects
+
+The files every React+Vite+TypeScript project needs but that never depend on
+the user's request (package.json, vite.config.ts, tsconfig.json,
+tsconfig.node.json, index.html, src/main.tsx) are rendered locally from a
+per-page-type template. The model is only asked for application source under
+src/, and merge_scaffold combines the two.
+"""
+
+import os
+import re
+import json
+import html
+from typing import Dict, Any, List, Optional, Tuple
+
+from data.page_types_reference import PAGE_TYPES
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+SCAFFOLD_VERSION = 1
+SCAFFOLD_ENABLED = os.getenv("LOCAL_SCAFFOLD", "1").lower() not in ("0", "false", "no", "off")
+
+SCAFFOLD_FILES = (
+    "package.json",
+    "vite.config.ts",
+    "tsconfig.json",
+    "tsconfig.node.json",
+    "index.html",
+    "src/main.tsx",
+)
+
+BASE_DEPENDENCIES = {
+    "react": "^18.3.1",
+    "react-dom": "^18.3.1",
+    "react-router-dom": "^6.26.2",
+    "lucide-react": "^0.441.0",
+}
+
+DEV_DEPENDENCIES = {
+    "@types/react": "^18.3.5",
+    "@types/react-dom": "^18.3.0",
+    "@vitejs/plugin-react": "^4.3.1",
+    "typescript": "^5.5.4",
+    "vite": "^5.4.3",
+}
+
+# Extra packages per page type (dashboards with metrics/reports get charts)
+PAGE_TYPE_DEPENDENCIES = {
+    "crm_dashboard": {"recharts": "^2.12.7"},
+    "inventory_management": {"recharts": "^2.12.7"},
+}
+
+VITE_CONFIG = """import { defineConfig } from 'vite';
+import react from '@vitejs/plugin-react';
+
+export default defineConfig({
+  plugins: [react()],
+});
+"""
+
+TSCONFIG = json.dumps({
+    "compilerOptions": {
+        "target": "ES2020",
+        "useDefineForClassFields": True,
+        "lib": ["ES2020", "DOM", "DOM.Iterable"],
+        "module": "ESNext",
+        "skipLibCheck": True,
+        "moduleResolution": "bundler",
+        "allowImportingTsExtensions": True,
+        "resolveJsonModule": True,
+        "isolatedModules": True,
+        "noEmit": True,
+        "jsx": "react-jsx",
+        "strict": True,
+        "noFallthroughCasesInSwitch": True,
+    },
+    "include": ["src"],
+    "references": [{"path": "./tsconfig.node.json"}],
+}, indent=2) + "\n"
+
+TSCONFIG_NODE = json.dumps({
+    "compilerOptions": {
+        "composite": True,
+        "skipLibCheck": True,
+        "module": "ESNext",
+        "moduleResolution": "bundler",
+        "allowSyntheticDefaultImports": True,
+    },
+    "include": ["vite.config.ts"],
+}, indent=2) + "\n"
+
+MAIN_TSX = """import React from 'react';
+import ReactDOM from 'react-dom/client';
+import App from './App';
+import './index.css';
+
+ReactDOM.createRoot(document.getElementById('root')!).render(
+  <React.StrictMode>
+    <App />
+  </React.StrictMode>,
+);
+"""
+
+DEFAULT_INDEX_CSS = """*,
+*::before,
+*::after {
+  box-sizing: border-box;
+}
+
+body {
+  margin: 0;
+  font-family: system-ui, -apple-system, 'Segoe UI', Roboto, sans-serif;
+}
+"""
+
+INDEX_HTML = """<!doctype html>
+<html lang="en">
+  <head>
+    <meta charset="UTF-8" />
+    <meta name="viewport" content="width=device-width, initial-scale=1.0" />
+    <title>{title}</title>
+  </head>
+  <body>
+    <div id="root"></div>
+    <script type="module" src="/src/main.tsx"></script>
+  </body>
+</html>
+"""
+
+
+def slugify(name: str, default: str = "webpage-project") -> str:
+    """npm-compatible package name."""
+    slug = re.sub(r"[^a-z0-9]+", "-", (name or "").lower()).strip("-")
+    return slug[:214] or default
+
+
+class ScaffoldTemplate:
+    """Boilerplate for one page type (or the generic default)."""
+
+    __slots__ = ("page_type_key", "dependencies", "_static_files")
+
+    def __init__(self, page_type_key: Optional[str]):
+        self.page_type_key = page_type_key
+        self.dependencies = {**BASE_DEPENDENCIES, **PAGE_TYPE_DEPENDENCIES.get(page_type_key, {})}
+        self._static_files = {
+            "vite.config.ts": VITE_CONFIG,
+            "tsconfig.json": TSCONFIG,
+            "tsconfig.node.json": TSCONFIG_NODE,
+            "src/main.tsx": MAIN_TSX,
+        }
+
+    def render(self, project_name: str) -> Dict[str, str]:
+        """Render the scaffold files for a project."""
+        package = {
+            "name": slugify(project_name, default=slugify(self.page_type_key or "")),
+            "private": True,
+            "version": "0.0.0",
+            "type": "module",
+            "scripts": {
+                "dev": "vite",
+                "build": "tsc && vite build",
+                "preview": "vite preview",
+            },
+            "dependencies": self.dependencies,
+            "devDependencies": DEV_DEPENDENCIES,
+        }
+        files = {
+            "package.json": json.dumps(package, indent=2) + "\n",
+            "index.html": INDEX_HTML.format(title=html.escape(project_name or "App")),
+        }
+        files.update(self._static_files)
+        return files
+
+    def prompt_instructions(self) -> str:
+        """Static prompt section telling the model what it must (not) produce."""
+        packages = ", ".join(self.dependencies)
+        return (
+            "\n=== SCAFFOLD (generated automatically, do NOT include) ===\n"
+            f"These files are created for you and merged with your output: {', '.join(SCAFFOLD_FILES)}.\n"
+            "src/main.tsx renders the default export of src/App.tsx into #root and imports ./index.css.\n"
+            "Return ONLY application source files under src/: src/App.tsx (default export App, including routing), "
+            "src/pages/*, src/components/* and any other src/ modules; src/index.css is optional.\n"
+            f"Available packages: {packages}. Do not import any other package.\n"
+        )
+
+
+_templates: Dict[Optional[str], ScaffoldTemplate] = {}
+
+
+def get_scaffold_template(page_type_key: Optional[str]) -> ScaffoldTemplate:
+    """Scaffold template for a page type (unknown keys use the generic one)."""
+    key = page_type_key if page_type_key in PAGE_TYPES else None
+    template = _templates.get(key)
+    if template is None:
+        template = _templates[key] = ScaffoldTemplate(key)
+    return template
+
+
+def _directories(paths: List[str]) -> List[str]:
+    directories = set()
+    for path in paths:
+        parts = path.split("/")[:-1]
+        for i in range(1, len(parts) + 1):
+            directories.add("/".join(parts[:i]))
+    return sorted(directories)
+
+
+def merge_scaffold(project: Dict[str, Any], page_type_key: Optional[str]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Merge locally rendered scaffold files into a model-generated project.
+
+    Scaffold files always win over model output for the same path; every
+    other file comes from the model. A default src/index.css is added if the
+    model did not write one, and dirents are completed for all directories.
+
+    Returns:
+        (merged project, stats {scaffold_files, model_files, replaced})
+    """
+    template = get_scaffold_template(page_type_key)
+    scaffold_files = template.render(project.get("name", ""))
+    model_files = project.get("files", {})
+
+    replaced = [path for path in scaffold_files if path in model_files]
+    files = {path: content for path, content in model_files.items() if path not in scaffold_files}
+    files.update(scaffold_files)
+    if "src/index.css" not in files:
+        files["src/index.css"] = DEFAULT_INDEX_CSS
+    if "src/App.tsx" not in files:
+        logger.warning("Model output has no src/App.tsx; src/main.tsx will not resolve")
+
+    dirents = dict(project.get("dirents") or {})
+    for directory in _directories(list(files)):
+        dirents.setdefault(directory, {"type": "directory"})
+
+    meta = dict(project.get("meta") or {})
+    meta.setdefault("framework", "React")
+    meta.setdefault("buildTool", "Vite")
+    meta.setdefault("language", "TypeScript")
+    meta["scaffold"] = {
+        "version": SCAFFOLD_VERSION,
+        "page_type": template.page_type_key,
+        "files": list(scaffold_files),
+    }
+
+    merged = {**project, "files": files, "dirents": dirents, "meta": meta}
+    stats = {
+        "scaffold_files": len(scaffold_files),
+        "model_files": len(model_files) - len(replaced),
+        "replaced": replaced,
+    }
+    logger.info(
+        "Merged %s scaffold files with %s model files%s",
+        stats["scaffold_files"],
+        stats["model_files"],
+        f" (replaced model copies of {', '.join(replaced)})" if replaced else "",
+    )
+    return merged, stats
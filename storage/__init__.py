@@ -0,0 +1,41 @@
+"""
+Project Storage
+
+Per-project sharded storage for generated projects, keyed by project_id.
+"""
+
+from .project_store import (
+    ProjectStore,
+    get_project_store,
+    new_project_id,
+    validate_project_id,
+)
+from .blob_store import BlobStore, hash_bytes
+from .project_cache import ProjectCache
+from .materializer import materialize_project, materialize_project_async
+from .atomic import atomic_write_json, atomic_write_bytes
+from .semantic_cache import SemanticProjectCache, CacheMatch, get_semantic_cache
+from .usage_store import UsageStore, get_usage_store, record_usage, usage_scope, usage_operation, attribute_usage
+
+__all__ = [
+    "ProjectStore",
+    "get_project_store",
+    "new_project_id",
+    "validate_project_id",
+    "BlobStore",
+    "hash_bytes",
+    "ProjectCache",
+    "materialize_project",
+    "materialize_project_async",
+    "atomic_write_json",
+    "atomic_write_bytes",
+    "SemanticProjectCache",
+    "CacheMatch",
+    "get_semantic_cache",
+    "UsageStore",
+    "get_usage_store",
+    "record_usage",
+    "usage_scope",
+    "usage_operation",
+    "attribute_usage",
+]
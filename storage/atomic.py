@@ -0,0 +1,80 @@
+"""
+Atomic file writes (temp file in the same directory + os.replace), exclusive
+creates and cross-process file locks.
+"""
+
+import os
+import json
+import tempfile
+from contextlib import contextmanager
+from typing import Any, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks; exclusive creates still prevent overwrites
+    fcntl = None
+
+
+def atomic_write_json(path: str, data: Any, indent: Optional[int] = None) -> None:
+    """Write JSON to path atomically (temp file in the same dir + os.replace)."""
+    atomic_write_bytes(path, json.dumps(data, indent=indent, ensure_ascii=False).encode("utf-8"))
+
+
+def atomic_write_bytes(path: str, data: bytes) -> None:
+    """Write bytes to path atomically (temp file in the same dir + os.replace)."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp_", suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def atomic_create_json(path: str, data: Any, indent: Optional[int] = None) -> bool:
+    """
+    Write JSON to path atomically unless path already exists.
+
+    Returns False (and writes nothing) if the file exists, so two processes
+    can never replace each other's file.
+    """
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp_", suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(json.dumps(data, indent=indent, ensure_ascii=False).encode("utf-8"))
+        try:
+            os.link(tmp_path, path)
+        except FileExistsError:
+            return False
+        return True
+    finally:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+
+
+@contextmanager
+def file_lock(path: str):
+    """
+    Hold an exclusive cross-process lock on path (created if missing) for
+    the block. A no-op where fcntl is unavailable.
+    """
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "a") as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
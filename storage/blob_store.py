@@ -0,0 +1,155 @@
+"""
+Blob Store - Content-addressed file storage with deduplication
+
+Blobs are stored by the sha256 of their bytes:
+
+    blobs/<aa>/<sha256>
+
+Writing the same content twice is a no-op, so project versions that share
+files (the common case for modifications) only pay for files that changed.
+"""
+
+import os
+import json
+import hashlib
+from typing import Any, Dict, Tuple, BinaryIO
+
+from .atomic import atomic_write_bytes
+
+
+def hash_bytes(data: bytes) -> str:
+    """Return the sha256 hex digest used as a blob address."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def normalize_file_path(rel_path: str) -> str:
+    """
+    Normalize a project-relative file path, refusing paths that escape the
+    project (materialized workspaces and export archives rely on this).
+
+    Raises:
+        ValueError: For empty or absolute paths or paths containing '..' segments
+    """
+    normalized = os.path.normpath(rel_path) if isinstance(rel_path, str) and rel_path else ""
+    if (
+        not normalized
+        or normalized == "."
+        or os.path.isabs(normalized)
+        or normalized == ".."
+        or normalized.startswith(".." + os.sep)
+    ):
+        raise ValueError(f"Refusing file path outside the project: {rel_path!r}")
+    return normalized
+
+
+def encode_file_content(content: Any) -> Tuple[bytes, str]:
+    """
+    Encode a project file value to bytes.
+
+    Returns:
+        (data, kind) where kind is "text" for strings and "json" for
+        dict/list values (e.g. package.json emitted as an object)
+    """
+    if isinstance(content, (dict, list)):
+        return json.dumps(content, indent=2).encode("utf-8"), "json"
+    if not isinstance(content, str):
+        content = str(content)
+    return content.encode("utf-8"), "text"
+
+
+def decode_file_content(data: bytes, kind: str) -> Any:
+    """Inverse of encode_file_content."""
+    text = data.decode("utf-8")
+    if kind == "json":
+        return json.loads(text)
+    return text
+
+
+class BlobStore:
+    """
+    Content-addressed store: sha256 digest -> immutable blob file.
+    """
+
+    def __init__(self, root_dir: str):
+        self.blobs_dir = os.path.join(root_dir, "blobs")
+        os.makedirs(self.blobs_dir, exist_ok=True)
+
+    def path_for(self, digest: str) -> str:
+        """Return the on-disk path for a digest."""
+        return os.path.join(self.blobs_dir, digest[:2], digest)
+
+    def exists(self, digest: str) -> bool:
+        """Check whether a blob is stored."""
+        return os.path.exists(self.path_for(digest))
+
+    def put(self, data: bytes) -> Tuple[str, bool]:
+        """
+        Store bytes and return their digest.
+
+        Returns:
+            (digest, written) - written is False when the blob already existed
+        """
+        digest = hash_bytes(data)
+        path = self.path_for(digest)
+        if os.path.exists(path):
+            return digest, False
+        atomic_write_bytes(path, data)
+        return digest, True
+
+    def get(self, digest: str) -> bytes:
+        """Read a blob fully into memory."""
+        with open(self.path_for(digest), "rb") as f:
+            return f.read()
+
+    def open(self, digest: str) -> BinaryIO:
+        """Open a blob for streaming reads."""
+        return open(self.path_for(digest), "rb")
+
+    def size(self, digest: str) -> int:
+        """Return the size of a blob in bytes."""
+        return os.path.getsize(self.path_for(digest))
+
+    # ------------------------------------------------------------------
+    # Project files <-> manifest entries
+    # ------------------------------------------------------------------
+
+    def put_files(self, files: Dict[str, Any]) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, int]]:
+        """
+        Store every file of a project and build the manifest file table.
+
+        Args:
+            files: project["files"] mapping path -> content
+
+        Returns:
+            (entries, stats) - entries maps path -> {"blob", "size", "kind"};
+            stats counts new and reused blobs and bytes written
+
+        Raises:
+            ValueError: If a path escapes the project (see normalize_file_path);
+                checked before any blob is written
+        """
+        entries: Dict[str, Dict[str, Any]] = {}
+        stats = {"files": 0, "new_blobs": 0, "reused_blobs": 0, "bytes_written": 0}
+
+        for rel_path in files:
+            normalize_file_path(rel_path)
+
+        for rel_path, content in files.items():
+            data, kind = encode_file_content(content)
+            digest, written = self.put(data)
+            entries[rel_path] = {"blob": digest, "size": len(data), "kind": kind}
+            stats["files"] += 1
+            if written:
+                stats["new_blobs"] += 1
+                stats["bytes_written"] += len(data)
+            else:
+                stats["reused_blobs"] += 1
+
+        return entries, stats
+
+    def get_files(self, entries: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+        """Rebuild project["files"] from a manifest file table."""
+        return {
+            rel_path: decode_file_content(self.get(entry["blob"]), entry.get("kind", "text"))
+            for rel_path, entry in entries.items()
+        }
@@ -0,0 +1,90 @@
+"""
+Project Cache - In-memory LRU of parsed project versions, bounded by bytes
+
+Keyed by (project_id, version). Versions are immutable once written, so a
+cached entry never goes stale; writes still invalidate every cached version
+of the project so memory is spent on what is current.
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+
+
+DEFAULT_CACHE_MAX_BYTES = int(os.getenv("PROJECT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+
+class ProjectCache:
+    """
+    Thread-safe LRU cache of parsed projects bounded by total size in bytes.
+
+    Cached project dicts are shared between callers and must be treated as
+    read-only.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[Tuple[str, int], Tuple[Dict[str, Any], int]] = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, project_id: str, version: int) -> Optional[Dict[str, Any]]:
+        """Return the cached record for a version and mark it recently used."""
+        key = (project_id, version)
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, project_id: str, version: int, record: Dict[str, Any], size_bytes: int) -> None:
+        """
+        Cache a record, evicting least recently used entries to stay in budget.
+
+        Records larger than the whole budget are not cached.
+        """
+        if size_bytes > self.max_bytes:
+            return
+        key = (project_id, version)
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (record, size_bytes)
+            self._bytes += size_bytes
+            while self._bytes > self.max_bytes and self._entries:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def invalidate(self, project_id: str) -> None:
+        """Drop every cached version of a project."""
+        with self._lock:
+            for key in [k for k in self._entries if k[0] == project_id]:
+                _, size_bytes = self._entries.pop(key)
+                self._bytes -= size_bytes
+
+    def clear(self) -> None:
+        """Drop all entries."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and current usage."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,381 @@
+"""
+Project Store - Per-project sharded storage keyed by project_id
+
+Layout (under PROJECT_STORE_DIR, default "project_store"):
+
+    blobs/<aa>/<sha256>          file contents, shared by all projects
+    projects/<shard>/<project_id>/
+        latest.json              index entry: latest version + timestamps
+        versions/v<N>.json       manifest: project metadata + path -> blob
+        workspace/...            latest version materialized on disk
+
+A version manifest references file blobs by content hash, so files that did
+not change between versions are stored once and cost nothing per version.
+
+<shard> is the first two hex characters of sha1(project_id), so no single
+directory grows unbounded. Every JSON write goes through a temp file in the
+same directory followed by os.replace, so readers never observe a partially
+written file and concurrent projects never touch each other's paths.
+
+Several server processes can share one store: saving a version holds a
+per-project file lock (projects/<shard>/<project_id>/.lock) while it
+re-reads latest.json from disk and allocates the next version, version
+manifests are created exclusively (never replaced), and the in-memory index
+is revalidated against latest.json with one stat per lookup.
+"""
+
+import os
+import re
+import json
+import time
+import copy
+import uuid
+import hashlib
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional, Tuple
+
+from .atomic import atomic_write_json, atomic_create_json, file_lock
+from .blob_store import BlobStore
+from .project_cache import ProjectCache, DEFAULT_CACHE_MAX_BYTES
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+DEFAULT_STORE_DIR = os.getenv("PROJECT_STORE_DIR", "project_store")
+
+_PROJECT_ID_RE = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,127}$")
+
+
+def validate_project_id(project_id: str) -> str:
+    """
+    Validate that a project_id is safe to use as a directory name.
+
+    Raises:
+        ValueError: If the id is empty, too long or contains path characters
+    """
+    if not project_id or not _PROJECT_ID_RE.match(project_id) or ".." in project_id:
+        raise ValueError(f"Invalid project_id: {project_id!r}")
+    return project_id
+
+
+def new_project_id() -> str:
+    """Allocate a project_id that is unique even for concurrent requests."""
+    return f"proj_{int(time.time())}_{uuid.uuid4().hex[:8]}"
+
+
+def _utc_now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def manifest_etag(project_meta: Dict[str, Any], file_entries: Dict[str, Dict[str, Any]]) -> str:
+    """
+    Content hash of a version: project metadata plus every file's blob hash.
+
+    Two versions with identical content share an etag, so clients polling a
+    project can revalidate without downloading it again.
+    """
+    canonical = json.dumps(
+        {
+            "project_meta": project_meta,
+            "files": {path: entry["blob"] for path, entry in file_entries.items()},
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _manifest_size(manifest: Dict[str, Any]) -> int:
+    """Approximate in-memory cost of a version: file bytes plus metadata."""
+    file_bytes = sum(entry.get("size", 0) for entry in manifest.get("files", {}).values())
+    return file_bytes + len(json.dumps(manifest.get("project_meta", {})))
+
+
+class ProjectStore:
+    """
+    Stores project versions per project_id with an in-memory index.
+
+    Lookups of the latest version are O(1): the project's latest.json pointer
+    is stat'ed at its known sharded path (no directory listing) and read only
+    if it changed since the index last saw it. Parsed versions are kept in a
+    byte-bounded LRU so repeated reads of hot projects skip disk and JSON
+    parsing entirely.
+    """
+
+    def __init__(self, root_dir: str = DEFAULT_STORE_DIR, cache_max_bytes: int = DEFAULT_CACHE_MAX_BYTES):
+        self.root_dir = root_dir
+        self.projects_dir = os.path.join(root_dir, "projects")
+        # project_id -> (pointer file signature, {"latest": int, "etag": str, "created_at": str, "updated_at": str})
+        self._index: Dict[str, Tuple[Tuple[int, int], Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+        self.blobs = BlobStore(root_dir)
+        self.cache = ProjectCache(max_bytes=cache_max_bytes)
+        os.makedirs(self.projects_dir, exist_ok=True)
+
+    # ------------------------------------------------------------------
+    # Paths
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def shard_for(project_id: str) -> str:
+        """Return the two-character shard directory for a project_id."""
+        return hashlib.sha1(project_id.encode("utf-8")).hexdigest()[:2]
+
+    def project_dir(self, project_id: str) -> str:
+        """Return the directory that holds all data for a project."""
+        validate_project_id(project_id)
+        return os.path.join(self.projects_dir, self.shard_for(project_id), project_id)
+
+    def _pointer_path(self, project_id: str) -> str:
+        return os.path.join(self.project_dir(project_id), "latest.json")
+
+    def _lock_path(self, project_id: str) -> str:
+        return os.path.join(self.project_dir(project_id), ".lock")
+
+    def _version_path(self, project_id: str, version: int) -> str:
+        return os.path.join(self.project_dir(project_id), "versions", f"v{version}.json")
+
+    def workspace_dir(self, project_id: str) -> str:
+        """Return the directory where the latest version is materialized."""
+        return os.path.join(self.project_dir(project_id), "workspace")
+
+    # ------------------------------------------------------------------
+    # Index
+    # ------------------------------------------------------------------
+
+    def _get_index_entry(self, project_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Index entry of a project, re-read when latest.json changed (another
+        process may have saved a version).
+        """
+        pointer_path = self._pointer_path(project_id)
+        try:
+            stat = os.stat(pointer_path)
+        except FileNotFoundError:
+            self._index.pop(project_id, None)
+            return None
+        # latest.json is always replaced by a new file, so the inode changes on every write
+        signature = (stat.st_ino, stat.st_mtime_ns)
+        cached = self._index.get(project_id)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+        with open(pointer_path, encoding="utf-8") as f:
+            entry = json.load(f)
+        self._index[project_id] = (signature, entry)
+        return entry
+
+    def latest_version(self, project_id: str) -> Optional[int]:
+        """Return the latest version number for a project, or None."""
+        entry = self._get_index_entry(project_id)
+        return entry["latest"] if entry else None
+
+    def get_etag(self, project_id: str, version: Optional[int] = None) -> Optional[str]:
+        """
+        Return the content etag of a version (the latest when version is None).
+
+        For the latest version this is answered from the in-memory index
+        after one stat of latest.json.
+        """
+        entry = self._get_index_entry(project_id)
+        if not entry:
+            return None
+        if (version is None or version == entry["latest"]) and entry.get("etag"):
+            return entry["etag"]
+        manifest = self.get_manifest(project_id, entry["latest"] if version is None else version)
+        if not manifest:
+            return None
+        return manifest.get("etag") or manifest_etag(manifest.get("project_meta", {}), manifest.get("files", {}))
+
+    def exists(self, project_id: str) -> bool:
+        """Check if a project has at least one stored version."""
+        return self._get_index_entry(project_id) is not None
+
+    # ------------------------------------------------------------------
+    # Read / write
+    # ------------------------------------------------------------------
+
+    def save_version(self, project_id: str, project: Dict[str, Any], source: str = "generate") -> Dict[str, Any]:
+        """
+        Store a new version of a project and advance the latest pointer.
+
+        Args:
+            project_id: Project ID (validated, used as directory name)
+            project: Inner project dict ({"name": ..., "files": {...}})
+            source: What produced this version (generate, modify, ...)
+
+        Returns:
+            Record with project_id, version, created_at and updated_at
+        """
+        validate_project_id(project_id)
+        now = _utc_now()
+
+        files = project.get("files") or {}
+        if not isinstance(files, dict):
+            raise ValueError("project.files must be a dict")
+        file_entries, blob_stats = self.blobs.put_files(files)
+        project_meta = {key: value for key, value in project.items() if key != "files"}
+
+        etag = manifest_etag(project_meta, file_entries)
+        with self._lock, file_lock(self._lock_path(project_id)):
+            # Under the file lock the pointer on disk is current for every process
+            entry = self._get_index_entry(project_id)
+            version = (entry["latest"] + 1) if entry else 1
+            while True:
+                manifest = {
+                    "project_id": project_id,
+                    "version": version,
+                    "source": source,
+                    "saved_at": now,
+                    "etag": etag,
+                    "project_meta": project_meta,
+                    "files": file_entries,
+                }
+                if atomic_create_json(self._version_path(project_id, version), manifest):
+                    break
+                # Taken by a writer that died before advancing the pointer (or had no lock)
+                version += 1
+
+            new_entry = {
+                "latest": version,
+                "etag": etag,
+                "created_at": entry["created_at"] if entry else now,
+                "updated_at": now,
+            }
+            atomic_write_json(self._pointer_path(project_id), new_entry)
+            self._get_index_entry(project_id)
+
+            # Invalidate on write, then seed the cache with the new version;
+            # a copy, so later changes to the caller's dict do not alter it
+            self.cache.invalidate(project_id)
+            self.cache.put(
+                project_id,
+                version,
+                {
+                    "project_id": project_id,
+                    "version": version,
+                    "source": source,
+                    "saved_at": now,
+                    "etag": etag,
+                    "project": copy.deepcopy(project),
+                },
+                _manifest_size(manifest),
+            )
+
+        logger.info(
+            "Saved %s v%s (%s): %s files, %s new blobs, %s reused, %s bytes written",
+            project_id,
+            version,
+            source,
+            blob_stats['files'],
+            blob_stats['new_blobs'],
+            blob_stats['reused_blobs'],
+            blob_stats['bytes_written'],
+        )
+        return {"project_id": project_id, "version": version, **new_entry, "blob_stats": blob_stats}
+
+    def get_manifest(self, project_id: str, version: int) -> Optional[Dict[str, Any]]:
+        """Load a version manifest (metadata + path -> blob table), or None."""
+        path = self._version_path(project_id, version)
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def get_version(self, project_id: str, version: int) -> Optional[Dict[str, Any]]:
+        """
+        Load a specific version of a project with its files, or None.
+
+        Served from the in-memory cache when possible; the returned record is
+        shared with the cache and must not be mutated.
+        """
+        cached = self.cache.get(project_id, version)
+        if cached is not None:
+            return cached
+
+        manifest = self.get_manifest(project_id, version)
+        if manifest is None:
+            return None
+        project = dict(manifest.get("project_meta", {}))
+        project["files"] = self.blobs.get_files(manifest.get("files", {}))
+        record = {
+            "project_id": project_id,
+            "version": version,
+            "source": manifest.get("source"),
+            "saved_at": manifest.get("saved_at"),
+            "etag": manifest.get("etag") or manifest_etag(manifest.get("project_meta", {}), manifest.get("files", {})),
+            "project": project,
+        }
+        self.cache.put(project_id, version, record, _manifest_size(manifest))
+        return record
+
+    def get(self, project_id: str, version: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        Load a version of a project (the latest when version is None).
+
+        Returns:
+            Dict with project_id, version, project, created_at and updated_at,
+            or None if the project or version is unknown
+        """
+        entry = self._get_index_entry(project_id)
+        if not entry:
+            return None
+        version = entry["latest"] if version is None else version
+        record = self.get_version(project_id, version)
+        if not record:
+            return None
+        return {
+            "project_id": project_id,
+            "version": version,
+            "project": record["project"],
+            "etag": record.get("etag"),
+            "created_at": entry["created_at"],
+            "updated_at": record.get("saved_at") or entry["updated_at"],
+        }
+
+    def get_manifest_record(self, project_id: str, version: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """
+        Like get, but with the version manifest under "manifest" instead of
+        the project: reads one manifest file and no blobs.
+        """
+        entry = self._get_index_entry(project_id)
+        if not entry:
+            return None
+        version = entry["latest"] if version is None else version
+        manifest = self.get_manifest(project_id, version)
+        if manifest is None:
+            return None
+        return {
+            "project_id": project_id,
+            "version": version,
+            "manifest": manifest,
+            "etag": manifest.get("etag") or manifest_etag(manifest.get("project_meta", {}), manifest.get("files", {})),
+            "created_at": entry["created_at"],
+            "updated_at": manifest.get("saved_at") or entry["updated_at"],
+        }
+
+    def get_latest(self, project_id: str) -> Optional[Dict[str, Any]]:
+        """Load the latest version of a project (see get)."""
+        return self.get(project_id)
+
+    def resolve_manifest(self, project_id: str, version: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        """Load the manifest of a version (the latest when version is None)."""
+        if version is None:
+            version = self.latest_version(project_id)
+            if version is None:
+                return None
+        return self.get_manifest(project_id, version)
+
+
+# Global project store instance
+_project_store: Optional[ProjectStore] = None
+
+
+def get_project_store() -> ProjectStore:
+    """Get or create the global project store"""
+    global _project_store
+    if _project_store is None:
+        _project_store = ProjectStore()
+    return _project_store
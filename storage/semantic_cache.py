@@ -0,0 +1,324 @@
+"""
+Semantic Project Cache - Reuse projects generated for near-duplicate requests
+
+Requests are embedded locally (no network) as hashed TF-IDF vectors over:
+
+- word unigrams/bigrams and character 3-5-grams of the normalized user_query
+- "question=answer" tokens from questionnaire_answers and wizard_inputs
+
+The index is an inverted index over previously generated projects, filtered
+by page_type_key (different page types never match). A lookup returns the
+best cosine match with its score; callers compare it to two thresholds:
+
+- score >= SEMANTIC_CACHE_HIT_THRESHOLD: return the stored project as-is
+- score >= SEMANTIC_CACHE_SEED_THRESHOLD: seed a modification from it
+
+Entries are persisted as request text (not vectors) in
+<PROJECT_STORE_DIR>/semantic_index.json and re-embedded on load.
+"""
+
+import os
+import re
+import json
+import math
+import time
+import zlib
+import threading
+from collections import Counter
+from typing import Dict, Any, List, Optional, NamedTuple
+
+from .atomic import atomic_write_json
+from .project_store import DEFAULT_STORE_DIR
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+SEMANTIC_CACHE_MODE = os.getenv("SEMANTIC_CACHE_MODE", "off").lower()  # off | hit | seed
+SEMANTIC_CACHE_HIT_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_HIT_THRESHOLD", "0.9"))
+SEMANTIC_CACHE_SEED_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_SEED_THRESHOLD", "0.7"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "5000"))
+
+HASH_BUCKETS = 1 << 20
+CHAR_NGRAMS = (3, 4, 5)
+# Feature group weights: the query dominates, answers refine
+QUERY_WORD_WEIGHT = 1.0
+QUERY_CHAR_WEIGHT = 0.5
+ANSWER_WEIGHT = 0.7
+# Rebuild IDF weights when the corpus has grown by this fraction
+IDF_REBUILD_GROWTH = 0.1
+
+STOPWORDS = frozenset(
+    "a an the and or for of to in on with my our your me i we us please build create make "
+    "need want would like can you site website webpage page app application".split()
+)
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, strip punctuation and collapse whitespace."""
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", (text or "").lower()).split())
+
+
+def _bucket(feature: str) -> int:
+    # crc32 is stable across processes (hash() is salted per process)
+    return zlib.crc32(feature.encode("utf-8")) % HASH_BUCKETS
+
+
+def _answer_tokens(answers: Optional[Dict[str, Any]]) -> List[str]:
+    tokens = []
+    for key, value in sorted((answers or {}).items()):
+        values = value if isinstance(value, (list, tuple)) else [value]
+        for item in values:
+            item = normalize_text(str(item))
+            if item:
+                tokens.append(f"{normalize_text(str(key))}={item}")
+    return tokens
+
+
+def embed_request(
+    user_query: str,
+    questionnaire_answers: Optional[Dict[str, Any]] = None,
+    wizard_inputs: Optional[Dict[str, Any]] = None,
+) -> Dict[int, float]:
+    """Sparse term-frequency vector {bucket: weight} (before IDF) for a request."""
+    words = [w for w in normalize_text(user_query).split() if w not in STOPWORDS]
+    counts: Counter = Counter()
+    for word in words:
+        counts[("w", word)] += QUERY_WORD_WEIGHT
+        padded = f" {word} "
+        for n in CHAR_NGRAMS:
+            for i in range(len(padded) - n + 1):
+                counts[("c", padded[i:i + n])] += QUERY_CHAR_WEIGHT
+    for first, second in zip(words, words[1:]):
+        counts[("b", first + " " + second)] += QUERY_WORD_WEIGHT
+    for token in _answer_tokens(questionnaire_answers) + _answer_tokens(wizard_inputs):
+        counts[("a", token)] += ANSWER_WEIGHT
+
+    vector: Dict[int, float] = {}
+    for (kind, feature), weight in counts.items():
+        bucket = _bucket(kind + ":" + feature)
+        vector[bucket] = vector.get(bucket, 0.0) + weight
+    # Sublinear term frequency
+    return {bucket: 1.0 + math.log(weight) if weight >= 1.0 else weight for bucket, weight in vector.items()}
+
+
+class CacheMatch(NamedTuple):
+    """Best match for a request."""
+    project_id: str
+    version: int
+    score: float
+    user_query: str
+
+    @property
+    def kind(self) -> Optional[str]:
+        """'hit', 'seed' or None, by the configured thresholds."""
+        if self.score >= SEMANTIC_CACHE_HIT_THRESHOLD:
+            return "hit"
+        if self.score >= SEMANTIC_CACHE_SEED_THRESHOLD:
+            return "seed"
+        return None
+
+
+class SemanticProjectCache:
+    """
+    Thread-safe vector index over generated projects.
+
+    IDF weights are a snapshot rebuilt when the corpus grows by
+    IDF_REBUILD_GROWTH, so lookups stay a sparse dot product over the
+    inverted index instead of re-weighting every document.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._entries: Dict[int, Dict[str, Any]] = {}
+        self._tf: Dict[int, Dict[int, float]] = {}
+        self._df: Counter = Counter()
+        self._idf: Dict[int, float] = {}
+        self._idf_docs = 0
+        self._norms: Dict[int, float] = {}
+        # page_type -> bucket -> {entry_id: weighted tf}
+        self._postings: Dict[str, Dict[int, Dict[int, float]]] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.seeds = 0
+        self.misses = 0
+        if path and os.path.exists(path):
+            self._load()
+
+    # ---- IDF ----
+
+    def _idf_for(self, bucket: int) -> float:
+        idf = self._idf.get(bucket)
+        if idf is None:
+            # Unseen at the last rebuild: weight as the rarest feature
+            idf = math.log((self._idf_docs + 1) / 1) + 1.0
+        return idf
+
+    def _rebuild(self):
+        n = len(self._entries)
+        self._idf = {bucket: math.log((n + 1) / (df + 1)) + 1.0 for bucket, df in self._df.items()}
+        self._idf_docs = n
+        self._postings = {}
+        self._norms = {}
+        for entry_id in self._entries:
+            self._index(entry_id)
+
+    def _maybe_rebuild(self):
+        n = len(self._entries)
+        if n and (self._idf_docs == 0 or n > self._idf_docs * (1 + IDF_REBUILD_GROWTH)):
+            self._rebuild()
+
+    def _index(self, entry_id: int):
+        entry = self._entries[entry_id]
+        weighted = {bucket: tf * self._idf_for(bucket) for bucket, tf in self._tf[entry_id].items()}
+        self._norms[entry_id] = math.sqrt(sum(w * w for w in weighted.values())) or 1.0
+        postings = self._postings.setdefault(entry["page_type"] or "", {})
+        for bucket, weight in weighted.items():
+            postings.setdefault(bucket, {})[entry_id] = weight
+
+    def _unindex(self, entry_id: int):
+        entry = self._entries.pop(entry_id)
+        postings = self._postings.get(entry["page_type"] or "", {})
+        for bucket in self._tf[entry_id]:
+            self._df[bucket] -= 1
+            if self._df[bucket] <= 0:
+                del self._df[bucket]
+            bucket_postings = postings.get(bucket)
+            if bucket_postings is not None:
+                bucket_postings.pop(entry_id, None)
+                if not bucket_postings:
+                    del postings[bucket]
+        del self._tf[entry_id]
+        self._norms.pop(entry_id, None)
+
+    # ---- public API ----
+
+    def lookup(
+        self,
+        user_query: str,
+        page_type_key: Optional[str],
+        questionnaire_answers: Optional[Dict[str, Any]] = None,
+        wizard_inputs: Optional[Dict[str, Any]] = None,
+    ) -> Optional[CacheMatch]:
+        """Best match among projects of the same page type, or None if the index has none."""
+        tf = embed_request(user_query, questionnaire_answers, wizard_inputs)
+        with self._lock:
+            postings = self._postings.get(page_type_key or "")
+            if not postings:
+                self.misses += 1
+                return None
+            query = {bucket: weight * self._idf_for(bucket) for bucket, weight in tf.items()}
+            query_norm = math.sqrt(sum(w * w for w in query.values())) or 1.0
+            scores: Dict[int, float] = {}
+            for bucket, weight in query.items():
+                for entry_id, doc_weight in postings.get(bucket, {}).items():
+                    scores[entry_id] = scores.get(entry_id, 0.0) + weight * doc_weight
+            if not scores:
+                self.misses += 1
+                return None
+            best_id = max(scores, key=scores.get)
+            entry = self._entries[best_id]
+            match = CacheMatch(
+                entry["project_id"],
+                entry["version"],
+                round(scores[best_id] / (query_norm * self._norms[best_id]), 4),
+                entry["user_query"],
+            )
+            kind = match.kind
+            if kind == "hit":
+                self.hits += 1
+            elif kind == "seed":
+                self.seeds += 1
+            else:
+                self.misses += 1
+            return match
+
+    def add(
+        self,
+        project_id: str,
+        version: int,
+        user_query: str,
+        page_type_key: Optional[str],
+        questionnaire_answers: Optional[Dict[str, Any]] = None,
+        wizard_inputs: Optional[Dict[str, Any]] = None,
+        persist: bool = True,
+    ) -> None:
+        """Index a generated project version (replacing older entries of the same project)."""
+        entry = {
+            "project_id": project_id,
+            "version": version,
+            "user_query": user_query,
+            "page_type": page_type_key,
+            "questionnaire_answers": questionnaire_answers or {},
+            "wizard_inputs": wizard_inputs or {},
+            "created_at": time.time(),
+        }
+        with self._lock:
+            self._add_locked(entry)
+            if persist:
+                self._save()
+
+    def _add_locked(self, entry: Dict[str, Any]):
+        for entry_id in [eid for eid, e in self._entries.items() if e["project_id"] == entry["project_id"]]:
+            self._unindex(entry_id)
+        while len(self._entries) >= self.max_entries:
+            self._unindex(min(self._entries, key=lambda eid: self._entries[eid]["created_at"]))
+
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = entry
+        self._tf[entry_id] = embed_request(entry["user_query"], entry["questionnaire_answers"], entry["wizard_inputs"])
+        self._df.update(self._tf[entry_id].keys())
+        self._index(entry_id)
+        self._maybe_rebuild()
+
+    def remove(self, project_id: str) -> None:
+        """Drop every entry of a project (e.g. when it is deleted)."""
+        with self._lock:
+            for entry_id in [eid for eid, e in self._entries.items() if e["project_id"] == project_id]:
+                self._unindex(entry_id)
+            self._save()
+
+    def _save(self):
+        if self.path:
+            atomic_write_json(self.path, {"entries": list(self._entries.values())})
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                entries = json.load(f).get("entries", [])
+        except (OSError, ValueError) as e:
+            logger.warning("Could not load index %s: %s", self.path, e)
+            return
+        for entry in entries:
+            self._add_locked(entry)
+        self._rebuild()
+        logger.info("Loaded %s entries from %s", len(self._entries), self.path)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "mode": SEMANTIC_CACHE_MODE,
+                "entries": len(self._entries),
+                "hit_threshold": SEMANTIC_CACHE_HIT_THRESHOLD,
+                "seed_threshold": SEMANTIC_CACHE_SEED_THRESHOLD,
+                "hits": self.hits,
+                "seeds": self.seeds,
+                "misses": self.misses,
+            }
+
+
+_semantic_cache: Optional[SemanticProjectCache] = None
+_semantic_cache_lock = threading.Lock()
+
+
+def get_semantic_cache() -> SemanticProjectCache:
+    """Get or create the global semantic project cache."""
+    global _semantic_cache
+    if _semantic_cache is None:
+        with _semantic_cache_lock:
+            if _semantic_cache is None:
+                _semantic_cache = SemanticProjectCache(os.path.join(DEFAULT_STORE_DIR, "semantic_index.json"))
+    return _semantic_cache
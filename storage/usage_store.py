@@ -0,0 +1,346 @@
+"""
+Usage Store - Token usage and cost accounting
+
+Every provider response's usage (prompt, completion, cached and cache-write
+input tokens) is recorded with its provider, model, operation and the
+project_id / conversation_id it was made for, priced from MODEL_PRICING, and:
+
+- appended to <PROJECT_STORE_DIR>/usage.jsonl; past USAGE_LOG_MAX_BYTES the
+  file is rotated to usage.jsonl.1 (replacing the previous one), and only
+  the newest USAGE_MAX_RECORDS lines are read back on startup
+- added to the totals of every enclosing usage_scope (per-request totals)
+- counted in the webbuilder_tokens_total / webbuilder_cost_usd_total metrics
+
+Attribution uses context variables, so it follows the call through
+asyncio.to_thread and tasks: routes open a usage_scope for the project and
+conversation, and models.unified_client wraps each call in usage_operation.
+"""
+
+import os
+import json
+import time
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Sequence
+
+from router.router_config import get_model_pricing
+from models.prompt_cache import CACHED_INPUT_DISCOUNT, CACHE_WRITE_PREMIUM
+from utils.metrics import REGISTRY
+from utils.tracing import current_span
+from .project_store import DEFAULT_STORE_DIR
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+
+USAGE_ACCOUNTING = os.getenv("USAGE_ACCOUNTING", "1").lower() not in ("0", "false", "no", "off")
+# Records kept in memory for queries (and read back from the log on startup)
+USAGE_MAX_RECORDS = int(os.getenv("USAGE_MAX_RECORDS", "100000"))
+# Size at which usage.jsonl is rotated to usage.jsonl.1
+USAGE_LOG_MAX_BYTES = int(os.getenv("USAGE_LOG_MAX_BYTES", str(64 * 1024 * 1024)))
+
+GROUP_FIELDS = ("project_id", "conversation_id", "provider", "model", "operation")
+
+TOKENS = REGISTRY.counter(
+    "webbuilder_tokens_total", "Model tokens by model and kind (prompt, completion, cached, cache_write).", ("model", "kind")
+)
+COST = REGISTRY.counter(
+    "webbuilder_cost_usd_total", "Estimated model cost in USD by model.", ("model",)
+)
+
+_scope: contextvars.ContextVar = contextvars.ContextVar("usage_scope", default=None)
+_operation: contextvars.ContextVar = contextvars.ContextVar("usage_operation", default=None)
+_capture: contextvars.ContextVar = contextvars.ContextVar("usage_capture", default=None)
+
+
+def estimate_cost(
+    provider: str, model: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0, cache_write_tokens: int = 0
+) -> float:
+    """
+    USD cost of one call at list price: cached input tokens get the
+    provider's discount, cache-write input tokens its write premium.
+    """
+    pricing = get_model_pricing(model)
+    cached_tokens = min(cached_tokens, prompt_tokens)
+    cache_write_tokens = min(cache_write_tokens, prompt_tokens - cached_tokens)
+    input_tokens = (
+        prompt_tokens
+        - cached_tokens * CACHED_INPUT_DISCOUNT.get(provider, 0.0)
+        + cache_write_tokens * CACHE_WRITE_PREMIUM.get(provider, 0.0)
+    )
+    return (input_tokens * pricing["input"] + completion_tokens * pricing["output"]) / 1_000_000
+
+
+def _empty_totals() -> Dict[str, Any]:
+    return {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0, "cache_write_tokens": 0, "cost_usd": 0.0}
+
+
+def _add(totals: Dict[str, Any], record: Dict[str, Any]):
+    totals["calls"] += 1
+    totals["prompt_tokens"] += record["prompt_tokens"]
+    totals["completion_tokens"] += record["completion_tokens"]
+    totals["cached_tokens"] += record["cached_tokens"]
+    totals["cache_write_tokens"] += record.get("cache_write_tokens", 0)
+    totals["cost_usd"] += record["cost_usd"]
+
+
+def _tail_lines(path: str, count: int, block_size: int = 1 << 16) -> List[bytes]:
+    """Last count lines of a file, read backwards in blocks."""
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        data = b""
+        while position > 0 and data.count(b"\n") <= count:
+            size = min(block_size, position)
+            position -= size
+            f.seek(position)
+            data = f.read(size) + data
+    lines = data.splitlines()
+    if position > 0:
+        # The first line read may start mid-record
+        lines = lines[1:]
+    return lines[-count:] if count > 0 else []
+
+
+def _rounded(totals: Dict[str, Any]) -> Dict[str, Any]:
+    return {**totals, "cost_usd": round(totals["cost_usd"], 6)}
+
+
+class RequestUsage:
+    """Usage totals of one request (and the requests it makes internally)."""
+
+    def __init__(self, project_id: Optional[str], conversation_id: Optional[str], parent: Optional["RequestUsage"] = None):
+        self.project_id = project_id
+        self.conversation_id = conversation_id
+        self.parent = parent
+        self._totals = _empty_totals()
+        self._by_operation: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def attribute(self, project_id: Optional[str], conversation_id: Optional[str]):
+        """Set the project/conversation once the route has resolved them."""
+        self.project_id = project_id or self.project_id
+        self.conversation_id = conversation_id or self.conversation_id
+
+    def add(self, record: Dict[str, Any]):
+        scope = self
+        while scope is not None:
+            with scope._lock:
+                _add(scope._totals, record)
+                _add(scope._by_operation.setdefault(record["operation"], _empty_totals()), record)
+            scope = scope.parent
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **_rounded(self._totals),
+                "by_operation": {operation: _rounded(totals) for operation, totals in self._by_operation.items()},
+            }
+
+
+@contextmanager
+def usage_scope(project_id: Optional[str] = None, conversation_id: Optional[str] = None):
+    """Collect the usage of calls made inside the block (nested scopes also count toward outer ones)."""
+    usage = RequestUsage(project_id, conversation_id, parent=_scope.get())
+    token = _scope.set(usage)
+    try:
+        yield usage
+    finally:
+        _scope.reset(token)
+
+
+def attribute_usage(project_id: Optional[str], conversation_id: Optional[str]) -> None:
+    """Set the project/conversation of the current usage scope (if any)."""
+    scope = _scope.get()
+    if scope is not None:
+        scope.attribute(project_id, conversation_id)
+
+
+@contextmanager
+def usage_operation(operation: str):
+    """Attribute calls made inside the block to a pipeline operation."""
+    token = _operation.set(operation)
+    try:
+        yield
+    finally:
+        _operation.reset(token)
+
+
+@contextmanager
+def capture_usage():
+    """Collect the records of calls made inside the block (per-call usage, see models.cassette)."""
+    records = []
+    token = _capture.set(records)
+    try:
+        yield records
+    finally:
+        _capture.reset(token)
+
+
+class UsageStore:
+    """
+    Append-only usage log with in-memory aggregation.
+
+    Records are one JSON line each; the newest max_records are kept in
+    memory for queries. The log is rotated once it reaches max_bytes (one
+    rotated file is kept), and startup reads only the newest max_records
+    lines of the log and the rotated file.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_records: int = USAGE_MAX_RECORDS, max_bytes: int = USAGE_LOG_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._records: deque = deque(maxlen=max_records)
+        self._lock = threading.Lock()
+        if path:
+            self._load()
+
+    @property
+    def rotated_path(self) -> str:
+        return self.path + ".1"
+
+    def _load(self):
+        lines: List[bytes] = []
+        try:
+            for path in (self.path, self.rotated_path):
+                wanted = self._records.maxlen - len(lines)
+                if wanted <= 0 or not os.path.exists(path):
+                    continue
+                lines = _tail_lines(path, wanted) + lines
+        except OSError as e:
+            logger.warning("Could not load usage log %s: %s", self.path, e)
+            return
+        for line in lines:
+            try:
+                self._records.append(json.loads(line))
+            except ValueError:
+                continue
+        if self._records:
+            logger.info("Loaded %s usage records from %s", len(self._records), self.path)
+
+    def add(self, record: Dict[str, Any]) -> None:
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            self._records.append(record)
+            if self.path:
+                try:
+                    os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                    with open(self.path, "a", encoding="utf-8") as f:
+                        f.write(line)
+                        size = f.tell()
+                    if size >= self.max_bytes:
+                        os.replace(self.path, self.rotated_path)
+                        logger.info("Rotated usage log %s (%s bytes)", self.path, size)
+                except OSError as e:
+                    logger.warning("Could not append to %s: %s", self.path, e)
+
+    def query(
+        self,
+        project_id: Optional[str] = None,
+        conversation_id: Optional[str] = None,
+        model: Optional[str] = None,
+        operation: Optional[str] = None,
+        since: Optional[float] = None,
+        group_by: Sequence[str] = ("operation",),
+    ) -> Dict[str, Any]:
+        """Totals of matching records, grouped by the given fields (see GROUP_FIELDS)."""
+        group_by = [field for field in group_by if field in GROUP_FIELDS]
+        filters = {"project_id": project_id, "conversation_id": conversation_id, "model": model, "operation": operation}
+        totals = _empty_totals()
+        groups: Dict[tuple, Dict[str, Any]] = {}
+        with self._lock:
+            records = list(self._records)
+        for record in records:
+            if since is not None and record["timestamp"] < since:
+                continue
+            if any(value is not None and record.get(field) != value for field, value in filters.items()):
+                continue
+            _add(totals, record)
+            if group_by:
+                _add(groups.setdefault(tuple(record.get(field) for field in group_by), _empty_totals()), record)
+        ranked = sorted(groups.items(), key=lambda item: item[1]["cost_usd"], reverse=True)
+        return {
+            "filters": {field: value for field, value in filters.items() if value is not None},
+            "totals": _rounded(totals),
+            "group_by": group_by,
+            "groups": [{**dict(zip(group_by, key)), **_rounded(group)} for key, group in ranked],
+        }
+
+
+_usage_store: Optional[UsageStore] = None
+_usage_store_lock = threading.Lock()
+
+
+def get_usage_store() -> UsageStore:
+    """Get or create the global usage store."""
+    global _usage_store
+    if _usage_store is None:
+        with _usage_store_lock:
+            if _usage_store is None:
+                _usage_store = UsageStore(os.path.join(DEFAULT_STORE_DIR, "usage.jsonl"))
+    return _usage_store
+
+
+def record_usage(
+    provider: str,
+    model: str,
+    prompt_tokens: int,
+    completion_tokens: int,
+    cached_tokens: int = 0,
+    estimated: bool = False,
+    cache_write_tokens: int = 0,
+) -> Optional[Dict[str, Any]]:
+    """
+    Record the usage of one provider response.
+
+    Args:
+        provider: gemini, anthropic or openai
+        model: Model that served the response
+        prompt_tokens: Input tokens, including cached ones
+        completion_tokens: Output tokens
+        cached_tokens: Input tokens served from the provider's prompt cache
+        cache_write_tokens: Input tokens written to the provider's prompt cache
+            (billed at a premium by Anthropic)
+        estimated: True when the provider reported no usage and tokens were counted locally
+    """
+    if not USAGE_ACCOUNTING:
+        return None
+    scope = _scope.get()
+    prompt_tokens, completion_tokens, cached_tokens = int(prompt_tokens or 0), int(completion_tokens or 0), int(cached_tokens or 0)
+    cache_write_tokens = int(cache_write_tokens or 0)
+    record = {
+        "timestamp": time.time(),
+        "provider": provider,
+        "model": model,
+        "operation": _operation.get() or "other",
+        "project_id": scope.project_id if scope else None,
+        "conversation_id": scope.conversation_id if scope else None,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "cached_tokens": cached_tokens,
+        "cache_write_tokens": cache_write_tokens,
+        "cost_usd": estimate_cost(provider, model, prompt_tokens, completion_tokens, cached_tokens, cache_write_tokens),
+        "estimated": estimated,
+    }
+    if scope is not None:
+        scope.add(record)
+    captured = _capture.get()
+    if captured is not None:
+        captured.append(record)
+    current_span().set_attributes({
+        "usage.prompt_tokens": prompt_tokens,
+        "usage.completion_tokens": completion_tokens,
+        "usage.cached_tokens": cached_tokens,
+        "usage.cache_write_tokens": cache_write_tokens,
+        "usage.cost_usd": round(record["cost_usd"], 6),
+    })
+    get_usage_store().add(record)
+    TOKENS.labels(model, "prompt").inc(prompt_tokens)
+    TOKENS.labels(model, "completion").inc(completion_tokens)
+    TOKENS.labels(model, "cached").inc(cached_tokens)
+    if cache_write_tokens:
+        TOKENS.labels(model, "cache_write").inc(cache_write_tokens)
+    COST.labels(model).inc(record["cost_usd"])
+    return record
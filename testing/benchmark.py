@@ -0,0 +1,378 @@
+"""
+Benchmark suite - the service's own overhead, measured offline
+
+Runs the FastAPI app in-process against the fake provider
+(models.fake_client) and reports throughput and latency percentiles for:
+
+- generate: POST /api/v1/project/generate
+- modify: POST /api/v1/project/modify (each client modifies its own project)
+- stream: POST /api/stream, cycling through chat, intent, page type and
+  query analysis requests
+- sse: many /api/v1/stream subscribers receiving events emitted
+  through the normal EventEmitter -> event logger -> stream manager path;
+  reports the delay from emit to each subscriber
+- import: cold start in fresh interpreters: time to import api.main and to
+  run the app's startup (lifespan), against --import-budget-ms; also fails
+  if a module that should load on first use (provider SDKs, dotenv,
+  Streamlit) was imported
+
+Requests go straight into the ASGI app (no sockets) on one event loop, as
+in a single worker. With the default "--latency none" the fake provider
+answers instantly, so every millisecond reported is the service's own;
+"--latency realistic" adds the fake provider's time-to-first-token and
+output rate (FAKE_LLM_* settings, see models/fake_client.py) to show how
+model time and concurrency interact.
+
+With --cassette, model calls are answered from a cassette recorded in
+production (models/cassette.py) instead of synthesized: prompts that were
+not recorded get the next recorded response of the same output schema, and
+"--latency realistic" replays the recorded timing.
+
+Projects, usage and event logs go to a temporary directory.
+
+Run from the repository root:
+    python -m testing.benchmark
+    python -m testing.benchmark --scenario generate --requests 200 --concurrency 8
+    python -m testing.benchmark --latency realistic --corruption fence=0.2
+    python -m testing.benchmark --scenario sse --subscribers 500 --events 200 --json
+    python -m testing.benchmark --scenario generate --cassette project_store/cassette.jsonl.gz
+    python -m testing.benchmark --scenario import --import-budget-ms 600
+"""
+
+import os
+import sys
+import json
+import time
+import subprocess
+import asyncio
+import argparse
+import itertools
+import tempfile
+import statistics
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from urllib.parse import urlencode
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+QUERY = "Build a landing page for my coffee roastery with a menu, our story, opening hours and a contact form"
+# Loaded on first use, never by importing or starting the API
+DEFERRED_MODULES = ("google.genai", "anthropic", "openai", "dotenv", "streamlit")
+IMPORT_PROBE = f"""
+import sys, json, time, asyncio
+start = time.perf_counter()
+import api.main
+imported = time.perf_counter()
+
+async def startup():
+    async with api.main.lifespan(api.main.app):
+        return time.perf_counter()
+
+started = asyncio.run(startup())
+print(json.dumps({{
+    "import_s": imported - start,
+    "startup_s": started - imported,
+    "deferred_loaded": [name for name in {DEFERRED_MODULES!r} if name in sys.modules],
+}}))
+"""
+STREAM_BODIES = (
+    {"user_text": "hello there"},
+    {"user_text": "What is the difference between CSS grid and flexbox?"},
+    {"action": "classify_intent", "user_text": "Create an online store for handmade jewelry"},
+    {"action": "classify_page_type", "user_text": "A CRM to track leads and our sales pipeline"},
+    {"action": "analyze_query", "user_text": "A portfolio site"},
+)
+
+
+def percentile(samples: List[float], q: float) -> float:
+    """Nearest-rank percentile of sorted samples (0 if empty)."""
+    if not samples:
+        return 0.0
+    return samples[min(len(samples) - 1, int(round(q * (len(samples) - 1))))]
+
+
+def summarize(name: str, latencies: List[float], errors: int, seconds: float, unit: str = "requests") -> Dict[str, Any]:
+    """Throughput and latency percentiles (ms) of one scenario."""
+    latencies = sorted(latencies)
+    return {
+        "scenario": name,
+        unit: len(latencies),
+        "errors": errors,
+        "seconds": round(seconds, 3),
+        "throughput_per_s": round(len(latencies) / seconds, 2) if seconds else 0.0,
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 2) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 0.5) * 1000, 2),
+        "p90_ms": round(percentile(latencies, 0.9) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+    }
+
+
+async def run_closed_loop(name: str, call: Callable[[int], Awaitable[bool]], total: int, concurrency: int) -> Dict[str, Any]:
+    """total calls from concurrency clients, each sending its next request when the last one returns."""
+    counter = itertools.count()
+    latencies: List[float] = []
+    errors = 0
+
+    async def client():
+        nonlocal errors
+        while True:
+            index = next(counter)
+            if index >= total:
+                return
+            start = time.perf_counter()
+            try:
+                ok = await call(index)
+            except Exception:
+                ok = False
+            latencies.append(time.perf_counter() - start)
+            if not ok:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return summarize(name, latencies, errors, time.perf_counter() - start)
+
+
+async def bench_generate(client, args) -> Dict[str, Any]:
+    async def call(index: int) -> bool:
+        response = await client.post("/api/v1/project/generate", json={"user_query": f"{QUERY} #{index}", "model_family": "fake"})
+        return response.status_code == 200
+    return await run_closed_loop("generate", call, args.requests, args.concurrency)
+
+
+async def bench_modify(client, args) -> Dict[str, Any]:
+    # One base project per client so concurrent modifications do not queue on one project
+    project_ids = []
+    for index in range(args.concurrency):
+        response = await client.post("/api/v1/project/generate", json={"user_query": f"{QUERY} base {index}", "model_family": "fake"})
+        project_ids.append(response.json()["project_id"])
+
+    async def call(index: int) -> bool:
+        response = await client.post("/api/v1/project/modify", json={
+            "instruction": f"Change the hero headline to variant {index}",
+            "project_id": project_ids[index % len(project_ids)],
+            "model_family": "fake",
+        })
+        return response.status_code == 200
+    return await run_closed_loop("modify", call, args.requests, args.concurrency)
+
+
+async def bench_stream(client, args) -> Dict[str, Any]:
+    async def call(index: int) -> bool:
+        body = {**STREAM_BODIES[index % len(STREAM_BODIES)], "model_family": "fake"}
+        response = await client.post("/api/stream", json=body)
+        return response.status_code == 200 and response.json().get("success", False)
+    return await run_closed_loop("stream", call, args.requests * len(STREAM_BODIES), args.concurrency)
+
+
+async def sse_subscriber(app, query: Dict[str, str], delays: List[float], ready: asyncio.Event, stop: asyncio.Event) -> None:
+    """One SSE client driven directly through ASGI; records emit-to-delivery delays."""
+    path = "/api/v1/stream"
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": urlencode(query).encode(),
+        "headers": [(b"host", b"benchmark"), (b"accept", b"text/event-stream")],
+        "client": ("127.0.0.1", 0),
+        "server": ("benchmark", 80),
+    }
+    buffer = ""
+
+    async def receive():
+        await stop.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal buffer
+        if message["type"] == "http.response.start":
+            if message["status"] != 200:
+                raise RuntimeError(f"SSE subscribe failed with status {message['status']}")
+            ready.set()
+            return
+        now = time.perf_counter()
+        buffer += message.get("body", b"").decode("utf-8")
+        while "\n\n" in buffer:
+            frame, buffer = buffer.split("\n\n", 1)
+            if frame.startswith("data: {"):
+                sent = json.loads(frame[len("data: "):]).get("payload", {}).get("bench_sent")
+                if sent is not None:
+                    delays.append(now - sent)
+
+    await app(scope, receive, send)
+
+
+async def bench_sse(app, args) -> Dict[str, Any]:
+    from events.event_emitter import EventEmitter
+    from events.event_types import EventEnvelope
+    from utils.event_logger import get_event_logger
+
+    project_id = f"bench_sse_{int(time.time())}"
+    delays: List[float] = []
+    stop = asyncio.Event()
+    readies = [asyncio.Event() for _ in range(args.subscribers)]
+    subscribers = [
+        asyncio.create_task(sse_subscriber(app, {"project_id": project_id}, delays, ready, stop))
+        for ready in readies
+    ]
+    # A subscriber that fails to connect raises in its task and never becomes ready
+    await asyncio.wait_for(asyncio.gather(*(ready.wait() for ready in readies)), timeout=30.0)
+
+    event_logger = get_event_logger()
+    emitter = EventEmitter(project_id=project_id, conversation_id="bench", callback=lambda event: event_logger.log_event(event))
+    expected = args.events * args.subscribers
+    interval = 1.0 / args.event_rate if args.event_rate > 0 else 0.0
+    start = time.perf_counter()
+    for index in range(args.events):
+        emitter.emit(EventEnvelope("progress.update", {"step_id": f"bench-{index}", "status": "running", "bench_sent": time.perf_counter()}, project_id=project_id, conversation_id="bench"))
+        await asyncio.sleep(interval)
+    # Wait (bounded) for the last deliveries
+    deadline = time.perf_counter() + 10.0
+    while len(delays) < expected and time.perf_counter() < deadline:
+        await asyncio.sleep(0.01)
+    seconds = time.perf_counter() - start
+    stop.set()
+    await asyncio.gather(*subscribers, return_exceptions=True)
+
+    result = summarize("sse", delays, expected - len(delays), seconds, unit="deliveries")
+    result["subscribers"] = args.subscribers
+    result["events"] = args.events
+    return result
+
+
+def bench_import(args) -> Dict[str, Any]:
+    """Cold import and startup of the app in --import-runs fresh interpreters."""
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, (ROOT, os.getenv("PYTHONPATH"))))}
+    imports: List[float] = []
+    startups: List[float] = []
+    loaded = set()
+    errors = 0
+    start = time.perf_counter()
+    for _ in range(args.import_runs):
+        completed = subprocess.run([sys.executable, "-c", IMPORT_PROBE], capture_output=True, text=True, env=env)
+        if completed.returncode != 0:
+            errors += 1
+            continue
+        probe = json.loads(completed.stdout.strip().splitlines()[-1])
+        imports.append(probe["import_s"])
+        startups.append(probe["startup_s"])
+        loaded.update(probe["deferred_loaded"])
+    result = summarize("import", imports, errors, time.perf_counter() - start, unit="imports")
+    result["startup_p50_ms"] = round(percentile(sorted(startups), 0.5) * 1000, 2)
+    result["budget_ms"] = args.import_budget_ms
+    result["deferred_loaded"] = sorted(loaded)
+    result["within_budget"] = bool(imports) and not errors and not loaded and result["p50_ms"] <= args.import_budget_ms
+    return result
+
+
+SCENARIOS = {
+    "import": bench_import,
+    "generate": bench_generate,
+    "modify": bench_modify,
+    "stream": bench_stream,
+    "sse": bench_sse,
+}
+
+
+async def run(args) -> List[Dict[str, Any]]:
+    import httpx
+    from api.main import app, lifespan
+    from models import fake_client
+    from models.cassette import get_cassette
+
+    if args.latency == "none":
+        fake_client.configure(ttft_ms="0", tokens_per_second=0)
+    fake_client.configure(seed=args.seed, **({"corruption": args.corruption} if args.corruption else {}))
+
+    results = []
+    if "import" in args.scenario:
+        results.append(await asyncio.to_thread(bench_import, args))
+    async with lifespan(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+            # Warm-up: first-call imports and caches are not part of the numbers
+            await client.post("/api/stream", json={"action": "classify_intent", "user_text": "warm up", "model_family": "fake"})
+            for name in args.scenario:
+                if name == "import":
+                    continue
+                fake_client.configure()
+                scenario = SCENARIOS[name]
+                result = await (scenario(app, args) if name == "sse" else scenario(client, args))
+                if get_cassette() is not None:
+                    result["cassette"] = dict(get_cassette().stats)
+                else:
+                    result["fake_provider"] = fake_client.stats()
+                results.append(result)
+    return results
+
+
+def print_table(results: List[Dict[str, Any]], args) -> None:
+    print(
+        f"latency={args.latency} concurrency={args.concurrency} seed={args.seed}"
+        + (f" corruption={args.corruption}" if args.corruption else "")
+        + (f" cassette={args.cassette}" if args.cassette else "")
+    )
+    print(f"{'scenario':<10} {'count':>7} {'errors':>6} {'per s':>8} {'mean':>8} {'p50':>8} {'p90':>8} {'p99':>8} {'max':>8}  (ms)")
+    for r in results:
+        count = r.get("requests", r.get("deliveries", r.get("imports")))
+        print(
+            f"{r['scenario']:<10} {count:>7} {r['errors']:>6} {r['throughput_per_s']:>8.1f} "
+            f"{r['mean_ms']:>8.2f} {r['p50_ms']:>8.2f} {r['p90_ms']:>8.2f} {r['p99_ms']:>8.2f} {r['max_ms']:>8.2f}"
+        )
+    for r in results:
+        if r["scenario"] == "sse":
+            print(f"sse: {r['subscribers']} subscribers x {r['events']} events; latency columns are emit-to-delivery delay")
+        elif r["scenario"] == "import":
+            print(
+                f"import: latency columns are import api.main; startup p50 {r['startup_p50_ms']}ms; "
+                f"budget {r['budget_ms']}ms {'met' if r['within_budget'] else 'EXCEEDED'}"
+                + (f"; loaded at startup: {', '.join(r['deferred_loaded'])}" if r["deferred_loaded"] else "")
+            )
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Offline benchmark of the API against the fake provider")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="Scenario to run (repeatable; default: all)")
+    parser.add_argument("--requests", type=int, default=50, help="Requests per scenario (stream: per request type)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent clients")
+    parser.add_argument("--latency", choices=("none", "realistic"), default="none", help="'none': instant fake provider; 'realistic': FAKE_LLM_* latency")
+    parser.add_argument("--corruption", default="", help="Fake provider corruption rates, e.g. 'truncation=0.05,fence=0.2'")
+    parser.add_argument("--seed", type=int, default=0, help="Fake provider seed")
+    parser.add_argument("--subscribers", type=int, default=100, help="SSE subscribers")
+    parser.add_argument("--events", type=int, default=200, help="Events emitted in the sse scenario")
+    parser.add_argument("--event-rate", type=float, default=500.0, help="Events per second in the sse scenario (0: as fast as possible)")
+    parser.add_argument("--import-runs", type=int, default=5, help="Fresh interpreters in the import scenario")
+    parser.add_argument("--import-budget-ms", type=float, default=800.0, help="Median import time allowed for api.main")
+    parser.add_argument("--cassette", help="Replay model responses from this cassette instead of synthesizing them")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args(argv)
+    args.scenario = args.scenario or list(SCENARIOS)
+
+    # Keep projects, usage and the event log out of the working tree
+    workdir = tempfile.mkdtemp(prefix="webbuilder-bench-")
+    os.environ.setdefault("PROJECT_STORE_DIR", os.path.join(workdir, "project_store"))
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    if args.cassette:
+        os.environ["CASSETTE_MODE"] = "replay"
+        os.environ["CASSETTE_PATH"] = os.path.abspath(args.cassette)
+        os.environ.setdefault("CASSETTE_MISS", "schema")
+        os.environ["CASSETTE_SPEED"] = "0" if args.latency == "none" else os.getenv("CASSETTE_SPEED", "1")
+    sys.path.insert(0, ROOT)
+    os.chdir(workdir)
+
+    results = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_table(results, args)
+    # Nonzero exit when the import budget is exceeded, for CI
+    return 0 if all(r.get("within_budget", True) for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""
+Cassette parse check - parse_project_json over recorded model output
+
+Runs parse_project_json on every project response in a cassette recorded
+with CASSETTE_MODE=record (see models/cassette.py) and reports how many
+parse, how long parsing takes, and which responses fail. Run it before and
+after a parser change to see what the change fixes or breaks on real-world
+output; failed calls (recorded errors) are skipped.
+
+Exits with status 1 when more than --max-failures responses fail to parse.
+
+Run from the repository root:
+    python -m testing.cassette_parse project_store/cassette.jsonl.gz
+    python -m testing.cassette_parse cassette.jsonl.gz --show 3 --json
+"""
+
+import sys
+import json
+import time
+import argparse
+import statistics
+from typing import Any, Dict, List, Optional
+
+from models.cassette import load_entries
+from models.gemini_client import parse_project_json
+
+
+def check(path: str, schemas: List[str]) -> Dict[str, Any]:
+    """Parse results of the cassette's responses with the given output schemas."""
+    parsed = 0
+    failures = []
+    seconds = []
+    for entry in load_entries(path):
+        if entry.get("output_schema") not in schemas or entry.get("response") is None:
+            continue
+        text = entry["response"]
+        start = time.perf_counter()
+        try:
+            project = parse_project_json(text)
+        except Exception as e:
+            project = None
+            error = f"{type(e).__name__}: {e}"
+        else:
+            error = None
+        seconds.append(time.perf_counter() - start)
+        if project and project.get("files"):
+            parsed += 1
+        else:
+            failures.append({
+                "key": entry["key"],
+                "model": entry.get("model"),
+                "recorded_at": entry.get("recorded_at"),
+                "chars": len(text),
+                "error": error,
+                "head": text[:120],
+                "tail": text[-120:],
+            })
+    seconds.sort()
+    return {
+        "cassette": path,
+        "schemas": schemas,
+        "responses": len(seconds),
+        "parsed": parsed,
+        "failed": len(failures),
+        "parse_mean_ms": round(statistics.fmean(seconds) * 1000, 3) if seconds else 0.0,
+        "parse_max_ms": round(seconds[-1] * 1000, 3) if seconds else 0.0,
+        "failures": failures,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run parse_project_json over the project responses of a cassette")
+    parser.add_argument("cassette", help="Cassette file (.jsonl.gz)")
+    parser.add_argument("--schema", action="append", help="Output schemas to check (repeatable; default: project)")
+    parser.add_argument("--show", type=int, default=5, help="Failures to print")
+    parser.add_argument("--max-failures", type=int, default=0, help="Failures tolerated before exiting with status 1")
+    parser.add_argument("--json", action="store_true", help="Print the result as JSON")
+    args = parser.parse_args(argv)
+
+    result = check(args.cassette, args.schema or ["project"])
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print(
+            f"{result['responses']} responses: {result['parsed']} parsed, {result['failed']} failed "
+            f"(parse mean {result['parse_mean_ms']:.2f}ms, max {result['parse_max_ms']:.2f}ms)"
+        )
+        for failure in result["failures"][:args.show]:
+            print(f"- {failure['key'][:12]} {failure['model']} {failure['chars']} chars {failure['error'] or ''}")
+            print(f"    head: {failure['head']!r}")
+            print(f"    tail: {failure['tail']!r}")
+    return 1 if result["failed"] > args.max_failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,363 @@
+"""
+Load generator - HTTP and SSE load against a running instance
+
+Drives a running API over real connections, for sizing workers and
+checking for regressions before a release:
+
+- requests arrive open-loop (Poisson, --rate per second) regardless of how
+  fast the server answers, split over an action mix (--mix): chat, intent,
+  page_type and analyze_query through POST /api/stream, generate through
+  POST /api/v1/project/generate and modify (a previously generated project)
+  through POST /api/stream
+- --subscribers SSE clients hold /api/v1/stream open, each filtered to one
+  of --projects project ids; generate and modify requests cycle through the
+  same ids, so their events reach the subscribers
+
+Reported: latency percentiles per action, errors (non-2xx or connection
+failures), requests shed because --max-in-flight were already waiting,
+event delivery delay (event timestamp to arrival at the subscriber; the
+generator and server must share a clock, e.g. the same host), SSE streams
+the server dropped before "[DONE]" (each is reconnected after
+--reconnect-delay) or refused, and the server's resident memory (process_resident_memory_bytes from /metrics) at
+start, peak and end.
+
+Start the server with the fake provider so the load measures the service,
+not a model (the default --model-family fake selects it per request;
+FAKE_LLM=1 on the server does it for every family):
+    uvicorn api.main:app --port 8000 --workers 1
+
+Then, from the repository root:
+    python -m testing.loadgen --url http://localhost:8000 --duration 60 --rate 5
+    python -m testing.loadgen --rate 20 --mix chat=1,generate=1 --subscribers 500 --json
+"""
+
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from testing.benchmark import percentile, summarize
+
+
+DEFAULT_MIX = "chat=3,intent=3,page_type=2,analyze_query=2,generate=1,modify=1"
+STREAM_ACTIONS = {
+    "chat": ("chat", "What is the difference between CSS grid and flexbox?"),
+    "intent": ("classify_intent", "Create an online store for handmade jewelry"),
+    "page_type": ("classify_page_type", "A CRM to track leads and our sales pipeline"),
+    "analyze_query": ("analyze_query", "A portfolio site"),
+}
+ACTIONS = tuple(STREAM_ACTIONS) + ("generate", "modify")
+QUERY = "Build a landing page for my coffee roastery with a menu, our story, opening hours and a contact form"
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """Action weights from "action=weight,..."."""
+    mix = {}
+    for part in filter(None, (item.strip() for item in text.split(","))):
+        action, _, weight = part.partition("=")
+        action = action.strip()
+        if action not in ACTIONS:
+            raise ValueError(f"Unknown action {action!r} (expected one of {', '.join(ACTIONS)})")
+        mix[action] = float(weight or 1)
+    if not mix or sum(mix.values()) <= 0:
+        raise ValueError("The action mix needs at least one positive weight")
+    return mix
+
+
+class LoadGenerator:
+    """One load run: request arrivals, SSE subscribers and memory scrapes."""
+
+    def __init__(self, client: httpx.AsyncClient, args):
+        self.client = client
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.mix = parse_mix(args.mix)
+        run = f"{int(time.time())}_{self.rng.randrange(16 ** 6):06x}"
+        self.project_ids = [f"load_{run}_{index}" for index in range(max(1, args.projects))]
+        self.generated: List[str] = []
+        self.latencies: Dict[str, List[float]] = {action: [] for action in self.mix}
+        self.errors: Dict[str, int] = {action: 0 for action in self.mix}
+        self.error_samples: List[str] = []
+        self.shed = 0
+        self.in_flight = 0
+        self.requests_sent = 0
+        self.delays: List[float] = []
+        self.sse = {"connected": 0, "completed": 0, "dropped": 0, "failed": 0, "events": 0}
+        self.memory: List[float] = []
+        self.subscribers_peak = 0.0
+        self._next_project = 0
+
+    def _project_id(self) -> str:
+        project_id = self.project_ids[self._next_project % len(self.project_ids)]
+        self._next_project += 1
+        return project_id
+
+    def _request(self, action: str, index: int):
+        family = self.args.model_family
+        if action == "generate":
+            return "/api/v1/project/generate", {"user_query": f"{QUERY} #{index}", "project_id": self._project_id(), "model_family": family}
+        if action == "modify":
+            if not self.generated:
+                # Nothing to modify yet: generate one first
+                return self._request("generate", index)
+            project_id = self.rng.choice(self.generated)
+            return "/api/stream", {"action": "modify_project", "instruction": f"Change the hero headline to variant {index}", "project_id": project_id, "model_family": family}
+        stream_action, text = STREAM_ACTIONS[action]
+        return "/api/stream", {"action": stream_action, "user_text": text, "model_family": family}
+
+    def _error(self, action: str, detail: str) -> None:
+        self.errors[action] += 1
+        if len(self.error_samples) < 10:
+            self.error_samples.append(f"{action}: {detail}")
+
+    async def _send(self, action: str, index: int) -> None:
+        path, body = self._request(action, index)
+        self.in_flight += 1
+        start = time.perf_counter()
+        try:
+            response = await self.client.post(path, json=body, timeout=self.args.timeout)
+        except httpx.HTTPError as e:
+            self._error(action, f"{type(e).__name__}: {e}")
+            return
+        finally:
+            self.in_flight -= 1
+        self.latencies[action].append(time.perf_counter() - start)
+        if response.status_code != 200:
+            self._error(action, f"HTTP {response.status_code} {response.text[:120]}")
+        elif body.get("project_id") and path == "/api/v1/project/generate" and body["project_id"] not in self.generated:
+            self.generated.append(body["project_id"])
+
+    async def arrivals(self, deadline: float) -> List[asyncio.Task]:
+        """Open-loop Poisson arrivals until the deadline."""
+        actions = list(self.mix)
+        weights = [self.mix[action] for action in actions]
+        tasks = []
+        index = 0
+        while True:
+            await asyncio.sleep(self.rng.expovariate(self.args.rate))
+            if time.perf_counter() >= deadline:
+                return tasks
+            action = self.rng.choices(actions, weights)[0]
+            if self.in_flight >= self.args.max_in_flight:
+                self.shed += 1
+                continue
+            index += 1
+            self.requests_sent += 1
+            tasks.append(asyncio.create_task(self._send(action, index)))
+
+    async def subscriber(self, project_id: str, stop: asyncio.Event) -> None:
+        """
+        One SSE client. Like EventSource it reconnects when its stream ends:
+        at once after "[DONE]" (the server ends every stream when a
+        generation completes), after --reconnect-delay when the server
+        dropped it.
+        """
+        while not stop.is_set():
+            connected_at = time.time()
+            connected = False
+            outcome = "dropped"
+            try:
+                async with self.client.stream("GET", "/api/v1/stream", params={"project_id": project_id}, timeout=httpx.Timeout(None, connect=10.0)) as response:
+                    if response.status_code == 200:
+                        connected = True
+                        self.sse["connected"] += 1
+                        outcome = await self._read_events(response, connected_at, stop)
+            except httpx.HTTPError:
+                pass
+            if stop.is_set() or outcome == "stopped":
+                return
+            if outcome == "done":
+                self.sse["completed"] += 1
+                continue
+            self.sse["dropped" if connected else "failed"] += 1
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=self.args.reconnect_delay)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _read_events(self, response: httpx.Response, connected_at: float, stop: asyncio.Event) -> str:
+        """Read a stream until "[DONE]" ("done"), the run ends ("stopped") or the server closes it ("dropped")."""
+        lines = response.aiter_lines()
+        stopped = asyncio.ensure_future(stop.wait())
+        try:
+            while True:
+                next_line = asyncio.ensure_future(lines.__anext__())
+                await asyncio.wait((next_line, stopped), return_when=asyncio.FIRST_COMPLETED)
+                if not next_line.done():
+                    next_line.cancel()
+                    return "stopped"
+                try:
+                    line = next_line.result()
+                except StopAsyncIteration:
+                    return "dropped"
+                if line == "data: [DONE]":
+                    return "done"
+                if not line.startswith("data: {"):
+                    continue
+                now = time.time()
+                try:
+                    timestamp = datetime.fromisoformat(json.loads(line[len("data: "):])["timestamp"]).timestamp()
+                except (ValueError, KeyError, TypeError):
+                    continue
+                self.sse["events"] += 1
+                # Historical events replayed on connect are not deliveries
+                if timestamp >= connected_at:
+                    self.delays.append(now - timestamp)
+        finally:
+            stopped.cancel()
+
+    async def scrape(self) -> None:
+        """Record the server's resident memory and SSE subscriber count."""
+        try:
+            response = await self.client.get("/metrics", timeout=10.0)
+        except httpx.HTTPError:
+            return
+        for line in response.text.splitlines():
+            if line.startswith("process_resident_memory_bytes "):
+                self.memory.append(float(line.split()[1]))
+            elif line.startswith("webbuilder_sse_subscribers "):
+                self.subscribers_peak = max(self.subscribers_peak, float(line.split()[1]))
+
+    async def scraper(self, stop: asyncio.Event) -> None:
+        while not stop.is_set():
+            await self.scrape()
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=self.args.metrics_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def run(self) -> Dict[str, Any]:
+        args = self.args
+        await self.scrape()
+        stop = asyncio.Event()
+        subscribers = []
+        for index in range(args.subscribers):
+            subscribers.append(asyncio.create_task(self.subscriber(self.project_ids[index % len(self.project_ids)], stop)))
+            if args.subscribe_rate > 0:
+                await asyncio.sleep(1.0 / args.subscribe_rate)
+        scraper = asyncio.create_task(self.scraper(stop))
+
+        start = time.perf_counter()
+        tasks = await self.arrivals(start + args.duration)
+        # Let requests still in flight finish (bounded)
+        if tasks:
+            await asyncio.wait(tasks, timeout=args.drain)
+        seconds = time.perf_counter() - start
+        # Late events of the last requests
+        await asyncio.sleep(min(1.0, args.drain))
+        stop.set()
+        await asyncio.gather(*subscribers, scraper, return_exceptions=True)
+        unfinished = sum(1 for task in tasks if not task.done())
+        for task in tasks:
+            task.cancel()
+        await self.scrape()
+        return self.report(seconds, unfinished)
+
+    def report(self, seconds: float, unfinished: int) -> Dict[str, Any]:
+        completed = sum(len(latencies) for latencies in self.latencies.values())
+        memory = self.memory
+        return {
+            "url": self.args.url,
+            "duration_s": round(seconds, 1),
+            "target_rate_per_s": self.args.rate,
+            "requests_sent": self.requests_sent,
+            "requests_completed": completed,
+            "requests_unfinished": unfinished,
+            "requests_shed": self.shed,
+            "errors": sum(self.errors.values()),
+            "error_samples": self.error_samples,
+            "actions": [summarize(action, latencies, self.errors[action], seconds) for action, latencies in self.latencies.items()],
+            "sse": {
+                **self.sse,
+                "subscribers": self.args.subscribers,
+                "server_subscribers_peak": self.subscribers_peak,
+                "deliveries": len(self.delays),
+                "delay_p50_ms": round(percentile(sorted(self.delays), 0.5) * 1000, 2),
+                "delay_p90_ms": round(percentile(sorted(self.delays), 0.9) * 1000, 2),
+                "delay_p99_ms": round(percentile(sorted(self.delays), 0.99) * 1000, 2),
+                "delay_max_ms": round(max(self.delays) * 1000, 2) if self.delays else 0.0,
+            },
+            "memory": {
+                "rss_start_mb": round(memory[0] / 2 ** 20, 1) if memory else None,
+                "rss_peak_mb": round(max(memory) / 2 ** 20, 1) if memory else None,
+                "rss_end_mb": round(memory[-1] / 2 ** 20, 1) if memory else None,
+                "growth_mb": round((memory[-1] - memory[0]) / 2 ** 20, 1) if memory else None,
+                "growth_kb_per_request": round((memory[-1] - memory[0]) / 1024 / completed, 1) if memory and completed else None,
+            },
+        }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    print(
+        f"{report['url']}: {report['duration_s']}s at {report['target_rate_per_s']}/s -> "
+        f"{report['requests_sent']} sent, {report['requests_completed']} completed, {report['errors']} errors, "
+        f"{report['requests_shed']} shed, {report['requests_unfinished']} unfinished"
+    )
+    print(f"{'action':<14} {'count':>6} {'errors':>6} {'mean':>9} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9}  (ms)")
+    for r in report["actions"]:
+        print(
+            f"{r['scenario']:<14} {r['requests']:>6} {r['errors']:>6} {r['mean_ms']:>9.1f} "
+            f"{r['p50_ms']:>9.1f} {r['p90_ms']:>9.1f} {r['p99_ms']:>9.1f} {r['max_ms']:>9.1f}"
+        )
+    sse = report["sse"]
+    print(
+        f"sse: {sse['subscribers']} subscribers ({sse['server_subscribers_peak']:.0f} peak on server), "
+        f"{sse['connected']} connects, {sse['completed']} completed, {sse['dropped']} dropped, {sse['failed']} failed; "
+        f"{sse['deliveries']} deliveries, delay p50 {sse['delay_p50_ms']}ms p90 {sse['delay_p90_ms']}ms "
+        f"p99 {sse['delay_p99_ms']}ms max {sse['delay_max_ms']}ms"
+    )
+    memory = report["memory"]
+    if memory["rss_start_mb"] is not None:
+        print(
+            f"server rss: {memory['rss_start_mb']}MB -> {memory['rss_end_mb']}MB (peak {memory['rss_peak_mb']}MB, "
+            f"{memory['growth_mb']:+}MB, {memory['growth_kb_per_request']}KB per request)"
+        )
+    for sample in report["error_samples"]:
+        print(f"error: {sample}")
+
+
+async def run(args) -> Dict[str, Any]:
+    limits = httpx.Limits(max_connections=args.max_in_flight + args.subscribers + 4, max_keepalive_connections=args.max_in_flight + 4)
+    async with httpx.AsyncClient(base_url=args.url, limits=limits) as client:
+        return await LoadGenerator(client, args).run()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Open-loop HTTP and SSE load against a running instance")
+    parser.add_argument("--url", default="http://localhost:8000", help="Base URL of the running API")
+    parser.add_argument("--duration", type=float, default=60.0, help="Seconds of request arrivals")
+    parser.add_argument("--rate", type=float, default=5.0, help="Request arrivals per second (Poisson)")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Action weights (actions: {', '.join(ACTIONS)})")
+    parser.add_argument("--subscribers", type=int, default=100, help="Concurrent SSE subscribers")
+    parser.add_argument("--subscribe-rate", type=float, default=50.0, help="SSE connections opened per second at start (0: all at once)")
+    parser.add_argument("--projects", type=int, default=10, help="Project ids shared by subscribers and generate requests")
+    parser.add_argument("--model-family", default="fake", help="model_family of every request")
+    parser.add_argument("--max-in-flight", type=int, default=256, help="Outstanding requests beyond which arrivals are shed")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Per-request timeout in seconds")
+    parser.add_argument("--drain", type=float, default=60.0, help="Seconds to wait for in-flight requests after the last arrival")
+    parser.add_argument("--reconnect-delay", type=float, default=1.0, help="Seconds before a dropped SSE subscriber reconnects")
+    parser.add_argument("--metrics-interval", type=float, default=5.0, help="Seconds between /metrics scrapes")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of arrivals and the action mix")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args(argv)
+    try:
+        parse_mix(args.mix)
+    except ValueError as e:
+        parser.error(str(e))
+
+    report = asyncio.run(run(args))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+    return 1 if report["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
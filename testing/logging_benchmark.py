@@ -0,0 +1,124 @@
+"""
+Logging benchmark - caller-side cost of hot-path log messages
+
+Replays the messages the pipeline writes most often (the per-parse
+sequence of parse_project_json, one line per broadcast event) and times
+the calling thread for:
+
+- print: the f-string print() calls these replaced, into a buffered file
+- print (flushed): the same with a flush per line, as with PYTHONUNBUFFERED=1
+  or a terminal
+- queued: utils.logger at INFO (the record is queued, written on the listener thread)
+- disabled: the same calls at a level below the configured one
+- sampled: LOG_SAMPLING-style 1 in 100 sampling
+
+Output goes to a temporary file in every case, so the numbers compare the
+caller's cost and not the terminal's. The listener is drained between cases
+so one case's backlog does not compete with the next for the GIL.
+
+Run from the repository root:
+    python -m testing.logging_benchmark
+"""
+
+import sys
+import time
+import logging
+import tempfile
+import statistics
+
+from utils import logger as logger_module
+
+
+ITERATIONS = 20000
+
+TEXT = '{"project": {"files": {"src/App.tsx": "export default function App() {}"}}}' * 40
+EVENT = {"event_type": "progress.update", "payload": {"step": 3}}
+
+
+def print_parse(text):
+    print(f"[PARSE_JSON] Input length: {len(text)} characters")
+    print(f"[PARSE_JSON] JSON string length: {len(text)} characters")
+    print(f"[PARSE_JSON] Attempting to parse JSON...")
+    print(f"[PARSE_JSON] JSON parsed successfully. Type: {type(text)}")
+    print(f"[PARSE_JSON] Found 'project' key. Files count: {1}")
+
+
+def print_event(event):
+    print(f"[STREAM_MANAGER] Broadcasted event: {event.get('event_type', 'unknown')}")
+
+
+def flushed(fn):
+    def call(arg):
+        fn(arg)
+        sys.stdout.flush()
+    return call
+
+
+def make_log_parse(log, level):
+    def log_parse(text):
+        log.log(level, "Input length: %s characters", len(text))
+        log.log(level, "JSON string length: %s characters", len(text))
+        log.log(level, "Attempting to parse JSON...")
+        log.log(level, "JSON parsed successfully. Type: %s", type(text))
+        log.log(level, "Found 'project' key. Files count: %s", 1)
+    return log_parse
+
+
+def make_log_event(log, level):
+    def log_event(event):
+        log.log(level, "Broadcasted event: %s", event.get("event_type", "unknown"))
+    return log_event
+
+
+def drain():
+    while logger_module._queue is not None and logger_module._queue.qsize():
+        time.sleep(0.01)
+
+
+def measure(fn, arg, iterations=ITERATIONS):
+    """Per-call microseconds on the calling thread: (mean, median, p99)."""
+    drain()
+    samples = []
+    perf = time.perf_counter
+    for _ in range(iterations):
+        start = perf()
+        fn(arg)
+        samples.append((perf() - start) * 1e6)
+    samples.sort()
+    return statistics.fmean(samples), samples[len(samples) // 2], samples[int(len(samples) * 0.99)]
+
+
+def main():
+    sink = tempfile.TemporaryFile("w+")
+    real_stdout = sys.stdout
+    results = []
+    try:
+        sys.stdout = sink
+        results.append(("print", measure(print_parse, TEXT), measure(print_event, EVENT)))
+        results.append(("print (flushed)", measure(flushed(print_parse), TEXT), measure(flushed(print_event), EVENT)))
+
+        # The listener writes to sys.stdout as it was when logging was configured
+        logger_module.LOG_SAMPLING = "benchmark.sampled=100"
+        logger_module.configure_logging(force=True)
+        log = logger_module.get_logger("benchmark.hot_path")
+        log.setLevel(logging.INFO)
+        results.append(("queued", measure(make_log_parse(log, logging.INFO), TEXT), measure(make_log_event(log, logging.INFO), EVENT)))
+        results.append(("disabled", measure(make_log_parse(log, logging.DEBUG), TEXT), measure(make_log_event(log, logging.DEBUG), EVENT)))
+
+        sampled = logger_module.get_logger("benchmark.sampled")
+        results.append(("sampled", measure(make_log_parse(sampled, logging.INFO), TEXT), measure(make_log_event(sampled, logging.INFO), EVENT)))
+
+        logger_module.shutdown_logging()
+    finally:
+        sys.stdout = real_stdout
+        sink.close()
+
+    print(f"{ITERATIONS} iterations per case; microseconds on the calling thread")
+    print(f"{'':<16} {'parse (5 messages)':^26} {'broadcast event':^26}")
+    print(f"{'case':<16}" + f" {'mean':>8} {'median':>8} {'p99':>8}" * 2)
+    for name, parse, event in results:
+        print(f"{name:<16}" + "".join(f" {value:>8.2f}" for value in parse + event))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Semantic cache evaluation - precision/recall of near-duplicate detection
+
+Indexes the "stored" requests below, looks up each probe and reports, per
+threshold, how many probes that should reuse a stored project were matched
+(recall) and how many matches were actually duplicates (precision).
+
+Run from the repository root:
+    python -m testing.semantic_cache_eval
+"""
+
+from storage.semantic_cache import (
+    SemanticProjectCache,
+    SEMANTIC_CACHE_HIT_THRESHOLD,
+    SEMANTIC_CACHE_SEED_THRESHOLD,
+)
+
+
+# (project_id, page_type, user_query, questionnaire_answers)
+STORED = [
+    ("crm-agency", "crm_dashboard", "Build a CRM dashboard for my marketing agency", {"team_size": "Small (2-10 people)"}),
+    ("crm-realestate", "crm_dashboard", "CRM for a real estate brokerage to track buyers and listings", {}),
+    ("hr-startup", "hr_portal", "HR portal for a 50 person startup with leave requests and onboarding", {}),
+    ("inventory-warehouse", "inventory_management", "Inventory management system for a warehouse with barcode scanning", {}),
+    ("shop-sneakers", "ecommerce_fashion", "Online store for streetwear sneakers", {}),
+    ("shop-dresses", "ecommerce_fashion", "Ecommerce site selling handmade summer dresses", {}),
+    ("landing-saas", "landing_page", "Landing page for a SaaS analytics product with free trial signup", {"industry": "SaaS / Software Product"}),
+    ("landing-webinar", "landing_page", "Landing page for a webinar about personal finance", {"industry": "Event / Webinar"}),
+    ("portfolio-cs", "student_portfolio", "Portfolio for a computer science student with projects and resume", {}),
+    ("tutor-math", "ai_tutor_lms", "AI tutor platform for high school math", {}),
+    ("delivery-grocery", "hyperlocal_delivery", "Hyperlocal grocery delivery app for my neighborhood", {}),
+    ("realestate-rentals", "real_estate_listing", "Real estate listing site for apartment rentals in Berlin", {}),
+]
+
+# (page_type, user_query, questionnaire_answers, expected project_id or None)
+PROBES = [
+    ("crm_dashboard", "build a CRM dashboard for my marketing agency", {"team_size": "Small (2-10 people)"}, "crm-agency"),
+    ("crm_dashboard", "Create a CRM dashboard for our marketing agency!", {"team_size": "Small (2-10 people)"}, "crm-agency"),
+    ("crm_dashboard", "crm dashboard for a digital marketing agency", {"team_size": "Small (2-10 people)"}, "crm-agency"),
+    ("crm_dashboard", "Marketing agency CRM dashboard", {}, "crm-agency"),
+    ("crm_dashboard", "CRM for real-estate brokerage tracking buyers & listings", {}, "crm-realestate"),
+    ("crm_dashboard", "CRM for a dental clinic to manage patients", {}, None),
+    ("crm_dashboard", "Sales pipeline tool for a B2B software company", {}, None),
+    ("hr_portal", "HR portal for a 50-person startup with leave requests and onboarding", {}, "hr-startup"),
+    ("hr_portal", "HR portal for startup: onboarding + leave requests", {}, "hr-startup"),
+    ("hr_portal", "Employee payroll portal for a hospital", {}, None),
+    ("inventory_management", "Warehouse inventory management system with barcode scanning", {}, "inventory-warehouse"),
+    ("inventory_management", "Inventory tracker for a small bakery", {}, None),
+    ("ecommerce_fashion", "online store for streetwear sneakers", {}, "shop-sneakers"),
+    ("ecommerce_fashion", "Streetwear sneaker online shop", {}, "shop-sneakers"),
+    ("ecommerce_fashion", "Online store for luxury watches", {}, None),
+    ("ecommerce_fashion", "Ecommerce website selling handmade summer dresses", {}, "shop-dresses"),
+    ("ecommerce_fashion", "Shop for handmade leather bags", {}, None),
+    ("landing_page", "Landing page for a SaaS analytics product with a free trial sign-up", {"industry": "SaaS / Software Product"}, "landing-saas"),
+    ("landing_page", "Landing page for a SaaS analytics product", {"industry": "Finance / Fintech"}, None),
+    ("landing_page", "Landing page for a webinar on personal finance", {"industry": "Event / Webinar"}, "landing-webinar"),
+    ("landing_page", "Landing page for a yoga retreat", {}, None),
+    ("landing_page", "Landing page for a mobile fitness app", {}, None),
+    ("student_portfolio", "Portfolio website for a computer science student with projects and a resume", {}, "portfolio-cs"),
+    ("student_portfolio", "Portfolio for a photography student", {}, None),
+    ("ai_tutor_lms", "AI tutor for high-school mathematics", {}, "tutor-math"),
+    ("ai_tutor_lms", "AI tutor platform for learning Spanish", {}, None),
+    ("hyperlocal_delivery", "hyperlocal grocery delivery app for my neighbourhood", {}, "delivery-grocery"),
+    ("hyperlocal_delivery", "Pharmacy delivery app for my city", {}, None),
+    ("real_estate_listing", "Real estate listings site for apartment rentals in Berlin", {}, "realestate-rentals"),
+    ("real_estate_listing", "Real estate listing site for luxury villas in Dubai", {}, None),
+    ("service_marketplace", "Build a CRM dashboard for my marketing agency", {}, None),
+]
+
+THRESHOLDS = (0.5, 0.6, 0.7, 0.75, 0.8, 0.85, 0.9, 0.95)
+
+
+def evaluate():
+    cache = SemanticProjectCache(path=None)
+    for project_id, page_type, query, answers in STORED:
+        cache.add(project_id, 1, query, page_type, answers, persist=False)
+
+    results = []
+    for page_type, query, answers, expected in PROBES:
+        match = cache.lookup(query, page_type, answers)
+        results.append((query, expected, match))
+
+    print(f"Stored: {len(STORED)}  Probes: {len(PROBES)} ({sum(1 for p in PROBES if p[3])} duplicates)\n")
+    for query, expected, match in results:
+        score = f"{match.score:.3f}" if match else "  -  "
+        found = match.project_id if match else "-"
+        print(f"{score}  expected={expected or '-':<20} best={found:<20} {query}")
+
+    print(f"\n{'threshold':>9}  {'precision':>9}  {'recall':>6}  {'tp':>3} {'fp':>3} {'fn':>3}")
+    for threshold in THRESHOLDS:
+        tp = fp = fn = 0
+        for _, expected, match in results:
+            matched = match is not None and match.score >= threshold
+            if matched and match.project_id == expected:
+                tp += 1
+            elif matched:
+                fp += 1
+                if expected:
+                    fn += 1
+            elif expected:
+                fn += 1
+        precision = tp / (tp + fp) if tp + fp else 1.0
+        recall = tp / (tp + fn) if tp + fn else 1.0
+        marker = ""
+        if threshold == SEMANTIC_CACHE_HIT_THRESHOLD:
+            marker = "  <- hit threshold"
+        elif threshold == SEMANTIC_CACHE_SEED_THRESHOLD:
+            marker = "  <- seed threshold"
+        print(f"{threshold:>9.2f}  {precision:>9.2f}  {recall:>6.2f}  {tp:>3} {fp:>3} {fn:>3}{marker}")
+
+
+if __name__ == "__main__":
+    evaluate()
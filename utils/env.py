@@ -0,0 +1,48 @@
+# utils/env.py
+"""
+.env loading without paying for python-dotenv when there is no .env file.
+
+Deployments set their environment directly; only a local checkout has a
+.env (in the working directory or the repository root), so python-dotenv is
+imported only when one of those exists.
+"""
+
+import os
+from typing import List
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_loaded = False
+
+
+def env_files() -> List[str]:
+    """Existing .env files, working directory first."""
+    paths = []
+    for directory in (os.getcwd(), _ROOT):
+        path = os.path.join(directory, ".env")
+        if path not in paths and os.path.isfile(path):
+            paths.append(path)
+    return paths
+
+
+def load_env(override: bool = False) -> bool:
+    """
+    Load .env files into os.environ (once, unless override is set).
+
+    Variables already set win unless override is True. Returns True if a
+    file was loaded.
+    """
+    global _loaded
+    if _loaded and not override:
+        return False
+    _loaded = True
+    paths = env_files()
+    if not paths:
+        return False
+    try:
+        from dotenv import load_dotenv
+    except ImportError:
+        return False
+    for path in paths:
+        load_dotenv(dotenv_path=path, override=override)
+    return True
@@ -1,14 +1,18 @@
 """
 Event logger for Streamlit - captures and displays events in the UI.
+
+Streamlit is never imported here: the Streamlit app has already imported
+it, and the API must not pay for (or depend on) it.
 """
 
+import os
+import sys
 import json
 from typing import List, Dict, Any, Optional
-try:
-    import streamlit as st
-except ImportError:
-    st = None
 from events.event_types import EventEnvelope
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
 
 
 class StreamlitEventLogger:
@@ -22,6 +26,11 @@ class StreamlitEventLogger:
         self.save_to_file = save_to_file
         self.output_file = output_file
     
+    def prepare(self):
+        """Create the event file's directory (at startup, not per event)."""
+        if self.save_to_file:
+            os.makedirs(os.path.dirname(self.output_file) or ".", exist_ok=True)
+    
     def log_event(self, event: EventEnvelope):
         """Log an event and optionally save to file."""
         event_dict = event.to_dict()
@@ -45,22 +54,25 @@ class StreamlitEventLogger:
             
         except (ImportError, Exception) as e:
             # Stream manager not available or error - continue normally
-            print(f"[EVENT_LOGGER] Error queuing event for broadcast: {e}")
-            import traceback
-            traceback.print_exc()
-            pass
+            logger.exception("Error queuing event for broadcast: %s", e)
         
         if self.save_to_file:
+            line = json.dumps(event_dict) + "\n"
             try:
-                import os
-                os.makedirs(os.path.dirname(self.output_file), exist_ok=True)
-                with open(self.output_file, "a", encoding="utf-8") as f:
-                    f.write(json.dumps(event_dict) + "\n")
+                try:
+                    f = open(self.output_file, "a", encoding="utf-8")
+                except FileNotFoundError:
+                    # Not prepared at startup (Streamlit) or removed since
+                    self.prepare()
+                    f = open(self.output_file, "a", encoding="utf-8")
+                with f:
+                    f.write(line)
             except Exception as e:
-                print(f"[EVENT_LOGGER] Error saving event to file: {e}")
+                logger.warning("Error saving event to file: %s", e)
     
     def display_events(self, container=None):
         """Display events in Streamlit UI."""
+        import streamlit as st
         if container is None:
             container = st
         
@@ -126,8 +138,11 @@ _api_event_logger: Optional[StreamlitEventLogger] = None
 
 def get_event_logger() -> StreamlitEventLogger:
     """Get or create the event logger (works in both Streamlit and API contexts)."""
+    # Streamlit context only if the app has loaded Streamlit
+    st = sys.modules.get("streamlit")
     try:
-        # Try Streamlit context first
+        if st is None:
+            raise ImportError("streamlit not loaded")
         if "event_logger" not in st.session_state:
             st.session_state.event_logger = StreamlitEventLogger()
         return st.session_state.event_logger
@@ -1,2 +1,299 @@
+# utils/logger.py
+"""
+Structured, non-blocking logging.
+
+Modules log through the standard library:
+
+    from utils.logger import get_logger
+    logger = get_logger(__name__)
+    logger.info("Plan: %d units in %.1fs", len(units), seconds)
+
+A log call on the event loop costs a level check and a queue put, never a
+stdout write: module loggers put (name, level, msg, args, time) on a queue
+and a background listener thread builds the LogRecord, formats it and
+writes it. Formatting is lazy: %-style arguments are only rendered on the
+listener thread, and not at all when the level is disabled. Only loggers
+from get_logger work this way; logging.getLogger (third-party libraries)
+still returns standard loggers, whose records go through a queue handler
+on the root logger into the same queue. Global logging state (the logger
+class, caller and thread info collection) is left alone.
+
+Configuration (environment):
+
+- LOG_LEVEL: root level (default INFO)
+- LOG_LEVELS: per-module levels, e.g. "models.gemini_client=DEBUG,api.stream_manager=WARNING"
+- LOG_FORMAT: "text" (default) or "json" (one object per line with any
+  extra={...} fields)
+- LOG_SAMPLING: keep 1 in N below-WARNING records per call site for noisy
+  modules, e.g. "api.stream_manager=100" (warnings and errors are never
+  sampled)
+- LOG_QUEUE_SIZE: records waiting for the listener before new ones are
+  dropped (default 10000)
+
+`python -m testing.logging_benchmark` compares the caller-side cost with
+the print() calls this replaced.
+"""
+
+import os
+import sys
+import json
+import time
+import queue
+import atexit
+import logging
+import threading
+import logging.handlers
+from typing import Dict, Optional
+
+from utils.env import load_env
+
+# Logging is configured by the first module that imports it, usually before
+# the entry point loads .env
+load_env()
+
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text").lower()
+LOG_SAMPLING = os.getenv("LOG_SAMPLING", "")
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+# Chatty client libraries stay at WARNING unless LOG_LEVELS says otherwise
+QUIET_LOGGERS = ("httpx", "httpx2", "httpcore", "urllib3", "google_genai", "anthropic", "openai")
+
+# LogRecord attributes that are not user-supplied extra fields
+_RECORD_FIELDS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "sampled"}
+
+_configured = False
+_configure_lock = threading.Lock()
+_queue: Optional[queue.SimpleQueue] = None
+_listener: Optional["_RecordListener"] = None
+_sampling: Dict[str, int] = {}
+
+
+def _parse_mapping(spec: str) -> Dict[str, str]:
+    mapping = {}
+    for item in spec.split(","):
+        name, sep, value = item.partition("=")
+        if sep and name.strip() and value.strip():
+            mapping[name.strip()] = value.strip()
+    return mapping
+
+
+def _sample_rate(name: str) -> int:
+    while name:
+        rate = _sampling.get(name)
+        if rate is not None:
+            return rate
+        name = name.rpartition(".")[0]
+    return 1
+
+
+def _format_exception(exc_info) -> Optional[str]:
+    if isinstance(exc_info, BaseException):
+        exc_info = (type(exc_info), exc_info, exc_info.__traceback__)
+    elif not isinstance(exc_info, tuple):
+        exc_info = sys.exc_info()
+    return logging.Formatter().formatException(exc_info) if exc_info[0] else None
+
+
+def _put(item) -> None:
+    # Drop rather than grow without bound (or block) when the listener falls behind
+    log_queue = _queue
+    if log_queue is not None and log_queue.qsize() < LOG_QUEUE_SIZE:
+        log_queue.put(item)
+
+
+class QueueLogger(logging.Logger):
+    """
+    Logger that queues the raw call instead of building a LogRecord.
+
+    Logger-level filters and caller info are not used on this path; the
+    listener builds the record. A logger that has handlers of its own
+    (someone attached one) takes the standard path so they still run. Tracebacks are rendered eagerly
+    (the frames change once the caller moves on), everything else stays
+    unformatted.
+    """
+
+    _sample_rate: Optional[int] = None
+    _sample_counts: Dict[str, int] = {}
+
+    def _log(self, level, msg, args, exc_info=None, extra=None, stack_info=False, stacklevel=1):
+        if _queue is None or self.handlers:
+            return super()._log(level, msg, args, exc_info, extra, stack_info, stacklevel)
+        sampled = None
+        if level < logging.WARNING:
+            rate = self._sample_rate
+            if rate is None:
+                rate = self._sample_rate = _sample_rate(self.name)
+                self._sample_counts = {}
+            if rate > 1:
+                count = self._sample_counts.get(msg, 0)
+                self._sample_counts[msg] = count + 1
+                if count % rate:
+                    return
+                sampled = rate
+        exc_text = _format_exception(exc_info) if exc_info else None
+        _put((self.name, level, msg, args, time.time(), exc_text, extra, sampled))
+
+
+class _QueueLoggerManager(logging.Manager):
+    """
+    Creates QueueLoggers for get_logger without changing the logger class
+    logging.getLogger uses.
+
+    It shares the standard manager's logger table, so a name maps to one
+    logger whichever function created it first, and follows its disable
+    level (logging.disable).
+    """
+
+    def __init__(self, base: logging.Manager):
+        super().__init__(base.root)
+        self._base = base
+        self.loggerDict = base.loggerDict
+        self.loggerClass = QueueLogger
+
+    @property
+    def disable(self) -> int:
+        return self._base.disable
+
+    @disable.setter
+    def disable(self, value: int) -> None:
+        # Set by Manager.__init__; the standard manager's value is the one used
+        pass
+
+
+_manager = _QueueLoggerManager(logging.Logger.manager)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, including extra={...} fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_FIELDS and not key.startswith("_"):
+                data[key] = value
+        if getattr(record, "sampled", None):
+            data["sampled"] = record.sampled
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data["exc"] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """
+    Root handler for loggers created outside get_logger (third-party
+    libraries): queues the record without rendering msg % args.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        _put(record)
+
+
+class _RecordListener(logging.handlers.QueueListener):
+    """Builds records from queued QueueLogger calls on the listener thread."""
+
+    def prepare(self, item):
+        if isinstance(item, logging.LogRecord):
+            return item
+        name, level, msg, args, created, exc_text, extra, sampled = item
+        record = logging.LogRecord(name, level, "", 0, msg, args, None)
+        record.created = created
+        record.msecs = (created - int(created)) * 1000
+        record.exc_text = exc_text
+        if sampled:
+            record.sampled = sampled
+        if extra:
+            for key, value in extra.items():
+                if key not in _RECORD_FIELDS:
+                    record.__dict__[key] = value
+        return record
+
+    def handle(self, record):
+        try:
+            super().handle(record)
+        except Exception:
+            # A bad record must not stop the listener thread
+            pass
+
+
+def configure_logging(force: bool = False) -> None:
+    """Start the listener thread and install the root queue handler (idempotent)."""
+    global _configured, _listener, _queue
+    if _configured and not force:
+        return
+    with _configure_lock:
+        if _configured and not force:
+            return
+        if _listener is not None:
+            _listener.stop()
+
+        output = logging.StreamHandler(sys.stdout)
+        if LOG_FORMAT == "json":
+            output.setFormatter(JsonFormatter())
+        else:
+            output.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(name)s] %(message)s"))
+
+        _sampling.clear()
+        _sampling.update({name: int(rate) for name, rate in _parse_mapping(LOG_SAMPLING).items() if rate.isdigit()})
+        for existing in list(logging.Logger.manager.loggerDict.values()):
+            if isinstance(existing, QueueLogger):
+                existing._sample_rate = None
+
+        root = logging.getLogger()
+        for handler in [h for h in root.handlers if isinstance(h, LazyQueueHandler)]:
+            root.removeHandler(handler)
+        _queue = queue.SimpleQueue()
+        root.addHandler(LazyQueueHandler(_queue))
+        root.setLevel(LOG_LEVEL)
+        for name in QUIET_LOGGERS:
+            logging.getLogger(name).setLevel(logging.WARNING)
+        for name, level in _parse_mapping(LOG_LEVELS).items():
+            # Created like get_logger would, so a module listed here still gets a QueueLogger
+            _manager.getLogger(name).setLevel(level.upper())
+
+        _listener = _RecordListener(_queue, output)
+        _listener.start()
+        _configured = True
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the listener thread (the next get_logger reconfigures)."""
+    global _listener, _configured, _queue
+    with _configure_lock:
+        root = logging.getLogger()
+        for handler in [h for h in root.handlers if isinstance(h, LazyQueueHandler)]:
+            root.removeHandler(handler)
+        # Later calls take the standard synchronous path until reconfigured
+        _queue = None
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+        _configured = False
+
+
+atexit.register(shutdown_logging)
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Logger for a module (configures logging on first use)."""
+    configure_logging()
+    return _manager.getLogger(name)
+
+
 def log(message: str):
-    print(f"[ENGINE] {message}")
\ No newline at end of file
+    get_logger("engine").info(message)
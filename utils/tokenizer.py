@@ -1,10 +1,117 @@
 # utils/tokenizer.py
+"""
+Token counting for routing and budgeting decisions.
 
-def estimate_tokens(text: str) -> int:
+Uses tiktoken (o200k_base, falling back to cl100k_base) when it is installed
+and a BPE-shaped heuristic otherwise: words of up to 6 characters are one
+token, longer words one more per 7 characters, digit runs one per 3 digits,
+every punctuation character one token and indentation one per 4 spaces.
+That tracks BPE counts on code and JSON far better than word counts.
+
+Counts for long texts are memoized by content hash: routing counts the same
+static prompt prefixes and stored projects over and over.
+"""
+
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Optional
+
+# Optional real tokenizer
+try:
+    import tiktoken  # type: ignore
+except ImportError:
+    tiktoken = None
+
+
+# Provider tokenizers differ from OpenAI's BPE; scale counts to stay conservative
+PROVIDER_TOKEN_FACTORS = {
+    "openai": 1.0,
+    "anthropic": 1.15,
+    "gemini": 1.0,
+}
+
+MEMO_MIN_CHARS = 2048
+MEMO_MAX_ENTRIES = 4096
+
+_PIECE = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]|\n[ \t]+")
+
+_memo: "OrderedDict[bytes, int]" = OrderedDict()
+_memo_lock = threading.Lock()
+
+
+@lru_cache(maxsize=1)
+def _encoding():
+    if tiktoken is None:
+        return None
+    for name in ("o200k_base", "cl100k_base"):
+        try:
+            return tiktoken.get_encoding(name)
+        except Exception:
+            continue
+    return None
+
+
+def tokenizer_name() -> str:
+    """Name of the tokenizer in use (for stats and logs)."""
+    encoding = _encoding()
+    return f"tiktoken:{encoding.name}" if encoding is not None else "heuristic"
+
+
+def _heuristic_count(text: str) -> int:
+    count = 0
+    for piece in _PIECE.findall(text):
+        first = piece[0]
+        if first.isalpha():
+            count += 1 + (len(piece) - 1) // 7
+        elif first.isdigit():
+            count += (len(piece) + 2) // 3
+        elif first == "\n":
+            count += 1 + (len(piece) - 1) // 4
+        else:
+            count += 1
+    return count
+
+
+def _raw_count(text: str) -> int:
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return _heuristic_count(text)
+
+
+def count_tokens(text: str, provider: Optional[str] = None) -> int:
     """
-    Rough token estimate: ~1.3x words.
-    Good enough for routing decisions.
+    Token count of text, scaled for the provider's tokenizer.
+
+    Args:
+        text: Text to count
+        provider: gemini, anthropic or openai (None counts unscaled)
     """
     if not text:
         return 0
-    return int(len(text.split()) * 1.3)
\ No newline at end of file
+    if len(text) < MEMO_MIN_CHARS:
+        raw = _raw_count(text)
+    else:
+        key = hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+        with _memo_lock:
+            raw = _memo.get(key)
+            if raw is not None:
+                _memo.move_to_end(key)
+        if raw is None:
+            raw = _raw_count(text)
+            with _memo_lock:
+                _memo[key] = raw
+                if len(_memo) > MEMO_MAX_ENTRIES:
+                    _memo.popitem(last=False)
+    return int(raw * PROVIDER_TOKEN_FACTORS.get(provider, 1.0) + 0.5)
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Token estimate for prompt text (see count_tokens).
+    Good enough for routing decisions.
+    """
+    return count_tokens(text)